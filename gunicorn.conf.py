@@ -0,0 +1,61 @@
+# Gunicorn picks this file up automatically from the working directory.
+import gc
+import os
+
+# Load the Django app -- and with it the embedding model -- once in the
+# master and fork workers from it, so the ~90MB of MiniLM weights and the
+# torch runtime are shared copy-on-write instead of loaded per worker.
+preload_app = os.getenv('GUNICORN_PRELOAD_MODEL', 'False') == 'True'
+
+
+def _preload_model():
+    # Only the torch backend is preloaded: an ONNX Runtime session's thread
+    # pool doesn't survive fork, and the ONNX models are small anyway
+    from django.conf import settings
+    return preload_app and settings.EMBEDDING_BACKEND == 'torch'
+
+
+def when_ready(server):
+    """Master only, after the app is loaded and before workers are forked."""
+    if not _preload_model():
+        return
+    from user_querySafe.chatbot.embedding_model import configure_torch_threads, get_embedding_model
+
+    # Keep torch single-threaded in the master: an OpenMP thread pool
+    # created before fork is unusable in the children and hangs them.
+    configure_torch_threads(1)
+    get_embedding_model()
+    # Move everything loaded so far out of the GC's tracked generations so
+    # collections in the workers don't write to (and un-share) those pages
+    gc.freeze()
+    server.log.info("Embedding model preloaded in master")
+
+
+def post_fork(server, worker):
+    if not _preload_model():
+        return
+    from django.conf import settings
+    from user_querySafe.chatbot.embedding_model import configure_torch_threads
+
+    threads = settings.EMBEDDING_THREADS
+    if threads <= 0:
+        threads = max(1, len(os.sched_getaffinity(0)) // server.cfg.workers)
+    configure_torch_threads(threads)
+
+
+def post_worker_init(worker):
+    """Warm the embedding model and hot indexes as soon as a worker boots.
+
+    Runs in a background thread so the worker starts accepting connections
+    immediately; /healthz/ready/ reports 503 until warmup is done.
+    """
+    from django.conf import settings
+
+    if settings.WARMUP_ON_START:
+        from user_querySafe.chatbot.warmup import start_warmup
+        start_warmup()
+
+    if settings.TRAINING_EMBEDDED_WORKER:
+        # Pick up jobs queued before this instance started (or left by a recycled one)
+        from user_querySafe.chatbot.training_jobs import start_embedded_worker
+        start_embedded_worker()
@@ -1,9 +1,15 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.http import HttpResponsePermanentRedirect
+from whitenoise.middleware import WhiteNoiseMiddleware
 
 
 class DomainRedirectMiddleware:
     """Redirect .querysafe.in domains to their .querysafe.ai equivalents."""
 
+    # Works in both WSGI and ASGI stacks so async views aren't forced through a thread
+    sync_capable = True
+    async_capable = True
+
     REDIRECT_MAP = {
         'console.querysafe.in': 'https://console.querysafe.ai',
         'querysafe.in': 'https://querysafe.ai',
@@ -12,12 +18,53 @@ class DomainRedirectMiddleware:
 
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
-    def __call__(self, request):
+    def _redirect_for(self, request):
         host = request.get_host().split(':')[0].lower()
 
         if host in self.REDIRECT_MAP:
             target = self.REDIRECT_MAP[host]
             return HttpResponsePermanentRedirect(target + request.get_full_path())
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._redirect_for(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self._redirect_for(request) or await self.get_response(request)
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise with a native async path.
+
+    Stock WhiteNoiseMiddleware is sync-only, which under ASGI makes Django
+    run every downstream async view through a blocking thread.  Here only
+    actual static-file hits are served in a thread; everything else is
+    awaited directly.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
 
-        return self.get_response(request)
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
@@ -56,13 +56,97 @@ GEMINI_LOCATION = os.getenv('GEMINI_LOCATION', 'us-central1')
 GEMINI_CHAT_MODEL = os.getenv('GEMINI_CHAT_MODEL', 'gemini-2.0-flash')
 GEMINI_VISION_MODEL = os.getenv('GEMINI_VISION_MODEL', 'gemini-2.0-flash')
 
+# Vision call pacing, shared by all training jobs in a process (see chatbot/vision_dispatcher.py)
+VISION_REQUESTS_PER_MINUTE = float(os.getenv('VISION_REQUESTS_PER_MINUTE', 300))
+VISION_INITIAL_CONCURRENCY = int(os.getenv('VISION_INITIAL_CONCURRENCY', 4))
+VISION_MAX_CONCURRENCY = int(os.getenv('VISION_MAX_CONCURRENCY', 16))
+VISION_MAX_RETRIES = int(os.getenv('VISION_MAX_RETRIES', 6))
+VISION_BACKOFF_BASE_SECONDS = float(os.getenv('VISION_BACKOFF_BASE_SECONDS', 1))
+VISION_BACKOFF_MAX_SECONDS = float(os.getenv('VISION_BACKOFF_MAX_SECONDS', 60))
+# Scanned pages / images sent per vision request (1 = one request per image)
+VISION_PAGES_PER_REQUEST = int(os.getenv('VISION_PAGES_PER_REQUEST', 4))
+# Pages with less ink than this fraction are treated as blank and skip vision
+VISION_BLANK_INK_RATIO = float(os.getenv('VISION_BLANK_INK_RATIO', 0.002))
+# Caption visually identical pages once per training run
+VISION_DEDUPE_PAGES = os.getenv('VISION_DEDUPE_PAGES', 'True') == 'True'
+
 # Paths for FAISS indices and metadata
 INDEX_DIR = os.path.join(DATA_DIR, "documents", "vector_index")
 META_DIR = os.path.join(DATA_DIR, "documents", "chunk-metadata")
+# Gemini vision captions, content-addressed and shared by all chatbots
+CAPTION_CACHE_DIR = os.path.join(DATA_DIR, "documents", "caption_cache")
+# Chunk embeddings shared by all chatbots (see chatbot/embedding_store.py); '' (default) disables it.
+# Point it at a persistent local disk: SQLite needs working file locks (not the mounted bucket), and
+# on Cloud Run the container filesystem is memory.
+EMBEDDING_STORE_PATH = os.getenv('EMBEDDING_STORE_PATH', '')
+EMBEDDING_STORE_MAX_ENTRIES = int(os.getenv('EMBEDDING_STORE_MAX_ENTRIES', 200000))  # ~1.6KB each for MiniLM (~320MB)
 
 # Create directories if they don't exist
 os.makedirs(INDEX_DIR, exist_ok=True)
 os.makedirs(META_DIR, exist_ok=True)
+os.makedirs(CAPTION_CACHE_DIR, exist_ok=True)
+
+# In-process LRU cache of loaded FAISS indexes + chunk metadata (per worker)
+INDEX_CACHE_MAX_ENTRIES = int(os.getenv('INDEX_CACHE_MAX_ENTRIES', 32))
+INDEX_CACHE_MAX_BYTES = int(os.getenv('INDEX_CACHE_MAX_MB', 256)) * 1024 * 1024
+
+# Query-embedding cache: in-process LRU, optionally backed by the shared Django cache
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', 4096))
+QUERY_EMBEDDING_SHARED_CACHE = os.getenv('QUERY_EMBEDDING_SHARED_CACHE', 'False') == 'True'
+QUERY_EMBEDDING_SHARED_TTL = int(os.getenv('QUERY_EMBEDDING_SHARED_TTL', 7 * 24 * 3600))
+
+# FAISS index selection (see chatbot/index_factory.py)
+FAISS_FLAT_MAX_VECTORS = int(os.getenv('FAISS_FLAT_MAX_VECTORS', 5000))
+FAISS_INDEX_MEMORY_MB = int(os.getenv('FAISS_INDEX_MEMORY_MB', 64))
+FAISS_HNSW_M = int(os.getenv('FAISS_HNSW_M', 32))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv('FAISS_HNSW_EF_CONSTRUCTION', 80))
+FAISS_HNSW_EF_SEARCH = int(os.getenv('FAISS_HNSW_EF_SEARCH', 64))
+FAISS_IVF_NPROBE = int(os.getenv('FAISS_IVF_NPROBE', 16))
+
+# Embedding runtime: 'torch', 'onnx' or 'onnx-int8' (see chatbot/embedding_model.py)
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+
+# Intra-op threads per process for embedding (torch or ONNX Runtime); 0 = runtime default. With
+# GUNICORN_PRELOAD_MODEL, 0 means an even share of the CPUs per worker.
+EMBEDDING_THREADS = int(os.getenv('EMBEDDING_THREADS', 0))
+
+# Training-side embedding (see embedding_model.encode_corpus): chunks per encode batch, and the
+# intra-op threads run_training_worker pins its process to (0 = runtime default, i.e. all cores).
+# An embedded worker shares the web process's EMBEDDING_THREADS budget.
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 32))
+EMBEDDING_TRAINING_THREADS = int(os.getenv('EMBEDDING_TRAINING_THREADS', 0))
+
+# Warmup at worker start (see gunicorn.conf.py and /healthz/ready/)
+WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'True') == 'True'
+WARMUP_PRELOAD_INDEXES = int(os.getenv('WARMUP_PRELOAD_INDEXES', 8))
+
+# Document extraction worker processes (1 = extract in the training thread)
+EXTRACTION_WORKERS = int(os.getenv('EXTRACTION_WORKERS', min(4, os.cpu_count() or 1)))
+EXTRACTION_PDF_PAGES_PER_TASK = int(os.getenv('EXTRACTION_PDF_PAGES_PER_TASK', 40))
+EXTRACTION_WORKER_MEMORY_MB = int(os.getenv('EXTRACTION_WORKER_MEMORY_MB', 0))  # address-space cap per worker; 0 = none
+# Rendered pages awaiting vision; '' = system temp dir (tmpfs, i.e. memory, on Cloud Run). Extraction
+# runs at most 2 * EXTRACTION_WORKERS tasks (one when EXTRACTION_WORKERS=1) of
+# EXTRACTION_PDF_PAGES_PER_TASK pages ahead of vision.
+EXTRACTION_SPOOL_DIR = os.getenv('EXTRACTION_SPOOL_DIR', '')
+
+# URL crawling (see chatbot/url_scraper.py)
+CRAWL_CONCURRENCY = int(os.getenv('CRAWL_CONCURRENCY', 10))
+CRAWL_PER_HOST_CONCURRENCY = int(os.getenv('CRAWL_PER_HOST_CONCURRENCY', 2))
+CRAWL_PER_HOST_DELAY = float(os.getenv('CRAWL_PER_HOST_DELAY', 0.5))  # seconds between request starts to one host
+
+# Training queue (see chatbot/training_jobs.py), run by `manage.py run_training_worker` as its own
+# process. TRAINING_EMBEDDED_WORKER=True also runs a worker thread inside each web process.
+TRAINING_EMBEDDED_WORKER = os.getenv('TRAINING_EMBEDDED_WORKER', 'False') == 'True'
+TRAINING_WORKER_CONCURRENCY = int(os.getenv('TRAINING_WORKER_CONCURRENCY', 1))
+TRAINING_MAX_RUNNING = int(os.getenv('TRAINING_MAX_RUNNING', 0))  # across all workers; 0 = no limit
+TRAINING_JOB_MAX_ATTEMPTS = int(os.getenv('TRAINING_JOB_MAX_ATTEMPTS', 3))
+TRAINING_HEARTBEAT_SECONDS = int(os.getenv('TRAINING_HEARTBEAT_SECONDS', 30))
+TRAINING_JOB_STALE_SECONDS = int(os.getenv('TRAINING_JOB_STALE_SECONDS', 600))
+
+# Answer cache for bots with enable_answer_cache (keyed per training generation)
+ANSWER_CACHE_SIMILARITY = float(os.getenv('ANSWER_CACHE_SIMILARITY', 0.95))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', 200))
+ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', 24 * 3600))
 
 # Email Settings
 EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
@@ -93,7 +177,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # WhiteNoise for static files
+    'querySafe.middleware.AsyncWhiteNoiseMiddleware',  # WhiteNoise for static files (async-capable)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'querySafe.middleware.DomainRedirectMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -123,6 +207,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'querySafe.wsgi.application'
+ASGI_APPLICATION = 'querySafe.asgi.application'
 
 # Database
 # Production uses Cloud SQL PostgreSQL; local dev uses SQLite
@@ -143,6 +228,8 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': os.path.join(DATA_DIR, os.getenv("DATABASE_NAME", "db.sqlite3")),
+            # The test database is created from the models directly
+            'TEST': {'MIGRATE': False},
         }
     }
 
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import User, Chatbot, ChatbotDocument, ChatbotURL, Conversation, Message, HelpSupportRequest, ChatbotFeedback, EmailOTP, Activity, QSPlan, QSCheckout, QSBillingDetails, QSOrder, QSPlanAllot, VisionAPIUsage, BugReport, ScheduledEmail, ChatbotTemplate, ChatbotEmailReport, GoalPlan, WebSearchUsage, QSAddon, QSAddonPurchase
+from .models import User, Chatbot, ChatbotDocument, ChatbotURL, Conversation, Message, HelpSupportRequest, ChatbotFeedback, EmailOTP, Activity, QSPlan, QSCheckout, QSBillingDetails, QSOrder, QSPlanAllot, VisionAPIUsage, ChatbotUsage, TrainingJob, BugReport, ScheduledEmail, ChatbotTemplate, ChatbotEmailReport, GoalPlan, WebSearchUsage, QSAddon, QSAddonPurchase
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -185,12 +185,27 @@ class ChatbotURLAdmin(admin.ModelAdmin):
 
 @admin.register(VisionAPIUsage)
 class VisionAPIUsageAdmin(admin.ModelAdmin):
-    list_display = ('chatbot', 'call_count', 'call_type', 'created_at')
+    list_display = ('chatbot', 'call_count', 'calls_saved', 'call_type', 'created_at')
     list_filter = ('call_type', 'created_at')
     search_fields = ('chatbot__chatbot_id', 'chatbot__name')
     readonly_fields = ('created_at',)
 
 
+@admin.register(ChatbotUsage)
+class ChatbotUsageAdmin(admin.ModelAdmin):
+    list_display = ('chatbot', 'date', 'bot_messages')
+    list_filter = ('date',)
+    search_fields = ('chatbot__chatbot_id', 'chatbot__name')
+
+
+@admin.register(TrainingJob)
+class TrainingJobAdmin(admin.ModelAdmin):
+    list_display = ('chatbot', 'status', 'attempts', 'worker', 'created_at', 'started_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('chatbot__chatbot_id', 'chatbot__name')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'heartbeat_at', 'worker')
+
+
 @admin.register(BugReport)
 class BugReportAdmin(admin.ModelAdmin):
     list_display = ('report_id', 'email', 'title', 'severity', 'coupon_code', 'status', 'created_at')
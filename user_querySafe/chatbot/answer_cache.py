@@ -0,0 +1,77 @@
+"""
+Opt-in answer cache for repeated questions (Chatbot.enable_answer_cache).
+
+Entries live in the Django cache under one key per chatbot *generation* —
+the last training timestamp plus a hash of the bot instructions — so a
+retrain or an instructions edit starts a fresh namespace and stale answers
+simply age out via the TTL.
+
+A lookup first matches the normalized question text exactly, then falls
+back to the nearest cached question embedding when its cosine similarity is
+at least ANSWER_CACHE_SIMILARITY.  Callers are responsible for bypassing
+the cache when chat history or web search could change the answer.
+"""
+import hashlib
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from user_querySafe.chatbot.embedding_model import encode_query, normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+def _generation(chatbot):
+    trained = int(chatbot.last_trained_at.timestamp()) if chatbot.last_trained_at else 0
+    instructions = hashlib.sha1((chatbot.bot_instructions or '').encode('utf-8')).hexdigest()[:10]
+    return f"{trained}:{instructions}"
+
+
+def _cache_key(chatbot):
+    return f"answers:{chatbot.chatbot_id}:{_generation(chatbot)}"
+
+
+def lookup(chatbot, user_message):
+    """Return a cached {'answer', 'matches'} for this question, or None."""
+    try:
+        entries = cache.get(_cache_key(chatbot)) or []
+    except Exception:
+        logger.warning("Answer cache unavailable", exc_info=True)
+        return None
+    if not entries:
+        return None
+
+    normalized = normalize_query(user_message)
+    for entry in entries:
+        if entry['q'] == normalized:
+            return entry
+
+    # Near-duplicate question: nearest neighbour over the cached query vectors
+    query = encode_query(user_message)[0]
+    vectors = np.stack([np.frombuffer(e['v'], dtype='float32') for e in entries])
+    norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+    scores = vectors @ query / np.where(norms == 0, 1.0, norms)
+    best = int(np.argmax(scores))
+    if scores[best] >= settings.ANSWER_CACHE_SIMILARITY:
+        return entries[best]
+    return None
+
+
+def store(chatbot, user_message, answer, matches):
+    """Remember an answer for this chatbot generation (most recent first, bounded)."""
+    normalized = normalize_query(user_message)
+    entry = {
+        'q': normalized,
+        'v': encode_query(user_message)[0].tobytes(),
+        'answer': answer,
+        'matches': matches,
+    }
+    key = _cache_key(chatbot)
+    try:
+        entries = [e for e in (cache.get(key) or []) if e['q'] != normalized]
+        entries.insert(0, entry)
+        cache.set(key, entries[:settings.ANSWER_CACHE_MAX_ENTRIES], settings.ANSWER_CACHE_TTL)
+    except Exception:
+        logger.warning("Could not write to answer cache", exc_info=True)
@@ -0,0 +1,53 @@
+"""
+Content-addressed cache of Gemini vision captions.
+
+A caption is stored under SHA-256(image bytes + vision model + prompt
+version) in CAPTION_CACHE_DIR, so re-training a bot, or uploading the same
+PDF to another bot, reuses the caption instead of paying for another vision
+call.  Bump the prompt version whenever the vision prompt changes so old
+captions stop matching.
+
+Files are sharded by the first two hex digits and written via a temp file +
+os.replace(), which is safe with concurrent trainers on the shared bucket.
+"""
+import hashlib
+import logging
+import os
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def caption_key(image_bytes, model, prompt_version):
+    digest = hashlib.sha256(image_bytes)
+    digest.update(f"\n{model}\n{prompt_version}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _path(key):
+    return os.path.join(settings.CAPTION_CACHE_DIR, key[:2], f"{key}.txt")
+
+
+def get(key):
+    """Return the cached caption for `key`, or None."""
+    try:
+        with open(_path(key), "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+    except OSError:
+        logger.warning("Could not read caption cache entry %s", key, exc_info=True)
+        return None
+
+
+def put(key, caption):
+    path = _path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(caption)
+        os.replace(tmp_path, path)
+    except OSError:
+        logger.warning("Could not write caption cache entry %s", key, exc_info=True)
@@ -0,0 +1,139 @@
+"""
+Offset-indexed binary store for a chatbot's chunk metadata.
+
+Replaces {chatbot_id}-chunks.json, which had to be parsed in full to read
+the handful of chunks a query actually hits.  Layout of
+{chatbot_id}-chunks.bin (all integers little-endian):
+
+    magic     8 bytes   b"QSCHUNK1"
+    count     uint64    number of chunks
+    offsets   (count + 1) x uint64, relative to the start of the data block
+    data      one compact UTF-8 JSON object per chunk: {"content", "source"}
+
+Readers memory-map the file, so fetching chunk i touches only the offsets
+entry and the bytes of that record: O(k) time and resident memory per query
+regardless of how many chunks the bot has.  Writers always write a temp
+file and os.replace() it, so a retrain never truncates a file that another
+worker still has mapped.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"QSCHUNK1"
+_HEADER = struct.Struct("<8sQ")
+_OFFSET = struct.Struct("<Q")
+
+
+def chunk_store_path(chatbot_id):
+    return os.path.join(settings.META_DIR, f"{chatbot_id}-chunks.bin")
+
+
+def legacy_json_path(chatbot_id):
+    return os.path.join(settings.META_DIR, f"{chatbot_id}-chunks.json")
+
+
+def _normalize(entry):
+    # Very old bots stored bare strings
+    if isinstance(entry, dict):
+        return {'content': '', 'source': '', **entry}
+    return {'content': str(entry), 'source': ''}
+
+
+def write_chunk_store(path, chunk_records):
+    """Write `chunk_records` (dicts or strings) to `path` atomically."""
+    payloads = [
+        json.dumps(_normalize(r), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        for r in chunk_records
+    ]
+    offsets = [0]
+    for p in payloads:
+        offsets.append(offsets[-1] + len(p))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(payloads)))
+        f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        for p in payloads:
+            f.write(p)
+    os.replace(tmp_path, path)
+
+
+class ChunkStore:
+    """Read-only, random-access view of a chunks.bin file.
+
+    Supports len(), store[i] and store[a:b] like the list it replaces.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            try:
+                self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                # Filesystems without mmap support: fall back to one read
+                f.seek(0)
+                self._buf = f.read()
+        magic, self._count = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a chunk store")
+        self._offsets_at = _HEADER.size
+        self._data_at = self._offsets_at + (self._count + 1) * _OFFSET.size
+
+    def __len__(self):
+        return self._count
+
+    def _offset(self, i):
+        return _OFFSET.unpack_from(self._buf, self._offsets_at + i * _OFFSET.size)[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("chunk index out of range")
+        start, end = self._offset(i), self._offset(i + 1)
+        return json.loads(bytes(self._buf[self._data_at + start:self._data_at + end]))
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+
+def chunks_path(chatbot_id):
+    """Path of whichever chunk file the bot has: the binary store or legacy JSON (or None)."""
+    for path in (chunk_store_path(chatbot_id), legacy_json_path(chatbot_id)):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def open_chunks(chatbot_id):
+    """Return the bot's chunks as a ChunkStore (or a list for un-migrated
+    bots still on chunks.json), or None if the bot has never been trained."""
+    path = chunks_path(chatbot_id)
+    if path is None:
+        return None
+    if path.endswith(".bin"):
+        return ChunkStore(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def migrate_legacy_json(chatbot_id, delete_json=False):
+    """Convert a bot's chunks.json into chunks.bin. Returns the chunk count, or None if there was nothing to convert."""
+    json_path = legacy_json_path(chatbot_id)
+    if not os.path.exists(json_path):
+        return None
+    with open(json_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    write_chunk_store(chunk_store_path(chatbot_id), records)
+    if delete_json:
+        os.remove(json_path)
+    return len(records)
@@ -1,19 +1,242 @@
 """
 Singleton module for SentenceTransformer embedding model.
 Loaded lazily on first use to avoid duplicate loading across modules.
+
+The runtime is chosen by settings.EMBEDDING_BACKEND:
+  torch      PyTorch (default)
+  onnx       ONNX Runtime export of the same model
+  onnx-int8  dynamically quantized int8 ONNX export (fastest on CPU)
+The backends produce close but not identical vectors (see `manage.py
+embedding_benchmark`), so indexes must be rebuilt after switching.
+
+Query embeddings are memoised (see encode_query) because widget sample
+questions and common FAQs repeat constantly across visitors.  Training
+embeds through encode_corpus, which batches length-sorted chunks straight
+into a vector file.
 """
+import hashlib
+import logging
 import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Pre-exported ONNX files published in the model repo
+ONNX_FILES = {
+    'onnx': "onnx/model.onnx",
+    'onnx-int8': "onnx/model_quint8_avx2.onnx",
+}
+BACKENDS = ('torch',) + tuple(ONNX_FILES)
+# Lowest cosine similarity to the torch vector of the same text that each
+# backend is expected to reach (checked by embedding_benchmark and the tests)
+MIN_COSINE_VS_TORCH = {
+    'onnx': 0.999,
+    'onnx-int8': 0.97,
+}
 
 _model = None
 _lock = threading.Lock()
+_torch_threads_configured = False
+_thread_budget = None          # overrides EMBEDDING_THREADS (see set_thread_budget)
+
+# One training batch encodes at a time per process, however many jobs run
+_corpus_lock = threading.Lock()
+
+# ── Query-embedding cache ─────────────────────────────────────────────
+_query_cache = OrderedDict()   # normalized text → read-only float32 vector
+_query_cache_lock = threading.Lock()
+_query_stats = {'hits': 0, 'shared_hits': 0, 'misses': 0}
+
+
+def _threads():
+    return settings.EMBEDDING_THREADS if _thread_budget is None else _thread_budget
+
+
+def set_thread_budget(num_threads):
+    """Use `num_threads` instead of EMBEDDING_THREADS in this process.
+
+    Must be called before the model is loaded; run_training_worker does so
+    at start-up to give training its own budget (EMBEDDING_TRAINING_THREADS).
+    """
+    global _thread_budget
+    _thread_budget = num_threads
+
+
+def configure_torch_threads(num_threads=None):
+    """Set torch's intra-op thread count for this process.
+
+    Defaults to EMBEDDING_THREADS (or the set_thread_budget override); 0
+    leaves torch's own default (one thread per core), which oversubscribes
+    the CPU when several gunicorn workers encode at once.
+    """
+    global _torch_threads_configured
+    import torch
+
+    if num_threads is None:
+        num_threads = _threads()
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    _torch_threads_configured = True
+
+
+def load_embedding_model(backend):
+    """Load a fresh SentenceTransformer for `backend` (one of BACKENDS)."""
+    from sentence_transformers import SentenceTransformer
+
+    if backend == 'torch':
+        return SentenceTransformer(MODEL_NAME)
+    if backend not in ONNX_FILES:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+
+    model_kwargs = {'file_name': ONNX_FILES[backend]}
+    if _threads() > 0:
+        # ONNX Runtime keeps its own thread pool, sized when the session is created
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = _threads()
+        model_kwargs['session_options'] = options
+    return SentenceTransformer(MODEL_NAME, backend='onnx', model_kwargs=model_kwargs)
 
 
 def get_embedding_model():
-    """Return the shared SentenceTransformer instance, loading it on first call."""
+    """Return the shared SentenceTransformer instance, loading it on first call.
+
+    With GUNICORN_PRELOAD_MODEL the gunicorn master loads the model before
+    forking (see gunicorn.conf.py), so workers find it already set here and
+    share its weights copy-on-write.
+    """
     global _model
     if _model is None:
         with _lock:
             if _model is None:
-                from sentence_transformers import SentenceTransformer
-                _model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+                if settings.EMBEDDING_BACKEND == 'torch' and not _torch_threads_configured:
+                    configure_torch_threads()
+                _model = load_embedding_model(settings.EMBEDDING_BACKEND)
     return _model
+
+
+def encode_corpus(texts, path, reused=None, batch_size=None):
+    """Embed `texts` into a float32 .npy file at `path` and return it memory-mapped.
+
+    Row i holds the embedding of texts[i].  `reused` optionally lists a
+    vector (or None) per text; those rows are copied instead of encoded.
+    The remaining distinct texts are sorted by length, so each batch pads
+    to similar lengths, and encoded EMBEDDING_BATCH_SIZE at a time under a
+    process-wide lock: concurrent jobs take turns instead of multiplying
+    the thread budget, and chat queries in the same process compete with
+    one batch at most.
+    """
+    batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    model = get_embedding_model()
+    dim = model.get_sentence_embedding_dimension()
+    vectors = np.lib.format.open_memmap(path, mode="w+", dtype="float32", shape=(len(texts), dim))
+
+    rows_by_text = {}   # text → rows still to embed; repeated chunks are encoded once
+    for i, vector in enumerate(reused or [None] * len(texts)):
+        if vector is None:
+            rows_by_text.setdefault(texts[i], []).append(i)
+        else:
+            vectors[i] = vector
+    pending = sorted(rows_by_text, key=len)
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        with _corpus_lock:
+            encoded = model.encode(batch, batch_size=batch_size, show_progress_bar=False)
+        for text, vector in zip(batch, encoded):
+            vectors[rows_by_text[text]] = vector
+    vectors.flush()
+    return vectors
+
+
+def model_id():
+    """Identifies the vectors this process produces: model plus backend.
+
+    Stored vectors (query cache, embedding store, training manifest) are
+    only reused under the same id.
+    """
+    return f"{MODEL_NAME}:{settings.EMBEDDING_BACKEND}"
+
+
+def normalize_query(text):
+    """Canonical cache key for a query.
+
+    MiniLM-L6 uses an uncased tokenizer that ignores runs of whitespace, so
+    lower-casing and collapsing whitespace never changes the embedding.
+    """
+    return " ".join(text.split()).lower()
+
+
+def _shared_cache_key(normalized):
+    digest = hashlib.sha256(f"{model_id()}\n{normalized}".encode("utf-8")).hexdigest()
+    return f"qemb:{digest}"
+
+
+def _remember(normalized, vector):
+    with _query_cache_lock:
+        _query_cache[normalized] = vector
+        _query_cache.move_to_end(normalized)
+        while len(_query_cache) > settings.QUERY_EMBEDDING_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+
+
+def encode_query(text):
+    """Return the (1, dim) float32 embedding for a chat query.
+
+    Looks in the in-process LRU first, then (if QUERY_EMBEDDING_SHARED_CACHE
+    is on) the Django cache shared between workers, and only runs the model
+    on a miss.
+    """
+    normalized = normalize_query(text)
+
+    with _query_cache_lock:
+        vector = _query_cache.get(normalized)
+        if vector is not None:
+            _query_cache.move_to_end(normalized)
+            _query_stats['hits'] += 1
+            return vector
+
+    shared_key = None
+    if settings.QUERY_EMBEDDING_SHARED_CACHE:
+        from django.core.cache import cache
+        shared_key = _shared_cache_key(normalized)
+        try:
+            raw = cache.get(shared_key)
+        except Exception:
+            logger.warning("Shared query-embedding cache unavailable", exc_info=True)
+            raw = None
+        if raw is not None:
+            vector = np.frombuffer(raw, dtype="float32").reshape(1, -1)
+            _remember(normalized, vector)
+            with _query_cache_lock:
+                _query_stats['shared_hits'] += 1
+            return vector
+
+    vector = get_embedding_model().encode([normalized]).astype("float32")
+    vector.setflags(write=False)  # shared across requests — must not be mutated
+    _remember(normalized, vector)
+    with _query_cache_lock:
+        _query_stats['misses'] += 1
+
+    if shared_key is not None:
+        try:
+            from django.core.cache import cache
+            cache.set(shared_key, vector.tobytes(), settings.QUERY_EMBEDDING_SHARED_TTL)
+        except Exception:
+            logger.warning("Could not write to shared query-embedding cache", exc_info=True)
+    return vector
+
+
+def query_cache_stats():
+    """Hit/miss counters and occupancy of the query-embedding cache."""
+    with _query_cache_lock:
+        stats = dict(_query_stats)
+        stats['entries'] = len(_query_cache)
+    lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+    stats['hit_rate'] = (stats['hits'] + stats['shared_hits']) / lookups if lookups else 0.0
+    return stats
@@ -0,0 +1,128 @@
+"""
+Content-addressed store of chunk embeddings shared by all chatbots.
+
+A vector is stored under SHA-256(model id + chunk text), where the model
+id names both the model and the runtime backend (see
+embedding_model.model_id), so a brochure or policy PDF uploaded to several
+bots, or a bot created from a template, is embedded once and its chunks
+are looked up afterwards.  The
+training manifest already skips unchanged sources within one bot; this
+store covers identical text across bots and across changed sources.
+
+The store is a single SQLite table in EMBEDDING_STORE_PATH:
+
+    embeddings(key BLOB PRIMARY KEY, vector BLOB, used_at INTEGER)
+
+`vector` is the raw float32 bytes.  Every _TRIM_EVERY rows written by a
+thread, the table size is checked and, past EMBEDDING_STORE_MAX_ENTRIES,
+the least recently used rows are dropped.  The store is disabled unless
+EMBEDDING_STORE_PATH is set, and is an optimisation only: any SQLite error
+is logged and treated as a miss.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from user_querySafe.chatbot.embedding_model import model_id
+
+logger = logging.getLogger(__name__)
+
+# Stay under SQLite's host-parameter limit on older builds (999)
+_QUERY_BATCH = 500
+# Rows a thread writes between size checks (count(*) scans the whole table)
+_TRIM_EVERY = 1000
+
+_local = threading.local()
+
+
+def chunk_key(text, model=None):
+    digest = hashlib.sha256(f"{model or model_id()}\n".encode("utf-8"))
+    digest.update(text.encode("utf-8"))
+    return digest.digest()
+
+
+def _connection():
+    """This thread's connection to the store, or None when it is disabled."""
+    path = settings.EMBEDDING_STORE_PATH
+    if not path:
+        return None
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.path == path:
+        return conn
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS embeddings ("
+        "key BLOB PRIMARY KEY, vector BLOB NOT NULL, used_at INTEGER NOT NULL) WITHOUT ROWID"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS embeddings_used_at ON embeddings (used_at)")
+    conn.commit()
+    _local.conn, _local.path = conn, path
+    _local.unchecked_rows = _TRIM_EVERY  # check the size on this thread's first write
+    return conn
+
+
+def get_many(keys):
+    """Return {key: float32 vector} for the keys found in the store."""
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    try:
+        conn = _connection()
+        if conn is None:
+            return {}
+        found = {}
+        for start in range(0, len(keys), _QUERY_BATCH):
+            batch = keys[start:start + _QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype="float32")
+        if found:
+            now = int(time.time())
+            with conn:
+                conn.executemany("UPDATE embeddings SET used_at = ? WHERE key = ?", [(now, k) for k in found])
+        return found
+    except sqlite3.Error:
+        logger.warning("Embedding store unavailable; embedding every chunk", exc_info=True)
+        return {}
+
+
+def put_many(items):
+    """Store (key, vector) pairs, trimming the table to EMBEDDING_STORE_MAX_ENTRIES now and then."""
+    now = int(time.time())
+    rows = [(key, np.asarray(vector, dtype="float32").tobytes(), now) for key, vector in items]
+    if not rows:
+        return
+    try:
+        conn = _connection()
+        if conn is None:
+            return
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, used_at) VALUES (?, ?, ?)", rows)
+        _local.unchecked_rows += len(rows)
+        if _local.unchecked_rows >= _TRIM_EVERY:
+            _trim(conn)
+            _local.unchecked_rows = 0
+    except sqlite3.Error:
+        logger.warning("Could not write to the embedding store", exc_info=True)
+
+
+def _trim(conn):
+    """Drop the least recently used rows beyond EMBEDDING_STORE_MAX_ENTRIES."""
+    with conn:
+        excess = conn.execute("SELECT count(*) FROM embeddings").fetchone()[0] - settings.EMBEDDING_STORE_MAX_ENTRIES
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY used_at LIMIT ?)", (excess,),
+            )
@@ -0,0 +1,134 @@
+"""
+Process-wide LRU cache of loaded FAISS indexes and chunk metadata.
+
+chat_message used to read the index and parse the whole chunks JSON from
+INDEX_DIR / META_DIR (the GCS-mounted bucket in production) on every turn.
+Entries here are keyed per chatbot and validated against the mtime/size of
+both files, so a retrain (which rewrites them) is picked up automatically by
+every worker.  The pipeline also calls invalidate() after writing so the
+training process itself never serves a stale entry.
+
+Chunk metadata is a memory-mapped ChunkStore (see chunk_store.py), so only
+bots not yet migrated off chunks.json hold their chunks in memory.  The
+cache is bounded both by entry count and by an approximate memory budget
+(index size + in-memory chunk metadata).
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import faiss
+from django.conf import settings
+
+from user_querySafe.chatbot.chunk_store import chunks_path, open_chunks
+from user_querySafe.chatbot.index_factory import apply_search_params, read_index_info
+
+logger = logging.getLogger(__name__)
+
+_cache = OrderedDict()   # chatbot_id → (signature, index, chunk_data, nbytes)
+_lock = threading.Lock()
+_total_bytes = 0
+
+
+def index_paths(chatbot_id):
+    """Return (index_path, meta_path) for a chatbot; meta_path is None if there are no chunks."""
+    return (
+        os.path.join(settings.INDEX_DIR, f"{chatbot_id}-index.index"),
+        chunks_path(chatbot_id),
+    )
+
+
+def _signature(*paths):
+    """(mtime_ns, size) of every path — changes whenever a retrain rewrites them."""
+    sig = []
+    for path in paths:
+        st = os.stat(path)
+        sig.append((st.st_mtime_ns, st.st_size))
+    return tuple(sig)
+
+
+def _estimate_bytes(index_path, meta_path):
+    """Rough resident size: the serialized index (close to its in-memory
+    size for flat, HNSW and IVF-PQ alike) plus legacy JSON metadata, which
+    is parsed into memory.  A mapped ChunkStore only costs the pages read."""
+    paths = [index_path] if meta_path.endswith('.bin') else [index_path, meta_path]
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+def _evict_locked():
+    """Drop least-recently-used entries until within both limits. Caller holds _lock."""
+    global _total_bytes
+    max_entries = settings.INDEX_CACHE_MAX_ENTRIES
+    max_bytes = settings.INDEX_CACHE_MAX_BYTES
+    while _cache and (len(_cache) > max_entries or _total_bytes > max_bytes):
+        evicted_id, (_, _, _, nbytes) = _cache.popitem(last=False)
+        _total_bytes -= nbytes
+        logger.debug("Evicted index cache entry for chatbot %s (%d bytes)", evicted_id, nbytes)
+
+
+def get_index_and_chunks(chatbot_id):
+    """Return (faiss_index, chunk_data) for a chatbot, or (None, None) if not trained.
+
+    Served from memory when the on-disk files are unchanged since they were
+    loaded; otherwise re-read and re-cached.
+    """
+    global _total_bytes
+    index_path, meta_path = index_paths(chatbot_id)
+    try:
+        if meta_path is None:
+            raise FileNotFoundError(chatbot_id)
+        sig = _signature(index_path, meta_path)
+    except FileNotFoundError:
+        invalidate(chatbot_id)
+        return None, None
+
+    with _lock:
+        entry = _cache.get(chatbot_id)
+        if entry is not None and entry[0] == sig:
+            _cache.move_to_end(chatbot_id)
+            return entry[1], entry[2]
+
+    # Load outside the lock so one slow bucket read doesn't block other bots
+    index = faiss.read_index(index_path)
+    apply_search_params(index, read_index_info(chatbot_id))
+    chunk_data = open_chunks(chatbot_id)
+    if chunk_data is None:
+        return None, None
+    nbytes = _estimate_bytes(index_path, meta_path)
+
+    with _lock:
+        old = _cache.pop(chatbot_id, None)
+        if old is not None:
+            _total_bytes -= old[3]
+        if nbytes <= settings.INDEX_CACHE_MAX_BYTES:
+            _cache[chatbot_id] = (sig, index, chunk_data, nbytes)
+            _total_bytes += nbytes
+            _evict_locked()
+    return index, chunk_data
+
+
+def invalidate(chatbot_id):
+    """Forget any cached index/metadata for a chatbot (e.g. after retraining)."""
+    global _total_bytes
+    with _lock:
+        entry = _cache.pop(chatbot_id, None)
+        if entry is not None:
+            _total_bytes -= entry[3]
+
+
+def cache_stats():
+    """Return a snapshot of cache occupancy for diagnostics."""
+    with _lock:
+        return {
+            'entries': len(_cache),
+            'bytes': _total_bytes,
+            'max_entries': settings.INDEX_CACHE_MAX_ENTRIES,
+            'max_bytes': settings.INDEX_CACHE_MAX_BYTES,
+        }
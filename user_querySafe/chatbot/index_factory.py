@@ -0,0 +1,144 @@
+"""
+FAISS index selection by corpus size.
+
+Small bots keep an exact IndexFlatL2 — a linear scan over a few thousand
+vectors is already well under a millisecond.  Larger corpora get an HNSW
+graph while it fits the per-index memory budget, and IVF-PQ (compressed
+codes, ~50 bytes per vector) beyond that.  All three use L2 distance, so
+the distance threshold in chat retrieval keeps its meaning.
+
+The choice is written next to the index as {chatbot_id}-index.json, and
+apply_search_params() restores the search-time knobs (nprobe / efSearch)
+that faiss doesn't persist reliably across versions.
+"""
+import json
+import logging
+import math
+import os
+
+import faiss
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FLAT = 'flat'
+HNSW = 'hnsw'
+IVFPQ = 'ivfpq'
+INDEX_TYPES = (FLAT, HNSW, IVFPQ)
+
+# IVF-PQ needs enough points to train its coarse quantizer and codebooks
+_IVFPQ_MIN_VECTORS = 10000
+# ...but gains nothing from more than ~256 per list, so larger corpora train on a sample
+_IVFPQ_TRAIN_POINTS_PER_LIST = 256
+# Rows copied into the index per add() call
+_ADD_BATCH = 16384
+
+
+def index_info_path(chatbot_id):
+    return os.path.join(settings.INDEX_DIR, f"{chatbot_id}-index.json")
+
+
+def estimate_bytes(index_type, n, dim):
+    """Approximate resident size of an index of `n` vectors."""
+    if index_type == HNSW:
+        # vectors + level-0 neighbour lists (2*M int32) + upper levels (~1/M of that again)
+        m = settings.FAISS_HNSW_M
+        return n * (dim * 4 + 2 * m * 4 * (1 + 1 / m))
+    if index_type == IVFPQ:
+        return n * (_pq_subquantizers(dim) + 8) + _ivf_lists(n) * dim * 4
+    return n * dim * 4
+
+
+def choose_index_type(n, dim, memory_budget=None):
+    """Pick FLAT, HNSW or IVFPQ for `n` vectors of dimension `dim`."""
+    if memory_budget is None:
+        memory_budget = settings.FAISS_INDEX_MEMORY_MB * 1024 * 1024
+    if n <= settings.FAISS_FLAT_MAX_VECTORS:
+        return FLAT
+    if estimate_bytes(HNSW, n, dim) <= memory_budget or n < _IVFPQ_MIN_VECTORS:
+        return HNSW
+    return IVFPQ
+
+
+def _ivf_lists(n):
+    # ~4*sqrt(n) lists, but at least 39 training points per list
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def _pq_subquantizers(dim):
+    # 8 dimensions per 8-bit code (48 bytes/vector for MiniLM's 384 dims)
+    for m in (dim // 8, dim // 4, dim // 2, dim):
+        if m and dim % m == 0:
+            return m
+    return 1
+
+
+def _training_sample(embeddings, nlist):
+    n = len(embeddings)
+    size = min(n, max(_IVFPQ_MIN_VECTORS, nlist * _IVFPQ_TRAIN_POINTS_PER_LIST))
+    if size == n:
+        return np.ascontiguousarray(embeddings, dtype="float32")
+    rows = np.sort(np.random.default_rng(0).choice(n, size=size, replace=False))
+    return np.ascontiguousarray(embeddings[rows], dtype="float32")
+
+
+def build_index(embeddings, index_type=None):
+    """Build and populate an index for `embeddings`.
+
+    `embeddings` may be a memory-mapped array (see encode_corpus): it is
+    added in slices, so only one slice at a time is copied into memory
+    besides the index itself.
+
+    Returns (index, info) where info records the type and parameters and is
+    what write_index_info() stores alongside the index.
+    """
+    n, dim = embeddings.shape
+    if index_type is None:
+        index_type = choose_index_type(n, dim)
+
+    info = {'type': index_type, 'ntotal': n, 'dim': dim}
+    if index_type == HNSW:
+        index = faiss.IndexHNSWFlat(dim, settings.FAISS_HNSW_M)
+        index.hnsw.efConstruction = settings.FAISS_HNSW_EF_CONSTRUCTION
+        info.update(m=settings.FAISS_HNSW_M, ef_search=settings.FAISS_HNSW_EF_SEARCH)
+    elif index_type == IVFPQ:
+        nlist = _ivf_lists(n)
+        m = _pq_subquantizers(dim)
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, 8)
+        index.train(_training_sample(embeddings, nlist))
+        info.update(nlist=nlist, pq_m=m, nprobe=settings.FAISS_IVF_NPROBE)
+    else:
+        index = faiss.IndexFlatL2(dim)
+
+    for start in range(0, n, _ADD_BATCH):
+        index.add(np.ascontiguousarray(embeddings[start:start + _ADD_BATCH], dtype="float32"))
+    apply_search_params(index, info)
+    return index, info
+
+
+def apply_search_params(index, info):
+    """Set search-time parameters recorded in `info` (or the current settings)."""
+    index_type = (info or {}).get('type', FLAT)
+    if index_type == HNSW:
+        faiss.downcast_index(index).hnsw.efSearch = info.get('ef_search', settings.FAISS_HNSW_EF_SEARCH)
+    elif index_type == IVFPQ:
+        faiss.extract_index_ivf(index).nprobe = info.get('nprobe', settings.FAISS_IVF_NPROBE)
+
+
+def write_index_info(chatbot_id, info):
+    with open(index_info_path(chatbot_id), "w", encoding="utf-8") as f:
+        json.dump(info, f)
+
+
+def read_index_info(chatbot_id):
+    """Stored index info, or {'type': 'flat'} for indexes built before the factory existed."""
+    try:
+        with open(index_info_path(chatbot_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'type': FLAT}
+    except (OSError, ValueError):
+        logger.warning("Unreadable index info for chatbot %s; assuming flat", chatbot_id, exc_info=True)
+        return {'type': FLAT}
@@ -0,0 +1,69 @@
+"""
+Screening of PDF pages before Gemini vision.
+
+Pages headed for vision are first rendered small in grayscale to measure
+ink coverage (blank pages are skipped) and to compute a difference hash.
+Pages built from one template — invoices, forms, letterheads — often share
+that coarse hash while their text differs, so it only narrows the search:
+a page counts as a duplicate of an earlier one only when the SHA-256 of
+its full-resolution render matches exactly.
+"""
+import hashlib
+
+import fitz
+from PIL import Image
+
+# Low-res grayscale render used for ink coverage and the difference hash (HASH_SIZE² bits)
+SCREEN_DPI = 36
+INK_THRESHOLD = 200          # gray level below which a pixel counts as ink
+HASH_SIZE = 16
+# Resolution of the PNG sent to vision
+RENDER_DPI = 150
+
+
+def screen_page(page):
+    """Return (ink_ratio, coarse_hash) from a small grayscale render of `page`.
+
+    ink_ratio is the fraction of dark pixels; coarse_hash is a hex difference
+    hash that is identical for the same scan at slightly different quality
+    (and for different pages with the same layout).
+    """
+    pix = page.get_pixmap(dpi=SCREEN_DPI, colorspace=fitz.csGRAY, alpha=False)
+    img = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    histogram = img.histogram()
+    ink_ratio = sum(histogram[:INK_THRESHOLD]) / max(1, pix.width * pix.height)
+
+    small = img.resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    pixels = small.load()
+    bits = 0
+    for y in range(HASH_SIZE):
+        for x in range(HASH_SIZE):
+            bits = (bits << 1) | (pixels[x, y] > pixels[x + 1, y])
+    return ink_ratio, f"{bits:0{HASH_SIZE * HASH_SIZE // 4}x}"
+
+
+def render_page(page, path):
+    """Render `page` to a PNG at `path` for vision; return the SHA-256 of its pixels."""
+    pix = page.get_pixmap(dpi=RENDER_DPI)
+    digest = hashlib.sha256(pix.samples).hexdigest()
+    pix.save(path)
+    return digest
+
+
+class DuplicatePages:
+    """Pages seen so far in a training run, keyed by (coarse_hash, digest)."""
+
+    def __init__(self):
+        self._seen = {}  # coarse hash → [(digest, label)]
+
+    def match(self, page_hash):
+        """Label of an earlier page with exactly the same render, or None."""
+        coarse, digest = page_hash
+        for seen_digest, label in self._seen.get(coarse, ()):
+            if seen_digest == digest:
+                return label
+        return None
+
+    def add(self, page_hash, label):
+        coarse, digest = page_hash
+        self._seen.setdefault(coarse, []).append((digest, label))
@@ -7,25 +7,35 @@ Optimised flow
 1. Classify files → text-based (PDF, DOCX, TXT) vs image-based (JPG, PNG …)
 2. Extract text directly from text-based files (PyMuPDF / python-docx / open)
    • Scanned PDF pages (< 50 chars) fall back to Gemini vision.
-3. Use Gemini vision only for images + scanned pages (concurrent calls).
+   • Runs in a pool of EXTRACTION_WORKERS processes; big PDFs are split
+     into page ranges so one large upload doesn't serialise the run.
+   • Pages are rendered one at a time and spooled to disk as PNGs, so
+     memory doesn't grow with the number of scanned pages.
+   • Blank pages are dropped and pages that look identical (perceptual
+     hash) are captioned once per training run.
+3. Use Gemini vision only for images + scanned pages (concurrent calls,
+   with a bounded number of images loaded at once), paced by the shared
+   rate-limit-aware vision dispatcher.
 4. Chunk all extracted text → embed → FAISS index.
 """
 
 import os
 import re
-import json
 import logging
 import base64
 import platform
 import subprocess
 import io
+import shutil
+import tempfile
 import time
-from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import multiprocessing
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
 
 import fitz
 import faiss
-import numpy as np
 from PIL import Image
 from docx import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -33,7 +43,13 @@ from google import genai
 
 from django.conf import settings
 from django.utils import timezone
-from user_querySafe.chatbot.embedding_model import get_embedding_model
+from user_querySafe.chatbot import caption_cache, embedding_store, training_manifest
+from user_querySafe.chatbot.chunk_store import chunk_store_path, legacy_json_path, write_chunk_store
+from user_querySafe.chatbot.embedding_model import encode_corpus
+from user_querySafe.chatbot.index_cache import invalidate as invalidate_index_cache
+from user_querySafe.chatbot.index_factory import build_index, write_index_info
+from user_querySafe.chatbot.page_screen import DuplicatePages, render_page, screen_page
+from user_querySafe.chatbot.vision_dispatcher import get_dispatcher
 
 logger = logging.getLogger(__name__)
 
@@ -61,63 +77,119 @@ TEXT_DOC_EXTENSIONS = {'.pdf', '.doc', '.docx', '.txt', '.xlsx', '.xls'}
 # Minimum characters per PDF page to consider it text-based (not scanned)
 MIN_TEXT_CHARS = 50
 
+# Pages crawled per training run across all URL / sitemap sources
+MAX_CRAWL_PAGES = 50
+
 # ── Gemini vision prompt ──────────────────────────────────────────────
+# Part of the caption cache key: bump whenever the prompts below change
+VISION_PROMPT_VERSION = 1
+
+_VISION_INSTRUCTIONS = (
+    "You are a visual analysis expert. Extract and describe every element "
+    "in the image including:\n"
+    "- Text (as-is)\n"
+    "- Tables (as plain readable text)\n"
+    "- Charts/graphs (with insights and data)\n"
+    "- Images/diagrams (detailed description)\n"
+    "Output must be clean, complete, and human-readable."
+)
+
+# Separates the per-image sections of a batched vision reply
+_BATCH_MARKER_RE = re.compile(r"^=== IMAGE (\d+) ===[ \t]*$", re.MULTILINE)
+
+
 def _build_vision_prompt(image_data, mime_type="image/png"):
     return [{
         "role": "user",
         "parts": [
-            {
-                "text": (
-                    "You are a visual analysis expert. Extract and describe every element "
-                    "in the image including:\n"
-                    "- Text (as-is)\n"
-                    "- Tables (as plain readable text)\n"
-                    "- Charts/graphs (with insights and data)\n"
-                    "- Images/diagrams (detailed description)\n"
-                    "Output must be clean, complete, and human-readable."
-                )
-            },
+            {"text": _VISION_INSTRUCTIONS},
             {"inline_data": {"mime_type": mime_type, "data": image_data}},
         ]
     }]
 
 
+def _build_batch_vision_prompt(images):
+    """One request for several (b64, mime) images, answered image by image."""
+    parts = [{
+        "text": (
+            f"{_VISION_INSTRUCTIONS}\n\n"
+            f"You are given {len(images)} separate images. Handle each one "
+            "independently and in order. Start the output for image N with a "
+            "line containing only '=== IMAGE N ===' (N from 1), then its content."
+        )
+    }]
+    for n, (image_data, mime_type) in enumerate(images, 1):
+        parts.append({"text": f"Image {n}:"})
+        parts.append({"inline_data": {"mime_type": mime_type, "data": image_data}})
+    return [{"role": "user", "parts": parts}]
+
+
+def _split_batch_response(text, count):
+    """Split a batched reply into `count` captions, or None if it isn't well-formed."""
+    sections = _BATCH_MARKER_RE.split(text)
+    # ['preamble', '1', 'caption 1', '2', 'caption 2', ...]
+    numbers = [int(n) for n in sections[1::2]]
+    if numbers != list(range(1, count + 1)):
+        return None
+    captions = [caption.strip() for caption in sections[2::2]]
+    if not all(captions):
+        return None
+    return captions
+
+
 # =====================================================================
 # STEP 1 — Classify & extract text
 # =====================================================================
 
-def _extract_text_from_pdf(file_path):
-    """Extract text from a PDF.  Returns (text, scanned_page_images).
+def _iter_pdf_pages(file_path, page_range=None, spool_dir=None):
+    """Yield (page_num, page_text, image_path, page_hash) one page at a time.
+
+    image_path is set for pages that need Gemini vision: text below
+    MIN_TEXT_CHARS (likely scanned), or embedded images with limited text
+    (charts/diagrams), unless the page is blank (ink coverage below
+    VISION_BLANK_INK_RATIO).  The page is rendered straight to a PNG in
+    `spool_dir`, so no rendered page outlives its loop iteration in memory;
+    page_hash, (coarse_hash, sha256 of the render), lets the caller skip
+    duplicate pages (see page_screen.DuplicatePages).
+    Without a spool_dir only text is extracted.
+    page_range: optional (start, stop) page numbers to extract.
+    """
+    with fitz.open(file_path) as doc:
+        start, stop = page_range or (0, len(doc))
+        for page_num in range(start, min(stop, len(doc))):
+            page = doc.load_page(page_num)
+            page_text = page.get_text("text").strip()
+            needs_vision = (
+                len(page_text) < MIN_TEXT_CHARS
+                or (len(page_text) < 500 and page.get_images(full=True))
+            )
+            image_path = page_hash = None
+            if needs_vision and spool_dir:
+                ink_ratio, coarse_hash = screen_page(page)
+                if ink_ratio >= settings.VISION_BLANK_INK_RATIO:
+                    image_path = os.path.join(spool_dir, f"{os.path.basename(file_path)}.page{page_num + 1}.png")
+                    page_hash = (coarse_hash, render_page(page, image_path))
+            yield page_num, page_text, image_path, page_hash
+
 
-    scanned_page_images is a list of (page_label, base64_png) for pages
-    where extracted text was below MIN_TEXT_CHARS (likely scanned), or
-    pages that have embedded images with limited text (charts/diagrams).
+def _extract_text_from_pdf(file_path, page_range=None, spool_dir=None):
+    """Extract text from a PDF.  Returns (text, scanned_pages, blank_pages).
+
+    scanned_pages is a list of (page_label, png_path, page_hash) for the
+    pages _iter_pdf_pages() rendered for Gemini vision; blank_pages counts
+    the pages that would have gone to vision but were blank.
     """
     text_parts = []
     scanned_pages = []
-    doc = fitz.open(file_path)
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        page_text = page.get_text("text").strip()
-        page_images = page.get_images(full=True)
-
+    blank_pages = 0
+    for page_num, page_text, image_path, page_hash in _iter_pdf_pages(file_path, page_range, spool_dir):
         if len(page_text) >= MIN_TEXT_CHARS:
             text_parts.append(f"\n--- Page {page_num + 1} ---\n{page_text}")
-            # If page has embedded images and limited text, also send to
-            # Gemini vision so charts/diagrams are described.
-            if page_images and len(page_text) < 500:
-                pix = page.get_pixmap(dpi=150)
-                img_bytes = pix.tobytes("png")
-                b64 = base64.b64encode(img_bytes).decode("utf-8")
-                scanned_pages.append((f"page{page_num + 1}", b64))
-        else:
-            # Scanned / image-heavy page → render to image for Gemini
-            pix = page.get_pixmap(dpi=150)
-            img_bytes = pix.tobytes("png")
-            b64 = base64.b64encode(img_bytes).decode("utf-8")
-            scanned_pages.append((f"page{page_num + 1}", b64))
-    doc.close()
-    return "\n".join(text_parts), scanned_pages
+        if image_path:
+            scanned_pages.append((f"page{page_num + 1}", image_path, page_hash))
+        elif page_hash is None and spool_dir and len(page_text) < MIN_TEXT_CHARS:
+            blank_pages += 1
+    return "\n".join(text_parts), scanned_pages, blank_pages
 
 
 def _extract_text_from_docx(file_path):
@@ -184,58 +256,263 @@ def _extract_text_from_excel(file_path):
     return "\n".join(parts)
 
 
-def _image_to_base64(file_path):
-    """Load an image file and return (base64_str, mime_type)."""
+def _image_mime_type(file_path):
     ext = os.path.splitext(file_path)[1].lower()
     mime_map = {
         '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg',
         '.png': 'image/png', '.gif': 'image/gif', '.bmp': 'image/bmp',
     }
-    mime = mime_map.get(ext, 'image/png')
-    with open(file_path, "rb") as f:
-        b64 = base64.b64encode(f.read()).decode("utf-8")
-    return b64, mime
+    return mime_map.get(ext, 'image/png')
+
+
+# =====================================================================
+# STEP 1b — Parallel extraction (process pool)
+# =====================================================================
+
+def _extract_file(file_path, page_range=None, spool_dir=None):
+    """Extract one file, or one page range of a PDF.
+
+    Runs in an extraction worker process, so it only touches the file (and
+    spool_dir for rendered pages) and returns plain picklable data:
+    {'text': str, 'scanned_pages': [(label, png_path, page_hash)],
+     'blank_pages': int, 'image': (path, mime) | None}
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    result = {'text': '', 'scanned_pages': [], 'blank_pages': 0, 'image': None}
+    if ext == '.pdf':
+        result['text'], result['scanned_pages'], result['blank_pages'] = _extract_text_from_pdf(
+            file_path, page_range, spool_dir,
+        )
+    elif ext == '.docx':
+        result['text'] = _extract_text_from_docx(file_path)
+    elif ext == '.doc':
+        result['text'] = _convert_doc_to_text(file_path) or ''
+    elif ext == '.txt':
+        result['text'] = _extract_text_from_txt(file_path)
+    elif ext in {'.xlsx', '.xls'}:
+        result['text'] = _extract_text_from_excel(file_path)
+    elif ext in IMAGE_EXTENSIONS:
+        result['image'] = (file_path, _image_mime_type(file_path))
+    return result
+
+
+def _extraction_ranges(file_path):
+    """Page ranges to extract a file in: one per EXTRACTION_PDF_PAGES_PER_TASK pages of a PDF, else one.
+
+    PDFs are split even without parallel workers, so pages reach vision
+    (and leave the spool) one range at a time.
+    """
+    pages_per_task = settings.EXTRACTION_PDF_PAGES_PER_TASK
+    if not file_path.lower().endswith('.pdf') or pages_per_task <= 0:
+        return [None]
+    try:
+        with fitz.open(file_path) as doc:
+            page_count = len(doc)
+    except Exception:
+        return [None]  # let the extraction itself report the problem
+    if page_count <= pages_per_task:
+        return [None]
+    return [(start, start + pages_per_task) for start in range(0, page_count, pages_per_task)]
+
+
+def _init_extraction_worker(memory_mb):
+    import django
+    django.setup()
+    if memory_mb:
+        # Cap the worker's address space so one pathological file fails with
+        # MemoryError instead of taking the whole instance down
+        import resource
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _iter_extraction(tasks, spool_dir):
+    """Run [(file_path, page_range)] through _extract_file, yielding (result, error) in task order.
+
+    Uses a process pool of EXTRACTION_WORKERS (parsing is CPU-bound and
+    holds the GIL).  Tasks are submitted as results are consumed, at most
+    2 * EXTRACTION_WORKERS ahead, so pages rendered into spool_dir pile up
+    only as far as the consumer (vision) lags behind, however many pages
+    the upload has.
+    """
+    workers = min(settings.EXTRACTION_WORKERS, len(tasks))
+    if workers <= 1:
+        for file_path, page_range in tasks:
+            try:
+                yield _extract_file(file_path, page_range, spool_dir), None
+            except Exception as e:
+                logger.exception("Error processing %s", file_path)
+                yield None, e
+        return
+
+    # spawn, not fork: the parent has live threads (heartbeat, Gemini client)
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_extraction_worker,
+        initargs=(settings.EXTRACTION_WORKER_MEMORY_MB,),
+    )
+    remaining = iter(tasks)
+    pending = deque()
+
+    def submit_next():
+        task = next(remaining, None)
+        if task is not None:
+            file_path, page_range = task
+            pending.append((file_path, pool.submit(_extract_file, file_path, page_range, spool_dir)))
+
+    try:
+        for _ in range(2 * workers):
+            submit_next()
+        while pending:
+            file_path, future = pending.popleft()
+            submit_next()
+            try:
+                outcome = future.result(), None
+            except Exception as e:
+                logger.warning("Error processing %s: %s", file_path, e)
+                outcome = None, e
+            yield outcome
+    finally:
+        pool.shutdown(cancel_futures=True)
 
 
 # =====================================================================
 # STEP 2 — Gemini vision for images (concurrent)
 # =====================================================================
 
-def _caption_single_image(b64_data, mime_type, label):
-    """Send one image to Gemini and return (label, caption_text)."""
+def _caption_single_image(b64_data, mime_type, label, cache_key=None):
+    """Send one image to Gemini and return (label, caption_text, ok).
+
+    Throttling and transient errors are retried by the vision dispatcher;
+    successful captions are stored in the caption cache under `cache_key`.
+    """
     try:
         prompt = _build_vision_prompt(b64_data, mime_type)
-        response = client.models.generate_content(
-            model=settings.GEMINI_VISION_MODEL,
-            contents=prompt,
+        response = get_dispatcher(settings.GEMINI_VISION_MODEL).call(
+            lambda: client.models.generate_content(
+                model=settings.GEMINI_VISION_MODEL,
+                contents=prompt,
+            )
         )
-        return label, response.text.strip()
+        caption = response.text.strip()
+        if cache_key:
+            caption_cache.put(cache_key, caption)
+        return label, caption, True
     except Exception as e:
         logger.warning("Gemini vision failed for %s: %s", label, e)
-        return label, f"[Error extracting from {label}: {e}]"
+        return label, f"[Error extracting from {label}: {e}]", False
+
 
+def _caption_batch(batch):
+    """Caption [(label, b64, mime, cache_key)] with a single request.
 
-def _caption_images_concurrent(image_items, max_workers=3):
-    """Process a list of (label, b64, mime) tuples concurrently.
-    Returns combined text string.
+    Falls back to one request per image when the batched call fails or its
+    reply can't be split into one caption per image.  Returns
+    ([(label, caption_text, ok)], api_calls).
+    """
+    if len(batch) == 1:
+        label, b64, mime, key = batch[0]
+        return [_caption_single_image(b64, mime, label, key)], 1
+
+    captions = None
+    try:
+        prompt = _build_batch_vision_prompt([(b64, mime) for _, b64, mime, _ in batch])
+        response = get_dispatcher(settings.GEMINI_VISION_MODEL).call(
+            lambda: client.models.generate_content(
+                model=settings.GEMINI_VISION_MODEL,
+                contents=prompt,
+            )
+        )
+        captions = _split_batch_response(response.text or "", len(batch))
+        if captions is None:
+            logger.warning("Unparseable batched vision reply for %s; retrying per image", batch[0][0])
+    except Exception as e:
+        logger.warning("Batched Gemini vision failed for %s: %s; retrying per image", batch[0][0], e)
+
+    if captions is None:
+        return [_caption_single_image(b64, mime, label, key) for label, b64, mime, key in batch], 1 + len(batch)
+
+    results = []
+    for (label, _, _, key), caption in zip(batch, captions):
+        caption_cache.put(key, caption)
+        results.append((label, caption, True))
+    return results, 1
+
+
+def _caption_images_concurrent(image_items, max_workers=None, batch_size=None, spool_dir=None):
+    """Caption an iterable of (label, image_path, mime) tuples concurrently.
+
+    Images already captioned (by any bot) come from the caption cache; the
+    rest are sent to Gemini in requests of up to batch_size images
+    (VISION_PAGES_PER_REQUEST).  Each image is read from disk just before
+    it is submitted (and deleted, if it lives in spool_dir), and at most
+    2 * max_workers requests are held in memory at once.  image_items is
+    consumed lazily, so a generator fed by extraction is only advanced when
+    there is room: a long scanned PDF costs the same memory as a short one.
+    The actual number of concurrent calls is set by the vision dispatcher.
+    Returns ({label: "--- label ---" captioned block}, failed_labels,
+    api_calls, calls_saved).
     """
-    if not image_items:
-        return ""
+    max_workers = max_workers or settings.VISION_MAX_CONCURRENCY
+    batch_size = max(1, batch_size or settings.VISION_PAGES_PER_REQUEST)
     results = {}
+    failed = set()
+    api_calls = 0
+    sent = 0
+    cached_count = 0
+    in_flight = set()
+    batch = []
+
+    def collect(done):
+        nonlocal api_calls
+        for future in done:
+            captioned, calls = future.result()
+            api_calls += calls
+            for label, caption, ok in captioned:
+                results[label] = f"\n--- {label} ---\n{caption}"
+                if not ok:
+                    failed.add(label)
+
+    def submit():
+        nonlocal in_flight, batch, sent
+        # Backpressure: wait for a slot before loading more images
+        if len(in_flight) >= 2 * max_workers:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+        in_flight.add(pool.submit(_caption_batch, batch))
+        sent += len(batch)
+        batch = []
+
     with ThreadPoolExecutor(max_workers=max_workers) as pool:
-        futures = {
-            pool.submit(_caption_single_image, b64, mime, label): label
-            for label, b64, mime in image_items
-        }
-        for future in as_completed(futures):
-            label, caption = future.result()
-            results[label] = caption
-    # Reassemble in submission order
-    ordered_labels = [item[0] for item in image_items]
-    parts = []
-    for label in ordered_labels:
-        parts.append(f"\n--- {label} ---\n{results.get(label, '')}")
-    return "\n".join(parts)
+        for label, path, mime in image_items:
+            try:
+                with open(path, "rb") as f:
+                    image_bytes = f.read()
+                if spool_dir and os.path.dirname(path) == spool_dir:
+                    os.remove(path)
+            except OSError as e:
+                logger.warning("Could not read image for %s: %s", label, e)
+                results[label] = f"\n--- {label} ---\n[Error extracting from {label}: {e}]"
+                failed.add(label)
+                continue
+            key = caption_cache.caption_key(image_bytes, settings.GEMINI_VISION_MODEL, VISION_PROMPT_VERSION)
+            cached = caption_cache.get(key)
+            if cached is not None:
+                results[label] = f"\n--- {label} ---\n{cached}"
+                cached_count += 1
+                continue
+            batch.append((label, base64.b64encode(image_bytes).decode("utf-8"), mime, key))
+            del image_bytes
+            if len(batch) >= batch_size:
+                submit()
+        if batch:
+            submit()
+        collect(wait(in_flight).done)
+
+    if cached_count:
+        print(f"     ↺ {cached_count} caption(s) served from cache")
+    return results, failed, api_calls, max(0, sent - api_calls)
 
 
 # =====================================================================
@@ -254,32 +531,59 @@ def _chunk_text(raw_text, chunk_size=1500, chunk_overlap=200):
 # STEP 4 — Embed & build FAISS index
 # =====================================================================
 
-def _embed_and_index(chatbot_id, chunk_records):
+def _embed_and_index(chatbot_id, chunk_records, vectors=None, manifest_sources=None):
     """Generate embeddings and write FAISS index + metadata.
 
     chunk_records: list of {"content": str, "source": str}
+    vectors: optional list aligned with chunk_records holding embeddings
+             reused from the previous run; None entries are embedded here.
+    manifest_sources: per-source manifest entries saved for the next
+                      incremental retrain.
     """
     if not chunk_records:
         logger.warning("No chunks to embed for chatbot %s", chatbot_id)
         return False
 
     texts = [r["content"] for r in chunk_records]
+    vectors = [None] * len(texts) if vectors is None else list(vectors)
+
+    # Identical chunk text embedded before, by this bot or any other
+    keys = {i: embedding_store.chunk_key(texts[i]) for i, v in enumerate(vectors) if v is None}
+    stored = embedding_store.get_many(keys.values())
+    for i, key in keys.items():
+        vectors[i] = stored.get(key)
+    missing = [i for i in keys if vectors[i] is None]
+    print(
+        f"  Generating embeddings for {len(missing)} chunks "
+        f"({len(texts) - len(keys)} reused, {len(keys) - len(missing)} from the shared store) …"
+    )
 
-    print(f"  Generating embeddings for {len(texts)} chunks …")
-    model = get_embedding_model()
-    embeddings = model.encode(texts, show_progress_bar=False)
-    dimension = embeddings.shape[1]
-
-    index = faiss.IndexFlatL2(dimension)
-    index.add(np.array(embeddings).astype("float32"))
-
-    index_path = os.path.join(INDEX_DIR, f"{chatbot_id}-index.index")
-    meta_path = os.path.join(META_DIR, f"{chatbot_id}-chunks.json")
-    faiss.write_index(index, index_path)
-    with open(meta_path, "w", encoding="utf-8") as f:
-        json.dump(chunk_records, f, indent=2)
+    # Vectors go to a memory-mapped file rather than one in-memory array
+    work_dir = tempfile.mkdtemp(prefix=f"{chatbot_id}-vectors-", dir=settings.EXTRACTION_SPOOL_DIR or None)
+    try:
+        embeddings = encode_corpus(texts, os.path.join(work_dir, "vectors.npy"), reused=vectors)
+        dimension = embeddings.shape[1]
+        embedding_store.put_many((keys[i], embeddings[i]) for i in missing)
+
+        # Flat / HNSW / IVF-PQ depending on corpus size
+        index, index_info = build_index(embeddings)
+
+        index_path = os.path.join(INDEX_DIR, f"{chatbot_id}-index.index")
+        training_manifest.clear(chatbot_id)
+        write_index_info(chatbot_id, index_info)
+        faiss.write_index(index, index_path)
+        write_chunk_store(chunk_store_path(chatbot_id), chunk_records)
+        legacy_json = legacy_json_path(chatbot_id)
+        if os.path.exists(legacy_json):
+            os.remove(legacy_json)  # superseded by the binary store
+        if manifest_sources is not None:
+            training_manifest.save(chatbot_id, manifest_sources, embeddings)
+        invalidate_index_cache(chatbot_id)
+        del embeddings
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
 
-    print(f"  ✓ FAISS index saved ({len(texts)} chunks, dim={dimension})")
+    print(f"  ✓ FAISS index saved ({len(texts)} chunks, dim={dimension}, type={index_info['type']})")
     return True
 
 
@@ -332,9 +636,9 @@ def _convert_doc_to_text(file_path):
 
         # Now extract text from the converted PDF
         if os.path.exists(temp_pdf):
-            text, scanned = _extract_text_from_pdf(temp_pdf)
+            # Text only: scanned pages of a .doc aren't sent to vision
+            text, _, _ = _extract_text_from_pdf(temp_pdf)
             os.remove(temp_pdf)
-            # For .doc scanned pages, we just return the text we have
             return text if text.strip() else None
         return None
 
@@ -353,8 +657,14 @@ def _convert_doc_to_text(file_path):
 # MAIN PIPELINE
 # =====================================================================
 
-def process_pipeline(chatbot_id):
-    """Full training pipeline for a chatbot."""
+def process_pipeline(chatbot_id, full=False):
+    """Training pipeline for a chatbot.
+
+    Incremental by default: files and URLs whose content hash matches the
+    previous run's manifest reuse their chunks and vectors, so only new or
+    changed sources are extracted, captioned and embedded (and sources that
+    were removed simply drop out).  full=True reprocesses everything.
+    """
     print(f"\n🚀 Starting pipeline for chatbot: {chatbot_id}")
     start_time = time.time()
 
@@ -380,123 +690,256 @@ def process_pipeline(chatbot_id):
 
     print(f"  Found {len(all_files)} file(s){' + URL sources' if has_urls else ''}")
 
+    previous = {} if full else training_manifest.load_previous(chatbot_id)
+
     # 2. Classify and extract ──────────────────────────────────────────
-    # Each entry is (text, source_filename)
+    # Every file / URL is a source, keyed "file:<name>" or "url:<url>"
+    source_order = []            # source keys in training order
+    source_names = {}            # key → display name stored on its chunks
+    source_hashes = {}           # key → content hash (absent if processing failed)
+    reused = {}                  # key → previous run's {'records', 'vectors'}
+    # Each entry is (text, source_key) for sources processed in this run
     sourced_text_parts = []
-    image_items = []             # (label, b64, mime) for Gemini vision
-    image_sources = {}           # label → source filename
+    image_sources = {}           # label → source key, for images and pages sent to vision
+    seen_pages = DuplicatePages()  # pages queued for vision, to spot exact repeats
+    duplicate_pages = {}         # label → label whose caption it reuses
+    changed_files = []           # (filename, path, key, hash) needing extraction
 
     for filename in all_files:
         file_path = os.path.join(PDF_DIR, filename)
-        ext = os.path.splitext(filename)[1].lower()
-        base_name = os.path.splitext(filename)[0]
         # Clean display name (strip chatbot_id prefix)
         display_name = filename[len(chatbot_id) + 1:] if filename.startswith(chatbot_id + "_") else filename
+        key = f"file:{filename}"
+        source_order.append(key)
+        source_names[key] = display_name
 
         try:
+            file_hash = training_manifest.hash_file(file_path)
+        except Exception as e:
+            logger.exception("Error processing %s", filename)
+            print(f"  ❌ Error processing {filename}: {e}")
+            continue
+        prev = previous.get(key)
+        if prev is not None and prev['hash'] == file_hash:
+            reused[key] = prev
+            source_hashes[key] = file_hash
+            print(f"  ↺ Unchanged: {filename}")
+            continue
+        changed_files.append((filename, file_path, key, file_hash))
+
+    # Extract changed files in parallel, PDFs split by page range.
+    # Pages that need vision are captioned while later pages still render,
+    # and extraction only runs ahead of vision by a bounded number of tasks
+    # (see _iter_extraction), so the spool holds a bounded number of pages.
+    tasks = []                   # (file_path, page_range)
+    task_counts = Counter()      # tasks per index into changed_files
+    for n, (filename, file_path, key, file_hash) in enumerate(changed_files):
+        for page_range in _extraction_ranges(file_path):
+            tasks.append((file_path, page_range))
+            task_counts[n] += 1
+    # Rendered pages wait here only until vision reads them
+    spool_dir = tempfile.mkdtemp(prefix=f"{chatbot_id}-pages-", dir=settings.EXTRACTION_SPOOL_DIR or None)
+
+    def vision_items():
+        """Handle each changed file in order; yield (label, path, mime) to caption."""
+        extracted = _iter_extraction(tasks, spool_dir)
+        for n, (filename, file_path, key, file_hash) in enumerate(changed_files):
+            ext = os.path.splitext(filename)[1].lower()
+            base_name = os.path.splitext(filename)[0]
+
             if ext == '.pdf':
+                # Pages of each range go to vision before the next range is read
                 print(f"  📄 PDF: {filename}")
-                text, scanned_pages = _extract_text_from_pdf(file_path)
+                text_parts = []
+                labels = []
+                queued = duplicates = blank_pages = 0
+                done, error = 0, None
+                for part, error in islice(extracted, task_counts[n]):
+                    done += 1
+                    if error is not None:
+                        break
+                    if part['text']:
+                        text_parts.append(part['text'])
+                    blank_pages += part['blank_pages']
+                    for label, png_path, page_hash in part['scanned_pages']:
+                        full_label = f"{base_name}_{label}"
+                        image_sources[full_label] = key
+                        labels.append(full_label)
+                        original = seen_pages.match(page_hash) if settings.VISION_DEDUPE_PAGES else None
+                        if original is None:
+                            seen_pages.add(page_hash, full_label)
+                            yield full_label, png_path, "image/png"
+                            queued += 1
+                            continue
+                        if image_sources[original] != key:
+                            # Same page in another document: reuse its caption under this source
+                            duplicate_pages[full_label] = original
+                        # (repeated within this document: its content is already there)
+                        duplicates += 1
+                        try:
+                            os.remove(png_path)
+                        except OSError:
+                            pass
+                if error is not None:
+                    # Skip the file's remaining ranges and leave its pages out
+                    for part, _ in islice(extracted, task_counts[n] - done):
+                        for _, png_path, _ in (part or {}).get('scanned_pages', ()):
+                            try:
+                                os.remove(png_path)
+                            except OSError:
+                                pass
+                    for label in labels:
+                        image_sources.pop(label, None)
+                    print(f"  ❌ Error processing {filename}: {error}")
+                    continue
+                text = "\n".join(text_parts)
                 if text.strip():
-                    sourced_text_parts.append((text, display_name))
+                    sourced_text_parts.append((text, key))
                     print(f"     ✓ Extracted text from {filename} ({len(text)} chars)")
-                for label, b64 in scanned_pages:
-                    full_label = f"{base_name}_{label}"
-                    image_items.append((full_label, b64, "image/png"))
-                    image_sources[full_label] = display_name
-                if scanned_pages:
-                    print(f"     ⚡ {len(scanned_pages)} scanned page(s) queued for vision")
-
-            elif ext == '.docx':
+                if queued:
+                    print(f"     ⚡ {queued} scanned page(s) queued for vision")
+                if blank_pages or duplicates:
+                    print(f"     ✂️ Skipped {blank_pages} blank and {duplicates} duplicate page(s)")
+                source_hashes[key] = file_hash
+                continue
+
+            outcomes = list(islice(extracted, task_counts[n]))
+            errors = [error for _, error in outcomes if error is not None]
+            if errors:
+                print(f"  ❌ Error processing {filename}: {errors[0]}")
+                continue
+            parts = [result for result, _ in outcomes]
+            text = "\n".join(p['text'] for p in parts if p['text'])
+
+            if ext == '.docx':
                 print(f"  📝 DOCX: {filename}")
-                text = _extract_text_from_docx(file_path)
                 if text.strip():
-                    sourced_text_parts.append((text, display_name))
+                    sourced_text_parts.append((text, key))
                     print(f"     ✓ Extracted text ({len(text)} chars)")
                 else:
                     print(f"     ⚠️ No text found in {filename}")
 
             elif ext == '.doc':
                 print(f"  📝 DOC (legacy): {filename}")
-                text = _convert_doc_to_text(file_path)
                 if text:
-                    sourced_text_parts.append((text, display_name))
+                    sourced_text_parts.append((text, key))
                     print(f"     ✓ Extracted text ({len(text)} chars)")
                 else:
                     print(f"     ⚠️ Could not extract text from {filename}")
 
             elif ext == '.txt':
                 print(f"  📃 TXT: {filename}")
-                text = _extract_text_from_txt(file_path)
                 if text.strip():
-                    sourced_text_parts.append((text, display_name))
+                    sourced_text_parts.append((text, key))
                     print(f"     ✓ Read text ({len(text)} chars)")
 
             elif ext in {'.xlsx', '.xls'}:
                 print(f"  📊 Excel: {filename}")
-                text = _extract_text_from_excel(file_path)
                 if text.strip():
-                    sourced_text_parts.append((text, display_name))
+                    sourced_text_parts.append((text, key))
                     print(f"     ✓ Extracted text ({len(text)} chars)")
                 else:
                     print(f"     ⚠️ No text found in {filename}")
 
             elif ext in IMAGE_EXTENSIONS:
                 print(f"  🖼️  Image: {filename}")
-                b64, mime = _image_to_base64(file_path)
-                image_items.append((base_name, b64, mime))
-                image_sources[base_name] = display_name
+                image_path, mime = parts[0]['image']
+                image_sources[base_name] = key
+                yield base_name, image_path, mime
 
             else:
                 print(f"  ⚠️ Skipping unsupported file: {filename}")
 
-        except Exception as e:
-            logger.exception("Error processing %s", filename)
-            print(f"  ❌ Error processing {filename}: {e}")
+            source_hashes[key] = file_hash
 
     # 3. Gemini vision for images + scanned pages ──────────────────────
-    if image_items:
-        print(f"\n  🔍 Running Gemini vision on {len(image_items)} image(s) …")
-        vision_text = _caption_images_concurrent(image_items, max_workers=3)
-        if vision_text.strip():
-            # Attribute vision text to the first image source (best-effort)
-            first_source = image_sources.get(image_items[0][0], "images")
-            sourced_text_parts.append((vision_text, first_source))
-        print(f"  ✓ Vision processing complete")
-        # Track vision API usage for cost monitoring
-        try:
-            from user_querySafe.models import VisionAPIUsage
-            VisionAPIUsage.objects.create(
-                chatbot_id=chatbot_id,
-                call_count=len(image_items),
-                call_type='training'
-            )
-        except Exception:
-            pass  # Non-critical — don't fail pipeline over tracking
+    try:
+        captions, failed_labels, vision_calls, calls_saved = _caption_images_concurrent(
+            vision_items(), spool_dir=spool_dir,
+        )
+        if captions:
+            # Attach each file's captions to that file, in page order
+            for label, original in duplicate_pages.items():
+                captions[label] = captions[original].replace(f"--- {original} ---", f"--- {label} ---", 1)
+                if original in failed_labels:
+                    failed_labels.add(label)
+            vision_parts = defaultdict(list)
+            for label in image_sources:
+                if label not in captions:
+                    continue  # duplicate within its own document
+                if label in failed_labels:
+                    # Leave the error out of the bot's text, and don't record the
+                    # hash, so the next retrain tries this file again
+                    source_hashes.pop(image_sources[label], None)
+                    continue
+                vision_parts[image_sources[label]].append(captions[label])
+            for key, parts in vision_parts.items():
+                sourced_text_parts.append(("\n".join(parts), key))
+            print(f"\n  ✓ Gemini vision on {len(captions) - len(duplicate_pages)} image(s) complete "
+                  f"({vision_calls} call(s), {calls_saved} saved by batching)")
+            if failed_labels:
+                print(f"     ⚠️ {len(failed_labels)} image(s) failed and were left out; retrying their files next time")
+            # Track vision API usage for cost monitoring (cache hits are free)
+            try:
+                from user_querySafe.models import Chatbot, VisionAPIUsage
+                if vision_calls:
+                    VisionAPIUsage.objects.create(
+                        chatbot=Chatbot.objects.get(chatbot_id=chatbot_id),
+                        call_count=vision_calls,
+                        calls_saved=calls_saved,
+                        call_type='training'
+                    )
+            except Exception:
+                logger.warning("Could not record vision usage for %s", chatbot_id, exc_info=True)
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
 
     # 3b. URL content ───────────────────────────────────────────────────
+    # Re-crawls are conditional: pages whose sitemap <lastmod> is unchanged
+    # aren't requested at all, the rest are requested with the previous
+    # ETag / Last-Modified, and a 304 or an unchanged text hash reuses the
+    # previous chunks and vectors.
+    source_validators = {}       # url key → validators stored in the manifest
     try:
         from user_querySafe.models import ChatbotURL
         url_records = ChatbotURL.objects.filter(chatbot__chatbot_id=chatbot_id)
         if url_records.exists():
             print(f"\n  🌐 Processing URL sources …")
-            from user_querySafe.chatbot.url_scraper import crawl_urls, parse_sitemap
+            from user_querySafe.chatbot.url_scraper import crawl_urls, fetch_sitemap
 
             all_page_urls = []
+            lastmods = {}        # page url → <lastmod> from its sitemap
             for record in url_records:
                 if record.is_sitemap:
-                    discovered_urls, err = parse_sitemap(record.url)
+                    entries, validators, err = fetch_sitemap(
+                        record.url, etag=record.etag, last_modified=record.last_modified,
+                    )
                     if err:
                         record.status = 'error'
                         record.error_message = err
                         record.save()
                         logger.warning("Sitemap error for %s: %s", record.url, err)
+                        continue
+                    if entries is None:
+                        entries = record.sitemap_entries
+                        print(f"     Sitemap unchanged: {record.url[:60]}")
                     else:
-                        record.page_count = len(discovered_urls)
-                        record.status = 'crawled'
-                        record.save()
-                        all_page_urls.extend(discovered_urls)
-                        print(f"     Sitemap: {len(discovered_urls)} pages from {record.url[:60]}")
+                        record.page_count = len(entries)
+                        record.etag = validators.get('etag', '')
+                        record.last_modified = validators.get('last_modified', '')
+                        record.content_hash = training_manifest.hash_text(
+                            "\n".join(f"{e['loc']} {e['lastmod']}" for e in entries)
+                        )
+                        # Only the pages we would ever crawl are worth keeping
+                        record.sitemap_entries = entries[:MAX_CRAWL_PAGES]
+                        print(f"     Sitemap: {len(entries)} pages from {record.url[:60]}")
+                    record.status = 'crawled'
+                    record.error_message = ''
+                    record.save()
+                    for entry in entries:
+                        all_page_urls.append(entry['loc'])
+                        if entry.get('lastmod'):
+                            lastmods.setdefault(entry['loc'], entry['lastmod'])
                 else:
                     all_page_urls.append(record.url)
 
@@ -507,52 +950,120 @@ def process_pipeline(chatbot_id):
                 if u not in seen:
                     seen.add(u)
                     unique_urls.append(u)
+            unique_urls = unique_urls[:MAX_CRAWL_PAGES]
 
             if unique_urls:
-                crawl_results = crawl_urls(unique_urls, max_pages=50)
-                url_text_count = 0
-                for result in crawl_results:
-                    if result['content']:
-                        sourced_text_parts.append((result['content'], result['url']))
+                to_fetch = []
+                conditional = {}
+                for url in unique_urls:
+                    prev = previous.get(f"url:{url}")
+                    if prev is None:
+                        to_fetch.append(url)
+                    elif lastmods.get(url) and prev['validators'].get('lastmod') == lastmods[url]:
+                        continue  # sitemap says unchanged since the last crawl
+                    else:
+                        to_fetch.append(url)
+                        conditional[url] = prev['validators']
+                crawl_results = {r['url']: r for r in crawl_urls(to_fetch, max_pages=MAX_CRAWL_PAGES, validators=conditional)}
+
+                url_text_count = skipped = not_modified = 0
+                for url in unique_urls:
+                    key = f"url:{url}"
+                    prev = previous.get(key)
+                    result = crawl_results.get(url)
+                    if result is None or result['not_modified']:
+                        # Unchanged per sitemap lastmod or a 304: reuse the previous run
+                        source_order.append(key)
+                        source_names[key] = url
+                        source_hashes[key] = prev['hash']
+                        reused[key] = prev
+                        source_validators[key] = {
+                            **prev['validators'],
+                            **({k: result[k] for k in ('etag', 'last_modified')} if result else {}),
+                            'lastmod': lastmods.get(url, ''),
+                        }
+                        if result is None:
+                            skipped += 1
+                        else:
+                            not_modified += 1
+                        url_text_count += 1
+                    elif result['content']:
+                        source_order.append(key)
+                        source_names[key] = url
+                        source_hashes[key] = training_manifest.hash_text(result['content'])
+                        source_validators[key] = {
+                            'etag': result['etag'], 'last_modified': result['last_modified'],
+                            'lastmod': lastmods.get(url, ''),
+                        }
+                        if prev is not None and prev['hash'] == source_hashes[key]:
+                            reused[key] = prev
+                        else:
+                            sourced_text_parts.append((result['content'], key))
                         url_text_count += 1
                     elif result['error']:
-                        logger.warning("URL crawl error for %s: %s", result['url'], result['error'])
+                        logger.warning("URL crawl error for %s: %s", url, result['error'])
 
                 # Update non-sitemap URL record statuses
                 for record in url_records.filter(is_sitemap=False):
-                    matching = [r for r in crawl_results if r['url'] == record.url]
-                    if matching:
-                        if matching[0]['error']:
-                            record.status = 'error'
-                            record.error_message = matching[0]['error']
-                        else:
-                            record.status = 'crawled'
-                        record.save()
+                    key = f"url:{record.url}"
+                    result = crawl_results.get(record.url)
+                    if result is not None and result['error']:
+                        record.status = 'error'
+                        record.error_message = result['error']
+                    elif key in source_hashes:
+                        record.status = 'crawled'
+                        record.error_message = ''
+                        record.content_hash = source_hashes[key]
+                        record.etag = source_validators[key].get('etag', '')
+                        record.last_modified = source_validators[key].get('last_modified', '')
+                    else:
+                        continue
+                    record.save()
 
-                print(f"  ✓ Extracted content from {url_text_count}/{len(unique_urls)} URL(s)")
+                print(f"  ✓ Extracted content from {url_text_count}/{len(unique_urls)} URL(s) "
+                      f"({not_modified} not modified, {skipped} skipped by sitemap lastmod)")
     except ImportError:
         logger.debug("ChatbotURL model or url_scraper not available, skipping URL processing")
     except Exception as e:
         logger.warning("URL processing error: %s", e)
 
     # 4. Combine, chunk, and track source per chunk ────────────────────
-    if not sourced_text_parts:
+    if not sourced_text_parts and not reused:
         print(f"  ❌ No text extracted from any file for chatbot {chatbot_id}")
         from user_querySafe.models import Chatbot
         Chatbot.objects.filter(chatbot_id=chatbot_id).update(status="error")
         return
 
-    # Chunk each source separately so we can tag chunks with their origin
+    texts_by_source = defaultdict(list)
+    for text, key in sourced_text_parts:
+        texts_by_source[key].append(text)
+
+    # Chunk each source separately so we can tag chunks with their origin;
+    # unchanged sources bring their previous chunks and vectors along
     chunk_records = []  # [{"content": str, "source": str}, ...]
-    combined_text_parts = []
-    for text, source in sourced_text_parts:
-        combined_text_parts.append(text)
-        source_chunks = _chunk_text(text)
-        for c in source_chunks:
-            chunk_records.append({"content": c, "source": source})
-
-    combined_text = "\n\n".join(combined_text_parts)
-    print(f"\n  Total extracted text: {len(combined_text)} chars")
+    vectors = []        # previous embedding per chunk, or None to embed
+    manifest_sources = []
+    for key in source_order:
+        start = len(chunk_records)
+        if key in reused:
+            chunk_records.extend(reused[key]['records'])
+            vectors.extend(reused[key]['vectors'])
+        else:
+            for text in texts_by_source.get(key, []):
+                for c in _chunk_text(text):
+                    chunk_records.append({"content": c, "source": source_names[key]})
+                    vectors.append(None)
+        if key in source_hashes:
+            manifest_sources.append({
+                'key': key, 'hash': source_hashes[key],
+                'start': start, 'count': len(chunk_records) - start,
+                **source_validators.get(key, {}),
+            })
+        # A source that failed is left out of the manifest and retried next time
+
+    # Debug text covers only the sources extracted in this run
+    combined_text = "\n\n".join(text for text, _ in sourced_text_parts)
+    print(f"\n  Total extracted text: {len(combined_text)} chars ({len(reused)} unchanged source(s) reused)")
     print(f"  Chunked into {len(chunk_records)} segments")
 
     # Save combined text & chunks to disk (useful for debugging)
@@ -566,7 +1077,7 @@ def process_pipeline(chatbot_id):
             f.write(f"--- Chunk {idx} [{rec['source']}] ---\n{rec['content']}\n\n")
 
     # 5. Embed & index ─────────────────────────────────────────────────
-    success = _embed_and_index(chatbot_id, chunk_records)
+    success = _embed_and_index(chatbot_id, chunk_records, vectors, manifest_sources)
 
     # 6. Update chatbot status ─────────────────────────────────────────
     from user_querySafe.models import Chatbot
@@ -585,45 +1096,3 @@ def process_pipeline(chatbot_id):
         chatbot_obj.status = "error"
         chatbot_obj.save()
         print(f"\n❌ Pipeline failed — no embeddings produced for {chatbot_id}")
-
-
-# =====================================================================
-# BACKGROUND RUNNER (with simple lock to prevent duplicate runs)
-# =====================================================================
-_pipeline_locks = {}
-
-def run_pipeline_background(chatbot_id, post_callback=None):
-    """Run the training pipeline in a background thread.
-
-    Args:
-        chatbot_id: The chatbot to train.
-        post_callback: Optional callable invoked after a successful pipeline run.
-                       Use this for tasks that depend on training output (e.g. goal plan generation).
-    """
-    from threading import Thread, Lock
-
-    lock = _pipeline_locks.setdefault(chatbot_id, Lock())
-    if lock.locked():
-        logger.info("Pipeline already running for chatbot %s.", chatbot_id)
-        return
-
-    def pipeline_wrapper():
-        with lock:
-            try:
-                process_pipeline(chatbot_id)
-                # Run post-pipeline callback (e.g. goal plan generation)
-                if post_callback:
-                    try:
-                        post_callback()
-                    except Exception:
-                        logger.exception("Post-pipeline callback failed for chatbot %s", chatbot_id)
-            except Exception as e:
-                logger.exception("Pipeline failed for chatbot %s", chatbot_id)
-                try:
-                    from user_querySafe.models import Chatbot
-                    Chatbot.objects.filter(chatbot_id=chatbot_id).update(status='failed')
-                except Exception:
-                    logger.exception("Could not update chatbot %s status", chatbot_id)
-
-    t = Thread(target=pipeline_wrapper, daemon=False)
-    t.start()
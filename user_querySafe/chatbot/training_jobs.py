@@ -0,0 +1,243 @@
+"""
+Database-backed training queue.
+
+Views call enqueue_training(); jobs are executed by worker threads started
+with `python manage.py run_training_worker` (a separate process, so a big
+retrain never competes with chat traffic), or — when
+TRAINING_EMBEDDED_WORKER is turned on for a single-container setup — by
+one background thread inside the web process.
+
+Jobs live in the TrainingJob table, so they survive instance restarts:
+running jobs send a heartbeat, and a job whose heartbeat goes stale (the
+instance was recycled mid-run) is put back in the queue.  Failed runs are
+retried with exponential backoff up to max_attempts.
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from user_querySafe.models import Chatbot, GoalPlan, TrainingJob
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_SECONDS = 60
+
+_embedded_lock = threading.Lock()
+_embedded_thread = None
+
+
+def enqueue_training(chatbot, full_rebuild=False, generate_goal_plan=False, goal_text='', enable_goal_emails=False):
+    """Queue a training run for `chatbot` and return its TrainingJob.
+
+    If a job is already queued it is reused (merging the options); if one
+    is running, it is flagged to run again once it finishes, so sources
+    added mid-run are picked up.
+    """
+    for _ in range(5):
+        active = TrainingJob.objects.filter(chatbot=chatbot, status__in=TrainingJob.ACTIVE_STATUSES).first()
+        if active is not None:
+            if active.status == TrainingJob.STATUS_RUNNING:
+                updated = TrainingJob.objects.filter(pk=active.pk, status=TrainingJob.STATUS_RUNNING).update(rerun_requested=True)
+            else:
+                changes = {}
+                if full_rebuild:
+                    changes['full_rebuild'] = True
+                if generate_goal_plan:
+                    changes.update(generate_goal_plan=True, goal_text=goal_text or '', enable_goal_emails=enable_goal_emails)
+                updated = TrainingJob.objects.filter(pk=active.pk, status=TrainingJob.STATUS_QUEUED).update(**changes) if changes else 1
+            if updated:
+                return active
+            continue  # it changed state under us; look again
+
+        try:
+            with transaction.atomic():
+                job = TrainingJob.objects.create(
+                    chatbot=chatbot,
+                    full_rebuild=full_rebuild,
+                    generate_goal_plan=generate_goal_plan,
+                    goal_text=goal_text or '',
+                    enable_goal_emails=enable_goal_emails,
+                    max_attempts=settings.TRAINING_JOB_MAX_ATTEMPTS,
+                )
+        except IntegrityError:
+            continue  # another process queued one first
+        if settings.TRAINING_EMBEDDED_WORKER:
+            start_embedded_worker()
+        return job
+    raise RuntimeError(f"Could not queue training for chatbot {chatbot.chatbot_id}")
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"[:100]
+
+
+def claim_next_job():
+    """Atomically take the oldest runnable job, or return None."""
+    if settings.TRAINING_MAX_RUNNING:
+        running = TrainingJob.objects.filter(status=TrainingJob.STATUS_RUNNING).count()
+        if running >= settings.TRAINING_MAX_RUNNING:
+            return None
+
+    now = timezone.now()
+    candidates = (
+        TrainingJob.objects
+        .filter(status=TrainingJob.STATUS_QUEUED, run_after__lte=now)
+        .order_by('created_at')
+        .values_list('pk', flat=True)[:5]
+    )
+    for pk in candidates:
+        # Conditional UPDATE: only one worker can move a given job out of 'queued'
+        claimed = TrainingJob.objects.filter(pk=pk, status=TrainingJob.STATUS_QUEUED).update(
+            status=TrainingJob.STATUS_RUNNING,
+            attempts=F('attempts') + 1,
+            worker=worker_name(),
+            started_at=now,
+            heartbeat_at=now,
+        )
+        if claimed:
+            return TrainingJob.objects.select_related('chatbot', 'chatbot__user').get(pk=pk)
+    return None
+
+
+def requeue_stale_jobs():
+    """Put back (or fail) running jobs whose worker stopped sending heartbeats."""
+    cutoff = timezone.now() - timedelta(seconds=settings.TRAINING_JOB_STALE_SECONDS)
+    stale = TrainingJob.objects.filter(status=TrainingJob.STATUS_RUNNING, heartbeat_at__lt=cutoff)
+    for job in stale.select_related('chatbot'):
+        logger.warning("Training job %s for chatbot %s lost its worker (%s)", job.pk, job.chatbot.chatbot_id, job.worker)
+        _finish(job, error=f"Worker {job.worker} stopped responding", retry=True)
+
+
+def _heartbeat(job_pk, stop):
+    while not stop.wait(settings.TRAINING_HEARTBEAT_SECONDS):
+        try:
+            TrainingJob.objects.filter(pk=job_pk, status=TrainingJob.STATUS_RUNNING).update(heartbeat_at=timezone.now())
+        except Exception:
+            logger.warning("Heartbeat failed for training job %s", job_pk, exc_info=True)
+        finally:
+            close_old_connections()
+
+
+def _finish(job, error='', retry=False):
+    """Record the outcome of a run, scheduling a retry or a requested rerun."""
+    rerun = None
+    with transaction.atomic():
+        job = TrainingJob.objects.select_for_update().get(pk=job.pk)
+        if job.status != TrainingJob.STATUS_RUNNING:
+            return  # already handled (e.g. requeued as stale)
+        job.error = error
+        job.heartbeat_at = None
+        if retry and job.attempts < job.max_attempts:
+            job.status = TrainingJob.STATUS_QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+            job.rerun_requested = False  # the retry covers it
+        else:
+            job.status = TrainingJob.STATUS_FAILED if error else TrainingJob.STATUS_SUCCEEDED
+            job.finished_at = timezone.now()
+            rerun = job.rerun_requested
+        job.save()
+
+    if job.status == TrainingJob.STATUS_FAILED and retry:
+        Chatbot.objects.filter(pk=job.chatbot_id).update(status='failed')
+    if rerun:
+        Chatbot.objects.filter(pk=job.chatbot_id).update(status='training')
+        enqueue_training(job.chatbot)
+
+
+def run_job(job):
+    """Run one claimed job to completion."""
+    from user_querySafe.chatbot.pipeline_processor import process_pipeline
+
+    chatbot = job.chatbot
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job.pk, stop), daemon=True).start()
+    try:
+        logger.info("Training job %s: chatbot %s, attempt %s/%s", job.pk, chatbot.chatbot_id, job.attempts, job.max_attempts)
+        process_pipeline(chatbot.chatbot_id, full=job.full_rebuild)
+        chatbot.refresh_from_db()
+        if chatbot.status != 'trained':
+            # No usable sources etc. — retrying won't help
+            _finish(job, error=f"Training ended with chatbot status '{chatbot.status}'")
+            return
+        if job.generate_goal_plan:
+            _run_goal_plan(job, chatbot)
+        _finish(job)
+    except Exception as e:
+        logger.exception("Training job %s failed for chatbot %s", job.pk, chatbot.chatbot_id)
+        _finish(job, error=str(e)[:2000], retry=True)
+    finally:
+        stop.set()
+        close_old_connections()
+
+
+def _run_goal_plan(job, chatbot):
+    from user_querySafe.chatbot.views import _generate_goal_plan
+    try:
+        _generate_goal_plan(chatbot, chatbot.user, goal_text=job.goal_text or None)
+        GoalPlan.objects.filter(chatbot=chatbot).update(enable_emails=job.enable_goal_emails)
+    except Exception:
+        logger.exception("Goal plan generation failed for %s", chatbot.chatbot_id)
+
+
+def work(stop, once=False, poll_interval=5.0):
+    """Worker loop: claim and run jobs until `stop` is set (or the queue is empty with once=True)."""
+    while not stop.is_set():
+        try:
+            requeue_stale_jobs()
+            job = claim_next_job()
+        except Exception:
+            logger.exception("Training worker could not poll the queue")
+            job = None
+        finally:
+            close_old_connections()
+
+        if job is not None:
+            run_job(job)
+            continue
+        if once:
+            return
+        stop.wait(poll_interval)
+
+
+def start_embedded_worker():
+    """Start the in-process worker thread (idempotent per process)."""
+    global _embedded_thread
+    with _embedded_lock:
+        if _embedded_thread is None or not _embedded_thread.is_alive():
+            _embedded_thread = threading.Thread(
+                target=work, args=(threading.Event(),), name="querysafe-training", daemon=True,
+            )
+            _embedded_thread.start()
+
+
+def queue_position(job):
+    """1-based position of a queued job among runnable queued jobs."""
+    return TrainingJob.objects.filter(
+        status=TrainingJob.STATUS_QUEUED, created_at__lte=job.created_at,
+    ).count()
+
+
+def describe(job):
+    """JSON-serialisable summary of a job for the status API."""
+    if job is None:
+        return None
+    data = {
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'error': job.error,
+    }
+    if job.status == TrainingJob.STATUS_QUEUED:
+        data['queue_position'] = queue_position(job)
+        data['run_after'] = job.run_after.isoformat()
+    return data
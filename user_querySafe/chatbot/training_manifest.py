@@ -0,0 +1,116 @@
+"""
+Per-source training manifest for incremental retraining.
+
+After each successful training run the pipeline records, for every source
+(uploaded file or crawled URL), a content hash and the contiguous range of
+chunk ids it produced:
+
+    {chatbot_id}-manifest.json   {"version", "model", "sources": [{"key", "hash", "start", "count", ...}]}
+    {chatbot_id}-vectors.npy     float32 embeddings, row i = chunk i in chunks.bin
+
+On the next retrain, sources whose hash is unchanged reuse their chunks and
+vectors instead of being extracted, captioned (Gemini vision) and embedded
+again.  The FAISS index is then rebuilt from the stored vectors, which takes
+milliseconds to seconds even for large bots.
+
+URL sources also record their HTTP validators ("etag", "last_modified")
+and sitemap "lastmod", so the next crawl can ask for the page conditionally
+or skip it altogether.
+"""
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+from django.conf import settings
+
+from user_querySafe.chatbot.chunk_store import ChunkStore, chunk_store_path
+from user_querySafe.chatbot.embedding_model import model_id
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+VALIDATOR_FIELDS = ('etag', 'last_modified', 'lastmod')
+
+
+def manifest_path(chatbot_id):
+    return os.path.join(settings.META_DIR, f"{chatbot_id}-manifest.json")
+
+
+def vectors_path(chatbot_id):
+    return os.path.join(settings.INDEX_DIR, f"{chatbot_id}-vectors.npy")
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_previous(chatbot_id):
+    """Return {source_key: {'hash', 'records', 'vectors', 'validators'}} from the last run.
+
+    Returns {} (i.e. everything is treated as new) when there is no
+    manifest, it was written for a different embedding model or backend
+    (see embedding_model.model_id), or it doesn't line up with the chunk
+    store and vector file on disk.
+    """
+    try:
+        with open(manifest_path(chatbot_id), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get('version') != MANIFEST_VERSION or manifest.get('model') != model_id():
+            return {}
+        store = ChunkStore(chunk_store_path(chatbot_id))
+        vectors = np.load(vectors_path(chatbot_id), mmap_mode="r")
+    except FileNotFoundError:
+        return {}
+    except Exception:
+        logger.warning("Ignoring unreadable training manifest for chatbot %s", chatbot_id, exc_info=True)
+        return {}
+
+    total = sum(s['count'] for s in manifest['sources'])
+    if not (total == len(store) == len(vectors)):
+        logger.warning("Training manifest for chatbot %s is out of sync; doing a full rebuild", chatbot_id)
+        return {}
+
+    previous = {}
+    for source in manifest['sources']:
+        start, end = source['start'], source['start'] + source['count']
+        previous[source['key']] = {
+            'hash': source['hash'],
+            'records': store[start:end],
+            # Memory-mapped rows, copied straight into the next run's vector file
+            'vectors': vectors[start:end],
+            'validators': {k: source[k] for k in VALIDATOR_FIELDS if source.get(k)},
+        }
+    return previous
+
+
+def clear(chatbot_id):
+    """Drop the manifest so a half-written run is never mistaken for a complete one."""
+    try:
+        os.remove(manifest_path(chatbot_id))
+    except FileNotFoundError:
+        pass
+
+
+def save(chatbot_id, sources, embeddings):
+    """Write the vectors (an array or memmap) and then the manifest for a completed run."""
+    path = vectors_path(chatbot_id)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(embeddings, dtype="float32"))
+    os.replace(tmp_path, path)
+
+    path = manifest_path(chatbot_id)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({'version': MANIFEST_VERSION, 'model': model_id(), 'sources': sources}, f)
+    os.replace(tmp_path, path)
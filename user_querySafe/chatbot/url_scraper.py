@@ -1,17 +1,36 @@
 """
 URL content extraction module for QuerySafe chatbot training.
 Uses httpx + lxml (both already in requirements.txt).
-No new dependencies needed.
+
+crawl_urls() fetches pages concurrently on one shared httpx.AsyncClient
+(keep-alive, HTTP/2 when the h2 package is installed), limited to
+CRAWL_CONCURRENCY requests overall and CRAWL_PER_HOST_CONCURRENCY per host,
+with request starts to the same host at least CRAWL_PER_HOST_DELAY apart.
+
+Sitemaps are parsed incrementally with lxml's pull parser, so a huge
+sitemap is never held in memory as a whole and previews can stop reading
+after the first entries.
 """
+import asyncio
+import codecs
+import importlib.util
 import logging
+import re
+import threading
 import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 
 import httpx
+from django.conf import settings
 from lxml import html as lxml_html
 from lxml import etree
 
 logger = logging.getLogger(__name__)
 
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
 # Tags to remove (navigation, scripts, ads, footers)
 REMOVE_TAGS = {
     'script', 'style', 'nav', 'footer', 'header', 'aside',
@@ -25,6 +44,124 @@ HEADERS = {
 
 TIMEOUT = 15  # seconds per request
 
+# Elements that start a new line of output
+BLOCK_TAGS = {
+    'address', 'article', 'blockquote', 'br', 'caption', 'dd', 'details',
+    'div', 'dl', 'dt', 'figcaption', 'figure', 'hr', 'li', 'main', 'ol', 'p',
+    'pre', 'section', 'summary', 'table', 'tbody', 'tfoot', 'thead', 'tr', 'ul',
+}
+
+# A <main>/<article> is used instead of the whole body when it has at least this much text
+MIN_MAIN_CONTENT_CHARS = 200
+
+# Marks block boundaries in the transformed text (a private-use character)
+_BREAK = '\ue000'
+# Stand-ins for the spaces and tabs of <pre> text, restored after whitespace is collapsed
+_PRE_SPACE = '\ue001'
+_PRE_TAB = '\ue002'
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# A charset declaration in the document itself, looked for where browsers do (the first 1024 bytes)
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset', re.IGNORECASE)
+_BOMS = (codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+
+# Dropping REMOVE_TAGS and marking blocks, headings and table cells is a
+# single XSLT pass run by libxslt, instead of a tree scan per tag
+_HTML_TO_TEXT_XSL = f"""<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
+<xsl:output method="text" encoding="UTF-8"/>
+<xsl:template match="{' | '.join(sorted(REMOVE_TAGS))}"/>
+<xsl:template match="{' | '.join(sorted(BLOCK_TAGS))}">{_BREAK}<xsl:apply-templates/>{_BREAK}</xsl:template>
+{''.join(
+    f'<xsl:template match="h{n}">{_BREAK}{"#" * n} <xsl:apply-templates/>{_BREAK}</xsl:template>'
+    for n in range(1, 7)
+)}
+<xsl:template match="td | th"> | <xsl:apply-templates/></xsl:template>
+<xsl:template match="pre//text()"><xsl:value-of select="translate(., '&#10;&#9; &#13;', '{_BREAK}{_PRE_TAB}{_PRE_SPACE}')"/></xsl:template>
+</xsl:stylesheet>"""
+_html_to_text = etree.XSLT(etree.XML(_HTML_TO_TEXT_XSL.encode('utf-8')))
+
+# lxml parsers must not be shared between threads; creating one per page is
+# a noticeable part of the cost, so keep one per thread and encoding
+_parsers = threading.local()
+
+
+def _html_parser(encoding):
+    cache = getattr(_parsers, 'by_encoding', None)
+    if cache is None:
+        cache = _parsers.by_encoding = {}
+    parser = cache.get(encoding)
+    if parser is None:
+        parser = cache[encoding] = lxml_html.HTMLParser(encoding=encoding, remove_comments=True, remove_pis=True)
+    return parser
+
+
+def _main_content(tree):
+    """The page's <main>/<article> if it declares one with real content, else <body>."""
+    candidates = list(tree.iter('main', 'article'))
+    if candidates:
+        size, best = max(((len(el.text_content()), el) for el in candidates), key=lambda c: c[0])
+        if size >= MIN_MAIN_CONTENT_CHARS:
+            return best
+    body = tree.find('body')
+    return body if body is not None else tree
+
+
+def html_to_text(content, encoding=None) -> str:
+    """Convert an HTML document (bytes or str) to clean text.
+
+    Boilerplate elements (REMOVE_TAGS) are dropped, the page's <main> /
+    <article> is used when it has one, headings become markdown-style '#'
+    lines and table rows become 'cell | cell' lines, so the chunker sees
+    the page's structure; <pre> text keeps its lines and indentation.
+    `encoding` is the charset to decode with; without one lxml uses the
+    document's <meta charset>.
+    """
+    tree = lxml_html.document_fromstring(content, parser=_html_parser(encoding))
+
+    lines = []
+    for block in _WHITESPACE_RE.sub(' ', str(_html_to_text(_main_content(tree)))).split(_BREAK):
+        line = block.strip().replace(_PRE_SPACE, ' ').replace(_PRE_TAB, '\t')
+        if line.startswith('| '):
+            line = line[2:]  # first cell of a table row
+        if line.lstrip('#').strip():  # skip empty lines and empty headings
+            lines.append(line.rstrip())
+    return '\n'.join(lines)
+
+
+def _declares_charset(content) -> bool:
+    """Whether an HTML document names its own encoding (a byte-order mark or <meta charset>)."""
+    return content.startswith(_BOMS) or _META_CHARSET_RE.search(content[:1024]) is not None
+
+
+def _extract_text(response) -> tuple:
+    """Clean text from an HTML response. Returns (text, error_or_None)."""
+    content_type = response.headers.get('content-type', '')
+    if 'text/html' not in content_type and 'application/xhtml' not in content_type:
+        return '', f'Not HTML content: {content_type}'
+
+    # Without a charset in the header or the page, lxml would assume Latin-1;
+    # decode as httpx does instead (UTF-8 unless told otherwise)
+    declared_in_page = _declares_charset(response.content)
+    fallback = None if declared_in_page else (response.encoding or 'utf-8')
+    try:
+        clean_text = html_to_text(response.content, encoding=response.charset_encoding or fallback)
+    except LookupError:
+        # Unknown charset in the Content-Type header: let the page's <meta> decide
+        clean_text = html_to_text(response.content, encoding=None if declared_in_page else 'utf-8')
+
+    if len(clean_text) < 50:
+        return '', f'Too little content extracted ({len(clean_text)} chars)'
+
+    return clean_text, None
+
+
+def _fetch_error(exc) -> str:
+    if isinstance(exc, httpx.TimeoutException):
+        return f'Timeout after {TIMEOUT}s'
+    if isinstance(exc, httpx.HTTPStatusError):
+        return f'HTTP {exc.response.status_code}'
+    return str(exc)[:200]
+
 
 def fetch_url_text(url: str) -> tuple:
     """Fetch a single URL and extract clean text content.
@@ -34,106 +171,251 @@ def fetch_url_text(url: str) -> tuple:
         with httpx.Client(timeout=TIMEOUT, follow_redirects=True, verify=True) as client:
             response = client.get(url, headers=HEADERS)
             response.raise_for_status()
+        return _extract_text(response)
+    except Exception as e:
+        return '', _fetch_error(e)
 
-        content_type = response.headers.get('content-type', '')
-        if 'text/html' not in content_type and 'application/xhtml' not in content_type:
-            return '', f'Not HTML content: {content_type}'
 
-        tree = lxml_html.fromstring(response.text)
+SITEMAP_MAX_CHILDREN = 10  # child sitemaps read from a sitemap index
+SITEMAP_NAMESPACES = {
+    'http://www.sitemaps.org/schemas/sitemap/0.9',
+    'https://www.sitemaps.org/schemas/sitemap/0.9',
+    'http://www.google.com/schemas/sitemap/0.84',
+}
 
-        # Remove unwanted elements
-        for tag in REMOVE_TAGS:
-            for element in tree.xpath(f'//{tag}'):
-                parent = element.getparent()
-                if parent is not None:
-                    parent.remove(element)
 
-        # Extract text from body (or full tree if no body)
-        body = tree.xpath('//body')
-        target = body[0] if body else tree
-        text = target.text_content()
+def _validators(response) -> dict:
+    """Cache validators to send back on the next conditional request."""
+    return {
+        'etag': response.headers.get('etag', ''),
+        'last_modified': response.headers.get('last-modified', ''),
+    }
 
-        # Clean up whitespace
-        lines = [line.strip() for line in text.splitlines() if line.strip()]
-        clean_text = '\n'.join(lines)
 
-        if len(clean_text) < 50:
-            return '', f'Too little content extracted ({len(clean_text)} chars)'
+def _conditional_headers(etag='', last_modified='') -> dict:
+    headers = dict(HEADERS)
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return headers
 
-        return clean_text, None
 
-    except httpx.TimeoutException:
-        return '', f'Timeout after {TIMEOUT}s'
-    except httpx.HTTPStatusError as e:
-        return '', f'HTTP {e.response.status_code}'
-    except Exception as e:
-        return '', str(e)[:200]
+def _sitemap_name(tag) -> str:
+    """Local name of a sitemap (or un-namespaced) tag; '' for extension
+    tags such as <image:loc> or <video:loc>."""
+    if not isinstance(tag, str):
+        return ''
+    if tag.startswith('{'):
+        namespace, _, name = tag[1:].partition('}')
+        return name if namespace in SITEMAP_NAMESPACES else ''
+    return tag
 
 
-def parse_sitemap(sitemap_url: str) -> tuple:
-    """Parse an XML sitemap and return list of page URLs.
-    Handles sitemap index files (nested sitemaps) one level deep.
-    Returns (url_list, error_message_or_None).
+def _drain_sitemap_events(parser):
+    for _, elem in parser.read_events():
+        name = _sitemap_name(elem.tag)
+        parent = elem.getparent()
+        if name in ('url', 'sitemap'):
+            entry = {'loc': '', 'lastmod': '', 'priority': ''}
+            for child in elem:
+                field = _sitemap_name(child.tag)
+                if field in entry and child.text:
+                    entry[field] = child.text.strip()
+        elif name == 'loc' and parent is not None and parent.getparent() is None:
+            # Non-standard sitemap with bare <loc> tags under the root
+            name, entry = 'url', {'loc': (elem.text or '').strip(), 'lastmod': '', 'priority': ''}
+        else:
+            continue  # read with its <url>/<sitemap>, or an extension tag
+        # Free what has been parsed so far: memory stays flat on huge sitemaps
+        elem.clear()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
+        if entry['loc']:
+            yield name, entry
+
+
+def _iter_sitemap(chunks):
+    """Incrementally parse sitemap XML (plain or gzipped) from byte chunks.
+    Yields ('url' | 'sitemap', {'loc', 'lastmod', 'priority'}) as soon as
+    each entry has been read, so callers can stop early.
+    """
+    parser = etree.XMLPullParser(events=('end',), resolve_entities=False, no_network=True)
+    decompressor = None
+    started = False
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if not started:
+            started = True
+            # .xml.gz served as a file rather than with Content-Encoding
+            if chunk[:2] == b'\x1f\x8b':
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        parser.feed(chunk)
+        yield from _drain_sitemap_events(parser)
+    parser.close()
+    yield from _drain_sitemap_events(parser)
+
+
+def _ordered(entries) -> list:
+    """Highest <priority> first, most recent <lastmod> first within a priority."""
+    def priority(entry):
+        try:
+            return float(entry.get('priority') or 0.5)
+        except ValueError:
+            return 0.5
+    entries = sorted(entries, key=lambda e: e.get('lastmod') or '', reverse=True)
+    return sorted(entries, key=priority, reverse=True)
+
+
+def _stream_sitemap(client, url, headers, limit=None) -> tuple:
+    """GET one sitemap and read it incrementally.
+    Returns (page_entries or None on 304, child_sitemap_entries, response).
+    Stops reading once `limit` page entries have been seen.
+    """
+    with client.stream('GET', url, headers=headers) as response:
+        if response.status_code == 304:
+            return None, [], response
+        response.raise_for_status()
+        pages, children = [], []
+        for kind, entry in _iter_sitemap(response.iter_bytes()):
+            (pages if kind == 'url' else children).append(entry)
+            if limit and len(pages) >= limit:
+                break
+    return pages, children, response
+
+
+def fetch_sitemap(sitemap_url: str, etag: str = '', last_modified: str = '', limit: int = None) -> tuple:
+    """Fetch and parse an XML sitemap, conditionally if validators are given.
+    Handles sitemap index files one level deep, fetching up to
+    SITEMAP_MAX_CHILDREN child sitemaps (most recently modified first)
+    concurrently; gzipped sitemaps are supported.  With `limit`, reading
+    stops once that many pages have been found.
+    Returns (entries, validators, error_message_or_None), where entries is
+    [{'loc', 'lastmod', 'priority'}] ordered by priority then lastmod, or
+    None if the server answered 304 Not Modified.  No validators are
+    returned for a sitemap index: an unchanged index says nothing about its
+    children, so it is always fetched (and its children read) in full.
     """
     try:
         with httpx.Client(timeout=TIMEOUT, follow_redirects=True) as client:
-            response = client.get(sitemap_url, headers=HEADERS)
-            response.raise_for_status()
+            entries, children, response = _stream_sitemap(
+                client, sitemap_url, _conditional_headers(etag, last_modified), limit,
+            )
+            if entries is None:
+                return None, {'etag': etag, 'last_modified': last_modified}, None
+
+            if children:
+                children = _ordered(children)[:SITEMAP_MAX_CHILDREN]
+                with ThreadPoolExecutor(max_workers=len(children)) as pool:
+                    futures = [
+                        pool.submit(_stream_sitemap, client, child['loc'], HEADERS, limit)
+                        for child in children
+                    ]
+                    for child, future in zip(children, futures):
+                        try:
+                            entries.extend(future.result()[0] or [])
+                        except Exception as e:
+                            logger.warning("Child sitemap %s failed: %s", child['loc'], e)
 
-        root = etree.fromstring(response.content)
-        ns = {'sm': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-
-        # Check if this is a sitemap index
-        sitemaps = root.findall('.//sm:sitemap/sm:loc', ns)
-        if sitemaps:
-            # Sitemap index — fetch each child sitemap (limit 10)
-            all_urls = []
-            for sm_loc in sitemaps[:10]:
-                child_urls, err = parse_sitemap(sm_loc.text.strip())
-                if not err:
-                    all_urls.extend(child_urls)
-            return all_urls, None
-
-        # Regular sitemap — extract <loc> URLs
-        urls = []
-        for loc in root.findall('.//sm:url/sm:loc', ns):
-            if loc.text:
-                urls.append(loc.text.strip())
-
-        # Also try without namespace (some sitemaps don't use it)
-        if not urls:
-            for loc in root.iter('{http://www.sitemaps.org/schemas/sitemap/0.9}loc'):
-                if loc.text:
-                    urls.append(loc.text.strip())
-
-        # Fallback: try plain <loc> tags without namespace
-        if not urls:
-            for loc in root.iter('loc'):
-                if loc.text:
-                    urls.append(loc.text.strip())
-
-        if not urls:
-            return [], 'No URLs found in sitemap'
-
-        return urls, None
+        if not entries:
+            return [], {}, 'No URLs found in sitemap'
+        entries = _ordered(entries)
+        if limit:
+            entries = entries[:limit]
+        return entries, {} if children else _validators(response), None
 
     except Exception as e:
-        return [], f'Sitemap parse error: {str(e)[:200]}'
+        return [], {}, f'Sitemap parse error: {str(e)[:200]}'
+
+
+def parse_sitemap(sitemap_url: str, limit: int = None) -> tuple:
+    """Parse an XML sitemap and return list of page URLs (at most `limit`).
+    Returns (url_list, error_message_or_None).
+    """
+    entries, _, error = fetch_sitemap(sitemap_url, limit=limit)
+    return [e['loc'] for e in entries], error
+
+
+class _HostLimiter:
+    """Per-host politeness: at most `concurrency` requests in flight and
+    request starts at least `delay` seconds apart."""
+
+    def __init__(self, concurrency, delay):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.delay = delay
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def wait_turn(self):
+        async with self._lock:
+            now = time.monotonic()
+            if self._next_start > now:
+                await asyncio.sleep(self._next_start - now)
+            self._next_start = max(now, self._next_start) + self.delay
+
+
+def _client(**kwargs):
+    return httpx.AsyncClient(
+        timeout=TIMEOUT,
+        follow_redirects=True,
+        headers=HEADERS,
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=settings.CRAWL_CONCURRENCY,
+            max_keepalive_connections=settings.CRAWL_CONCURRENCY,
+        ),
+        **kwargs,
+    )
+
+
+async def acrawl_urls(urls: list, max_pages: int = 50, delay: float = None, validators: dict = None) -> list:
+    """Async version of crawl_urls(); results are in the order of `urls`."""
+    if delay is None:
+        delay = settings.CRAWL_PER_HOST_DELAY
+    urls = urls[:max_pages]
+    validators = validators or {}
+    overall = asyncio.Semaphore(settings.CRAWL_CONCURRENCY)
+    hosts = {}
+
+    async def fetch(client, url):
+        host = hosts.get(urlsplit(url).netloc)
+        if host is None:
+            host = hosts[urlsplit(url).netloc] = _HostLimiter(settings.CRAWL_PER_HOST_CONCURRENCY, delay)
+        async with host.semaphore:
+            await host.wait_turn()
+            async with overall:
+                result = {'url': url, 'content': '', 'error': None, 'not_modified': False, 'etag': '', 'last_modified': ''}
+                try:
+                    previous = validators.get(url) or {}
+                    response = await client.get(url, headers=_conditional_headers(
+                        previous.get('etag', ''), previous.get('last_modified', ''),
+                    ))
+                    if response.status_code == 304:
+                        result.update(previous, not_modified=True)
+                        return result
+                    response.raise_for_status()
+                    result.update(_validators(response))
+                    result['content'], result['error'] = _extract_text(response)
+                except Exception as e:
+                    result['error'] = _fetch_error(e)
+        return result
+
+    async with _client() as client:
+        return list(await asyncio.gather(*(fetch(client, url) for url in urls)))
 
 
-def crawl_urls(urls: list, max_pages: int = 50, delay: float = 1.0) -> list:
+def crawl_urls(urls: list, max_pages: int = 50, delay: float = None, validators: dict = None) -> list:
     """Crawl a list of URLs and return extracted content.
-    Returns list of {"url": str, "content": str, "error": str|None}.
-    Respects a delay between requests and caps at max_pages.
+    Returns list of {"url": str, "content": str, "error": str|None,
+    "not_modified": bool, "etag": str, "last_modified": str}.
+    validators maps url → {'etag', 'last_modified'} from the previous crawl;
+    those pages are requested conditionally and come back with
+    not_modified=True (and no content) on a 304.
+    Fetches concurrently within the per-host limits and caps at max_pages.
+    Must not be called from a running event loop (use acrawl_urls there).
     """
-    results = []
-    for i, url in enumerate(urls[:max_pages]):
-        text, error = fetch_url_text(url)
-        results.append({
-            'url': url,
-            'content': text,
-            'error': error,
-        })
-        if i < len(urls) - 1:
-            time.sleep(delay)  # polite crawl delay
-    return results
+    return asyncio.run(acrawl_urls(urls, max_pages=max_pages, delay=delay, validators=validators))
@@ -6,6 +6,7 @@ from django.contrib import messages
 
 _URL_PROTOCOL_RE = re.compile(r'^https?://', re.IGNORECASE)
 _DOMAIN_LIKE_RE = re.compile(r'^[\w][\w.-]+\.\w{2,}')
+SITEMAP_PREVIEW_LIMIT = 100
 
 logger = logging.getLogger(__name__)
 from django.http import JsonResponse
@@ -15,8 +16,9 @@ from django.views.decorators.http import require_POST
 from django.shortcuts import get_object_or_404, redirect, render
 from user_querySafe.decorators import login_required
 from user_querySafe.forms import ChatbotCreateForm, ChatbotEditForm
-from user_querySafe.models import Activity, Chatbot, ChatbotDocument, ChatbotTemplate, ChatbotEmailReport, Conversation, GoalPlan, User, QSPlanAllot
-from .pipeline_processor import run_pipeline_background, PDF_DIR
+from user_querySafe.models import Activity, Chatbot, ChatbotDocument, ChatbotTemplate, ChatbotEmailReport, Conversation, GoalPlan, TrainingJob, User, QSPlanAllot
+from .pipeline_processor import PDF_DIR
+from .training_jobs import describe as describe_training_job, enqueue_training
 
 
 @login_required
@@ -187,35 +189,30 @@ def create_chatbot(request):
                                   and successful_uploads == 0 and url_count == 0)
 
             if successful_uploads > 0 or url_count > 0 or has_goal_text_only:
-                # Train in background thread so the page redirects immediately
-                from .pipeline_processor import run_pipeline_background
-
                 has_docs = ChatbotDocument.objects.filter(chatbot=chatbot).exists() or url_count > 0
                 is_goal_planner = (chatbot.template and chatbot.template.is_flagship
                                    and chatbot.template.template_id == 'TMPL01')
 
-                # Build post-pipeline callback for Goal Planner
-                post_callback = None
-                if is_goal_planner:
-                    _goal_text = goal_text or None
-                    _chatbot = chatbot
-                    _user = user
-                    _enable = enable_goal_emails
-                    def _goal_callback():
-                        try:
-                            _generate_goal_plan(_chatbot, _user, goal_text=_goal_text)
-                            GoalPlan.objects.filter(chatbot=_chatbot).update(enable_emails=_enable)
-                        except Exception:
-                            logger.exception("Goal plan generation failed for %s", _chatbot.chatbot_id)
-                    post_callback = _goal_callback
-
                 if has_docs:
-                    run_pipeline_background(chatbot.chatbot_id, post_callback=post_callback)
-                elif is_goal_planner and post_callback:
+                    # Queue training so the page redirects immediately; the worker
+                    # generates the Goal Planner's plan once training succeeds
+                    enqueue_training(
+                        chatbot,
+                        generate_goal_plan=bool(is_goal_planner),
+                        goal_text=goal_text or '',
+                        enable_goal_emails=bool(enable_goal_emails),
+                    )
+                elif is_goal_planner:
                     # Text-only goal planner with no docs - just generate the plan
                     import threading
+                    _goal_text = goal_text or None
+                    _enable = enable_goal_emails
                     def _bg_goal():
-                        post_callback()
+                        try:
+                            _generate_goal_plan(chatbot, user, goal_text=_goal_text)
+                            GoalPlan.objects.filter(chatbot=chatbot).update(enable_emails=_enable)
+                        except Exception:
+                            logger.exception("Goal plan generation failed for %s", chatbot.chatbot_id)
                         Chatbot.objects.filter(chatbot_id=chatbot.chatbot_id).update(status='trained')
                     threading.Thread(target=_bg_goal, daemon=False).start()
 
@@ -246,14 +243,12 @@ def _generate_goal_plan(chatbot, user, goal_text=None):
         # Direct text input from user - use as-is
         document_text = goal_text
     else:
-        # Read from trained document chunks
-        meta_path = os.path.join(settings.META_DIR, f"{chatbot.chatbot_id}-chunks.json")
-        if not os.path.exists(meta_path):
+        # Read from trained document chunks (only the first 50 are decoded)
+        from user_querySafe.chatbot.chunk_store import open_chunks
+        chunk_data = open_chunks(chatbot.chatbot_id)
+        if chunk_data is None:
             raise FileNotFoundError("No training data found for this chatbot")
 
-        with open(meta_path, 'r', encoding='utf-8') as f:
-            chunk_data = json.load(f)
-
         # Extract text content from chunks (limit to avoid exceeding context)
         document_text = "\n".join([
             entry.get('content', str(entry)) if isinstance(entry, dict) else str(entry)
@@ -369,7 +364,18 @@ def chatbot_status(request):
         return JsonResponse({'error': 'Unauthorized'}, status=403)
     user = User.objects.get(user_id=request.session['user_id'])
     chatbots = Chatbot.objects.filter(user=user)
-    data = [{'chatbot_id': bot.chatbot_id, 'status': bot.status} for bot in chatbots]
+    # Latest training job per bot (newest first, so the first seen wins)
+    latest_jobs = {}
+    for job in TrainingJob.objects.filter(chatbot__in=chatbots).order_by('-created_at'):
+        latest_jobs.setdefault(job.chatbot_id, job)
+    data = [
+        {
+            'chatbot_id': bot.chatbot_id,
+            'status': bot.status,
+            'training_job': describe_training_job(latest_jobs.get(bot.pk)),
+        }
+        for bot in chatbots
+    ]
     return JsonResponse(data, safe=False)
 
 @login_required
@@ -688,9 +694,8 @@ def retrain_chatbot(request, chatbot_id):
     chatbot.status = 'training'
     chatbot.save()
 
-    # Train in background thread so the page redirects immediately
-    from .pipeline_processor import run_pipeline_background
-    run_pipeline_background(chatbot.chatbot_id)
+    # Queue training so the page redirects immediately (only changed sources are reprocessed)
+    enqueue_training(chatbot)
     messages.success(request, f"'{chatbot.name}' is being retrained! This usually takes a few minutes.")
 
     Activity.log(user, f'Retrained chatbot {chatbot.name}',
@@ -714,10 +719,15 @@ def preview_sitemap(request):
 
     try:
         from user_querySafe.chatbot.url_scraper import parse_sitemap
-        urls, error = parse_sitemap(sitemap_url)
+        # Read one entry past the preview size to know whether there are more
+        urls, error = parse_sitemap(sitemap_url, limit=SITEMAP_PREVIEW_LIMIT + 1)
         if error:
             return JsonResponse({'error': error}, status=400)
-        return JsonResponse({'urls': urls[:100], 'total': len(urls)})
+        return JsonResponse({
+            'urls': urls[:SITEMAP_PREVIEW_LIMIT],
+            'total': min(len(urls), SITEMAP_PREVIEW_LIMIT),
+            'truncated': len(urls) > SITEMAP_PREVIEW_LIMIT,
+        })
     except ImportError:
         return JsonResponse({'error': 'URL scraping module not available'}, status=500)
 
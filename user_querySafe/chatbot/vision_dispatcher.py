@@ -0,0 +1,153 @@
+"""
+Rate-limit-aware dispatcher for Gemini vision calls.
+
+All training jobs in a process share one dispatcher per vision model, so
+two bots training at once split the quota instead of each assuming it has
+all of it.  A dispatcher combines:
+
+  • a token bucket (VISION_REQUESTS_PER_MINUTE) that paces request starts;
+  • an AIMD concurrency limit: +1 slot per window of successful calls,
+    halved on a 429, between 1 and VISION_MAX_CONCURRENCY;
+  • retries with exponential backoff and full jitter on 429 / 5xx and
+    connection errors (including httpx transport errors raised by the
+    google-genai client), up to VISION_MAX_RETRIES.
+
+So a large scanned document trains as fast as the quota allows, and a burst
+of throttling slows the run down instead of failing pages.
+"""
+import logging
+import random
+import threading
+import time
+
+import httpx
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_dispatchers = {}
+_dispatchers_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AimdLimiter:
+    """Concurrency limit with additive increase / multiplicative decrease."""
+
+    def __init__(self, initial, maximum):
+        self.maximum = maximum
+        self.limit = float(max(1, min(initial, maximum)))
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._last_decrease = 0.0
+
+    def acquire(self):
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def on_success(self):
+        with self._cond:
+            if self.limit < self.maximum:
+                # ~ +1 slot once every `limit` successes
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            # Calls already in flight when the quota ran out will all see a
+            # 429; count those as one congestion event, not many
+            now = time.monotonic()
+            if now - self._last_decrease < 1.0:
+                return
+            self._last_decrease = now
+            self.limit = max(1.0, self.limit / 2)
+            logger.info("Vision concurrency reduced to %d after throttling", int(self.limit))
+
+
+def _status_code(exc):
+    code = getattr(exc, 'code', None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(exc):
+    return _status_code(exc) in RETRYABLE_STATUS or isinstance(
+        exc, (ConnectionError, TimeoutError, httpx.TransportError),
+    )
+
+
+class VisionDispatcher:
+    def __init__(self, requests_per_minute, initial_concurrency, max_concurrency):
+        rate = requests_per_minute / 60.0
+        self.bucket = TokenBucket(rate, capacity=max(1.0, min(max_concurrency, rate * 5)))
+        self.limiter = AimdLimiter(initial_concurrency, max_concurrency)
+
+    def call(self, fn):
+        """Run fn() under the rate and concurrency limits, retrying transient failures."""
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            self.limiter.acquire()
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_retryable(e) or attempt >= settings.VISION_MAX_RETRIES:
+                    raise
+                if _status_code(e) == 429:
+                    self.limiter.on_throttle()
+                error = e
+            else:
+                self.limiter.on_success()
+                return result
+            finally:
+                self.limiter.release()
+
+            delay = random.uniform(0, min(
+                settings.VISION_BACKOFF_MAX_SECONDS,
+                settings.VISION_BACKOFF_BASE_SECONDS * 2 ** attempt,
+            ))
+            attempt += 1
+            logger.info("Vision call failed (%s); retry %d in %.1fs", error, attempt, delay)
+            time.sleep(delay)
+
+
+def get_dispatcher(model):
+    """The process-wide dispatcher for `model`."""
+    with _dispatchers_lock:
+        dispatcher = _dispatchers.get(model)
+        if dispatcher is None:
+            dispatcher = _dispatchers[model] = VisionDispatcher(
+                settings.VISION_REQUESTS_PER_MINUTE,
+                settings.VISION_INITIAL_CONCURRENCY,
+                settings.VISION_MAX_CONCURRENCY,
+            )
+        return dispatcher
@@ -0,0 +1,109 @@
+"""
+Worker warmup: load the embedding model and the busiest chatbot indexes
+before the first visitor arrives.
+
+Without this the first chat request on a fresh Cloud Run instance pays for
+importing torch, loading SentenceTransformer and reading a FAISS index off
+the GCS mount.  start_warmup() runs the work once per process in a
+background thread (gunicorn.conf.py calls it from post_worker_init) and
+/healthz/ready reports 503 until it has finished.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_ready = threading.Event()
+_start_lock = threading.Lock()
+_thread = None
+_report = {}
+
+
+def hot_chatbot_ids(limit, days=7):
+    """Trained chatbots with the most answered messages over the last `days` days."""
+    from user_querySafe.models import ChatbotUsage
+
+    since = timezone.localdate() - timedelta(days=days)
+    rows = (
+        ChatbotUsage.objects
+        .filter(date__gte=since, chatbot__status='trained')
+        .values('chatbot_id')
+        .annotate(total=Sum('bot_messages'))
+        .order_by('-total')[:limit]
+    )
+    return [row['chatbot_id'] for row in rows]
+
+
+def warm_up(preload=None):
+    """Load the model, run a dummy encode and preload hot indexes.
+
+    Returns a dict of phase timings in seconds.  `preload` overrides
+    settings.WARMUP_PRELOAD_INDEXES (how many chatbot indexes to load).
+    """
+    from user_querySafe.chatbot.embedding_model import get_embedding_model
+    from user_querySafe.chatbot.index_cache import get_index_and_chunks
+
+    timings = {}
+    start = time.perf_counter()
+    model = get_embedding_model()
+    timings['model_load'] = time.perf_counter() - start
+
+    # The first encode initialises torch kernels and the tokenizer; it's
+    # called on the model directly so the query cache isn't polluted
+    start = time.perf_counter()
+    model.encode(["warmup"])
+    timings['first_encode'] = time.perf_counter() - start
+
+    limit = settings.WARMUP_PRELOAD_INDEXES if preload is None else preload
+    start = time.perf_counter()
+    loaded = 0
+    if limit > 0:
+        try:
+            for chatbot_id in hot_chatbot_ids(limit):
+                index, _ = get_index_and_chunks(chatbot_id)
+                if index is not None:
+                    loaded += 1
+        except Exception:
+            # A cold database or missing bucket shouldn't keep the worker unready
+            logger.warning("Index preload failed during warmup", exc_info=True)
+        finally:
+            close_old_connections()
+    timings['index_preload'] = time.perf_counter() - start
+    timings['indexes_loaded'] = loaded
+    return timings
+
+
+def _run():
+    start = time.perf_counter()
+    try:
+        _report.update(warm_up())
+        logger.info("Warmup finished in %.2fs: %s", time.perf_counter() - start, _report)
+    except Exception:
+        logger.exception("Warmup failed; the model will load on first use instead")
+    finally:
+        _report['total'] = time.perf_counter() - start
+        _ready.set()
+
+
+def start_warmup():
+    """Start warmup in a background thread (idempotent per process)."""
+    global _thread
+    with _start_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name="querysafe-warmup", daemon=True)
+            _thread.start()
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def warmup_report():
+    return dict(_report)
@@ -14,7 +14,7 @@ def engagement_data(request):
     if not user_id:
         return context
 
-    from user_querySafe.models import User, Chatbot, Conversation, Message
+    from user_querySafe.models import User, Chatbot, ChatbotUsage, Conversation
 
     try:
         user = User.objects.get(user_id=user_id)
@@ -40,17 +40,11 @@ def engagement_data(request):
         started_at__gte=today_start
     ).count()
 
-    context['messages_today'] = Message.objects.filter(
-        conversation__chatbot__in=chatbots,
-        is_bot=True,
-        timestamp__gte=today_start
-    ).count()
+    context['messages_today'] = ChatbotUsage.total_for(chatbots, since=timezone.localdate())
 
     # ── Milestone detection ─────────────────────────────────────────
     total_conversations = Conversation.objects.filter(chatbot__in=chatbots).count()
-    total_messages = Message.objects.filter(
-        conversation__chatbot__in=chatbots, is_bot=True
-    ).count()
+    total_messages = ChatbotUsage.total_for(chatbots)
 
     milestones = []
     for threshold in [10, 50, 100, 500, 1000]:
@@ -207,9 +207,18 @@ class ChatbotEditForm(forms.ModelForm):
         })
     )
 
+    enable_answer_cache = forms.BooleanField(
+        required=False,
+        label="Cache Repeated Answers",
+        widget=forms.CheckboxInput(attrs={
+            'class': 'form-check-input',
+            'id': 'id_enable_answer_cache'
+        })
+    )
+
     class Meta:
         model = Chatbot
-        fields = ['name', 'description', 'logo', 'bot_instructions', 'sample_questions', 'collect_email', 'collect_email_message', 'enable_web_search']
+        fields = ['name', 'description', 'logo', 'bot_instructions', 'sample_questions', 'collect_email', 'collect_email_message', 'enable_web_search', 'enable_answer_cache']
 
 class OTPVerificationForm(forms.Form):
     otp = forms.CharField(max_length=6, min_length=6, widget=forms.TextInput(attrs={
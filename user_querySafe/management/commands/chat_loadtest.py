@@ -0,0 +1,110 @@
+"""
+Management command to load-test the public chat endpoint.
+
+Fires concurrent POSTs at /chat/ (or /chat/stream/) and reports throughput,
+latency percentiles and the peak number of requests in flight, so the
+sync (WSGI) and async (ASGI / uvicorn workers) deployments can be compared
+on the same instance size.
+
+Usage:
+  # Before: gunicorn querySafe.wsgi:application --workers 2
+  # After:  gunicorn querySafe.asgi:application -k uvicorn_worker.UvicornWorker --workers 2
+  python manage.py chat_loadtest --base-url http://localhost:8080 --chatbot-id ABC123 \
+      --concurrency 200 --requests 1000
+
+Note: each answered request counts against the chatbot's query limit, so
+point this at a test bot on a plan with enough headroom.
+"""
+import asyncio
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Load-test the chat endpoint with concurrent requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', required=True, help='Server base URL, e.g. http://localhost:8080')
+        parser.add_argument('--chatbot-id', required=True, help='Trained chatbot to query')
+        parser.add_argument('--concurrency', type=int, default=50, help='Max requests in flight')
+        parser.add_argument('--requests', type=int, default=200, help='Total requests to send')
+        parser.add_argument('--query', default='What do you offer?', help='Question to ask')
+        parser.add_argument('--stream', action='store_true', help='Hit /chat/stream/ instead of /chat/')
+        parser.add_argument('--timeout', type=float, default=120.0, help='Per-request timeout in seconds')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency and --requests must be positive')
+        results = asyncio.run(self._run(options))
+        self._report(results, options)
+
+    async def _run(self, options):
+        path = '/chat/stream/' if options['stream'] else '/chat/'
+        url = options['base_url'].rstrip('/') + path
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        in_flight = 0
+        peak = 0
+        latencies, ttfb, failures = [], [], []
+
+        async def one(client):
+            nonlocal in_flight, peak
+            async with semaphore:
+                in_flight += 1
+                peak = max(peak, in_flight)
+                start = time.perf_counter()
+                try:
+                    # No session cookie is sent, so every request is a fresh visitor and
+                    # the per-visitor rate limit doesn't kick in
+                    async with client.stream('POST', url, json={
+                        'query': options['query'],
+                        'chatbot_id': options['chatbot_id'],
+                    }) as response:
+                        first = None
+                        async for _ in response.aiter_bytes():
+                            if first is None:
+                                first = time.perf_counter() - start
+                        if response.status_code != 200:
+                            failures.append(response.status_code)
+                            return
+                    latencies.append(time.perf_counter() - start)
+                    ttfb.append(first if first is not None else latencies[-1])
+                except Exception as e:
+                    failures.append(type(e).__name__)
+                finally:
+                    in_flight -= 1
+
+        limits = httpx.Limits(max_connections=options['concurrency'], max_keepalive_connections=options['concurrency'])
+        async with httpx.AsyncClient(timeout=options['timeout'], limits=limits) as client:
+            wall_start = time.perf_counter()
+            await asyncio.gather(*(one(client) for _ in range(options['requests'])))
+            wall = time.perf_counter() - wall_start
+
+        return {'latencies': latencies, 'ttfb': ttfb, 'failures': failures, 'peak': peak, 'wall': wall}
+
+    def _report(self, results, options):
+        latencies = sorted(results['latencies'])
+        ok = len(latencies)
+
+        def pct(values, p):
+            if not values:
+                return 0.0
+            return values[min(len(values) - 1, int(len(values) * p))]
+
+        self.stdout.write(f"Requests:        {options['requests']} (concurrency {options['concurrency']})")
+        self.stdout.write(f"Succeeded:       {ok}")
+        self.stdout.write(f"Failed:          {len(results['failures'])}")
+        self.stdout.write(f"Peak in flight:  {results['peak']}")
+        self.stdout.write(f"Wall time:       {results['wall']:.2f}s")
+        self.stdout.write(f"Throughput:      {ok / results['wall']:.2f} req/s" if results['wall'] else "Throughput: n/a")
+        if latencies:
+            ttfb = sorted(results['ttfb'])
+            self.stdout.write(f"Latency p50/p99: {pct(latencies, 0.5):.2f}s / {pct(latencies, 0.99):.2f}s (mean {statistics.mean(latencies):.2f}s)")
+            self.stdout.write(f"TTFB p50/p99:    {pct(ttfb, 0.5):.2f}s / {pct(ttfb, 0.99):.2f}s")
+        if results['failures']:
+            counts = {}
+            for f in results['failures']:
+                counts[f] = counts.get(f, 0) + 1
+            self.stdout.write(self.style.WARNING(f"Failures by type: {counts}"))
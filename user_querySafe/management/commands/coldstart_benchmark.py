@@ -0,0 +1,58 @@
+"""
+Management command to measure cold-start cost of the chat path.
+
+Every manage.py invocation is a fresh process, so this sees the same cold
+state as a new Cloud Run worker.  It times each warmup phase and then the
+first chat retrieval (query encode + index load + FAISS search); run it
+with --no-warmup to see what the first visitor pays without warmup.
+
+Usage:
+  python manage.py coldstart_benchmark --chatbot-id ABC123
+  python manage.py coldstart_benchmark --chatbot-id ABC123 --no-warmup
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from user_querySafe.chatbot.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = 'Measure cold-start latency of the embedding model and index loading'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chatbot-id', help='Trained chatbot to run the first query against')
+        parser.add_argument('--query', default='What do you offer?', help='Question to ask')
+        parser.add_argument('--no-warmup', action='store_true', help='Skip warmup and time the first query cold')
+        parser.add_argument('--preload', type=int, default=None, help='Indexes to preload (default: WARMUP_PRELOAD_INDEXES)')
+
+    def handle(self, *args, **options):
+        if not options['no_warmup']:
+            timings = warm_up(preload=options['preload'])
+            self.stdout.write("Warmup:")
+            self.stdout.write(f"  Model load:     {timings['model_load'] * 1000:.0f} ms")
+            self.stdout.write(f"  First encode:   {timings['first_encode'] * 1000:.0f} ms")
+            self.stdout.write(f"  Index preload:  {timings['index_preload'] * 1000:.0f} ms ({timings['indexes_loaded']} indexes)")
+
+        if not options['chatbot_id']:
+            return
+
+        from user_querySafe.chatbot.embedding_model import encode_query
+        from user_querySafe.chatbot.index_cache import get_index_and_chunks
+
+        self.stdout.write("First query:")
+        start = time.perf_counter()
+        vector = encode_query(options['query'])
+        encoded = time.perf_counter()
+        index, _ = get_index_and_chunks(options['chatbot_id'])
+        loaded = time.perf_counter()
+        if index is None:
+            self.stdout.write(self.style.WARNING(f"  No index found for chatbot {options['chatbot_id']}"))
+            return
+        index.search(vector, 8)
+        searched = time.perf_counter()
+
+        self.stdout.write(f"  Encode:         {(encoded - start) * 1000:.0f} ms")
+        self.stdout.write(f"  Index load:     {(loaded - encoded) * 1000:.0f} ms")
+        self.stdout.write(f"  Search:         {(searched - loaded) * 1000:.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"  Total:          {(searched - start) * 1000:.0f} ms"))
@@ -0,0 +1,79 @@
+"""
+Management command to compare embedding backends.
+
+Encodes the same texts with each backend and reports throughput plus
+parity against the torch backend (cosine similarity of each vector to its
+torch counterpart), flagging a backend whose minimum cosine falls below
+MIN_COSINE_VS_TORCH.  Even with a high minimum cosine, switching backends
+means retraining every chatbot: its index was built from the old vectors.
+
+Usage:
+  python manage.py embedding_benchmark
+  python manage.py embedding_benchmark --chatbot-id ABC123 --limit 2000
+  python manage.py embedding_benchmark --backends torch onnx-int8 --batch-size 64
+"""
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from user_querySafe.chatbot.embedding_model import BACKENDS, MIN_COSINE_VS_TORCH, load_embedding_model
+
+SAMPLE_TEXTS = [
+    "What are your opening hours?",
+    "How do I reset my password?",
+    "Do you ship internationally and how long does delivery take?",
+    "Our refund policy allows returns within 30 days of purchase provided the item is unused.",
+    "The premium plan includes priority support, custom branding and unlimited chatbots.",
+    "Can I integrate the chatbot widget with a WordPress site?",
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark embedding backends for throughput and parity with torch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+        parser.add_argument('--chatbot-id', help="Use this chatbot's trained chunks as the corpus")
+        parser.add_argument('--limit', type=int, default=1000, help='Max texts to encode')
+        parser.add_argument('--batch-size', type=int, default=32)
+
+    def handle(self, *args, **options):
+        texts = self._corpus(options)
+        self.stdout.write(f"Corpus: {len(texts)} texts")
+
+        backends = options['backends']
+        if 'torch' not in backends:
+            backends = ['torch'] + backends  # reference for parity
+
+        reference = None
+        for backend in backends:
+            model = load_embedding_model(backend)
+            model.encode(texts[:8])  # warm up kernels before timing
+
+            start = time.perf_counter()
+            vectors = model.encode(texts, batch_size=options['batch_size'], show_progress_bar=False).astype('float32')
+            elapsed = time.perf_counter() - start
+
+            line = f"{backend:<10} {len(texts) / elapsed:8.1f} texts/s"
+            if reference is None:
+                reference = vectors
+            else:
+                cos = np.sum(vectors * reference, axis=1) / (
+                    np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1)
+                )
+                line += f"   cosine vs torch: min {cos.min():.4f}  mean {cos.mean():.4f}"
+                if cos.min() < MIN_COSINE_VS_TORCH[backend]:
+                    line += f"   (below expected {MIN_COSINE_VS_TORCH[backend]})"
+            self.stdout.write(line)
+
+    def _corpus(self, options):
+        if not options['chatbot_id']:
+            repeats = -(-options['limit'] // len(SAMPLE_TEXTS))
+            return (SAMPLE_TEXTS * repeats)[:options['limit']]
+
+        from user_querySafe.chatbot.chunk_store import open_chunks
+        chunks = open_chunks(options['chatbot_id'])
+        if chunks is None:
+            raise CommandError(f"No trained chunks for chatbot {options['chatbot_id']}")
+        return [c['content'] if isinstance(c, dict) else c for c in chunks[:options['limit']]]
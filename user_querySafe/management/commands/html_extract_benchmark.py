@@ -0,0 +1,81 @@
+"""
+Management command to benchmark HTML-to-text extraction for URL sources.
+
+Runs url_scraper.html_to_text() and the previous per-tag XPath cleaner over
+a directory of saved .html pages (e.g. `curl -o page.html <url>` for a few
+customer sites) and reports pages/sec and output size for each.  Without
+--dir it uses generated pages.
+
+Usage:
+  python manage.py html_extract_benchmark --dir ./html-fixtures
+  python manage.py html_extract_benchmark --pages 200 --repeat 5
+"""
+import glob
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from lxml import html as lxml_html
+
+from user_querySafe.chatbot.url_scraper import REMOVE_TAGS, html_to_text
+
+
+def legacy_html_to_text(content):
+    """The cleaner used before html_to_text(): one XPath scan per removed tag."""
+    # It parsed response.text, i.e. the body decoded to str first
+    tree = lxml_html.fromstring(content.decode('utf-8', errors='replace'))
+    for tag in REMOVE_TAGS:
+        for element in tree.xpath(f'//{tag}'):
+            parent = element.getparent()
+            if parent is not None:
+                parent.remove(element)
+    body = tree.xpath('//body')
+    target = body[0] if body else tree
+    lines = [line.strip() for line in target.text_content().splitlines() if line.strip()]
+    return '\n'.join(lines)
+
+
+def _generated_page(n):
+    rows = ''.join(f'<tr><td>Item {i}</td><td>{i * 3}</td></tr>' for i in range(30))
+    sections = ''.join(
+        f'<section><h2>Section {i}</h2><p>Paragraph {i} of page {n} with <a href="#">a link</a> '
+        f'and <b>some</b> inline markup to walk through.</p><ul><li>one</li><li>two</li></ul></section>'
+        for i in range(40)
+    )
+    return (
+        f'<html><head><title>Page {n}</title><style>body{{margin:0}}</style>'
+        f'<script>{"var a = 1;" * 200}</script></head><body><header><nav>Home | About</nav></header>'
+        f'<main><h1>Page {n}</h1>{sections}<table>{rows}</table></main>'
+        f'<aside>Related</aside><footer>Footer</footer><script>track()</script></body></html>'
+    ).encode('utf-8')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark single-pass vs legacy HTML text extraction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Directory of saved .html pages')
+        parser.add_argument('--pages', type=int, default=100, help='Generated pages when --dir is not given')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if options['dir']:
+            paths = sorted(glob.glob(os.path.join(options['dir'], '*.htm*')))
+            if not paths:
+                raise CommandError(f"No .html files in {options['dir']}")
+            pages = []
+            for path in paths:
+                with open(path, 'rb') as f:
+                    pages.append(f.read())
+        else:
+            pages = [_generated_page(n) for n in range(options['pages'])]
+
+        total_kb = sum(len(p) for p in pages) / 1024
+        self.stdout.write(f"{len(pages)} pages, {total_kb:.0f} KB, {options['repeat']} repeats")
+        for name, extract in (('legacy', legacy_html_to_text), ('single-pass', html_to_text)):
+            start = time.perf_counter()
+            for _ in range(options['repeat']):
+                chars = sum(len(extract(p)) for p in pages)
+            elapsed = time.perf_counter() - start
+            rate = len(pages) * options['repeat'] / elapsed
+            self.stdout.write(f"{name:<12} {rate:8.1f} pages/s   {chars / len(pages):8.0f} chars/page")
@@ -0,0 +1,91 @@
+"""
+Management command to benchmark FAISS index types.
+
+Builds a flat, HNSW and IVF-PQ index over the same vectors and reports, for
+each, build time, approximate memory, recall@k against the exact flat
+result and p50/p99 single-query search latency.  Use it to tune
+FAISS_FLAT_MAX_VECTORS, FAISS_HNSW_* and FAISS_IVF_NPROBE.
+
+Usage:
+  python manage.py index_benchmark --vectors 50000
+  python manage.py index_benchmark --chatbot-id ABC123
+"""
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from user_querySafe.chatbot.index_factory import (
+    FLAT, INDEX_TYPES, IVFPQ, build_index, choose_index_type, estimate_bytes,
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark recall and latency of flat vs HNSW vs IVF-PQ indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chatbot-id', help="Embed this chatbot's trained chunks as the corpus")
+        parser.add_argument('--vectors', type=int, default=20000, help='Synthetic corpus size (ignored with --chatbot-id)')
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('-k', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        corpus = self._corpus(options, rng)
+        n, dim = corpus.shape
+        k = options['k']
+
+        # Queries: perturbed corpus vectors, like a question phrased close to a chunk
+        picks = rng.choice(n, size=min(options['queries'], n), replace=False)
+        queries = corpus[picks] + rng.normal(scale=0.05, size=(len(picks), dim)).astype('float32')
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        self.stdout.write(f"Corpus: {n} x {dim}, {len(queries)} queries, k={k}")
+        self.stdout.write(f"Factory would choose: {choose_index_type(n, dim)}")
+        self.stdout.write(f"{'type':<6} {'build':>8} {'memory':>9} {'recall@' + str(k):>9} {'p50':>9} {'p99':>9}")
+
+        truth = None
+        for index_type in INDEX_TYPES:
+            if index_type == IVFPQ and n < 10000:
+                self.stdout.write(f"{index_type:<6} skipped (needs >= 10000 vectors to train)")
+                continue
+            start = time.perf_counter()
+            index, _ = build_index(corpus, index_type=index_type)
+            build = time.perf_counter() - start
+
+            _, ids = index.search(queries, k)
+            if index_type == FLAT:
+                truth = ids
+            recall = np.mean([
+                len(set(ids[i]) & set(truth[i])) / k for i in range(len(queries))
+            ])
+
+            latencies = []
+            for q in queries:
+                start = time.perf_counter()
+                index.search(q.reshape(1, -1), k)
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+
+            memory = estimate_bytes(index_type, n, dim) / (1024 * 1024)
+            self.stdout.write(
+                f"{index_type:<6} {build:7.2f}s {memory:7.1f}MB {recall:9.3f} {p50:7.3f}ms {p99:7.3f}ms"
+            )
+
+    def _corpus(self, options, rng):
+        if not options['chatbot_id']:
+            vectors = rng.normal(size=(options['vectors'], 384)).astype('float32')
+            return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        from user_querySafe.chatbot.chunk_store import open_chunks
+        from user_querySafe.chatbot.embedding_model import get_embedding_model
+
+        chunks = open_chunks(options['chatbot_id'])
+        if chunks is None:
+            raise CommandError(f"No trained chunks for chatbot {options['chatbot_id']}")
+        texts = [c['content'] if isinstance(c, dict) else c for c in chunks]
+        self.stdout.write(f"Embedding {len(texts)} chunks …")
+        return get_embedding_model().encode(texts, show_progress_bar=False).astype('float32')
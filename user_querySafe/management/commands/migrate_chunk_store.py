@@ -0,0 +1,60 @@
+"""
+Management command to convert chunk metadata from chunks.json to the
+binary chunk store (chunks.bin).
+
+Bots retrained after the switch get a chunks.bin automatically; this
+converts the rest in one go.  Safe to re-run: bots that already have a
+chunks.bin are skipped unless --force is given.
+
+Usage:
+  python manage.py migrate_chunk_store
+  python manage.py migrate_chunk_store --chatbot-id ABC123 --delete-json
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from user_querySafe.chatbot.chunk_store import chunk_store_path, migrate_legacy_json
+from user_querySafe.chatbot.index_cache import invalidate
+
+SUFFIX = "-chunks.json"
+
+
+class Command(BaseCommand):
+    help = 'Convert chunks.json metadata files to the memory-mapped chunk store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chatbot-id', help='Only convert this chatbot')
+        parser.add_argument('--delete-json', action='store_true', help='Remove chunks.json after converting')
+        parser.add_argument('--force', action='store_true', help='Rewrite chunks.bin even if it already exists')
+
+    def handle(self, *args, **options):
+        if options['chatbot_id']:
+            chatbot_ids = [options['chatbot_id']]
+        else:
+            chatbot_ids = sorted(
+                name[:-len(SUFFIX)] for name in os.listdir(settings.META_DIR) if name.endswith(SUFFIX)
+            )
+
+        converted = skipped = failed = 0
+        for chatbot_id in chatbot_ids:
+            if os.path.exists(chunk_store_path(chatbot_id)) and not options['force']:
+                skipped += 1
+                continue
+            try:
+                count = migrate_legacy_json(chatbot_id, delete_json=options['delete_json'])
+            except Exception as e:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f"{chatbot_id}: {e}"))
+                continue
+            if count is None:
+                skipped += 1
+                continue
+            invalidate(chatbot_id)
+            converted += 1
+            self.stdout.write(f"{chatbot_id}: {count} chunks")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Converted {converted}, skipped {skipped}, failed {failed}"
+        ))
@@ -0,0 +1,63 @@
+"""
+Management command to rebuild the denormalized ChatbotUsage counters.
+
+The daily counters are incremented on every stored bot answer; this
+recomputes them from the messages table to repair drift (e.g. after manual
+data fixes or deleted conversations).
+
+Usage:
+  python manage.py reconcile_usage_counters              # all chatbots
+  python manage.py reconcile_usage_counters --chatbot-id ABC123
+  python manage.py reconcile_usage_counters --dry-run    # report differences only
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+from user_querySafe.models import Chatbot, ChatbotUsage, Message
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-chatbot daily usage counters from stored bot messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chatbot-id', help='Only reconcile this chatbot')
+        parser.add_argument('--dry-run', action='store_true', help='Report differences without writing')
+
+    def handle(self, *args, **options):
+        chatbots = Chatbot.objects.all()
+        if options['chatbot_id']:
+            chatbots = chatbots.filter(chatbot_id=options['chatbot_id'])
+            if not chatbots.exists():
+                raise CommandError(f"Chatbot {options['chatbot_id']} not found")
+
+        fixed = 0
+        for chatbot in chatbots.iterator():
+            actual = {
+                row['day']: row['total']
+                for row in Message.objects.filter(conversation__chatbot=chatbot, is_bot=True)
+                .annotate(day=TruncDate('timestamp'))
+                .values('day')
+                .annotate(total=Count('id'))
+            }
+            stored = dict(ChatbotUsage.objects.filter(chatbot=chatbot).values_list('date', 'bot_messages'))
+            if actual == stored:
+                continue
+
+            fixed += 1
+            self.stdout.write(self.style.WARNING(
+                f"{chatbot.chatbot_id}: counters {sum(stored.values())} → actual {sum(actual.values())}"
+            ))
+            if options['dry_run']:
+                continue
+
+            with transaction.atomic():
+                ChatbotUsage.objects.filter(chatbot=chatbot).exclude(date__in=actual.keys()).delete()
+                for day, total in actual.items():
+                    ChatbotUsage.objects.update_or_create(
+                        chatbot=chatbot, date=day, defaults={'bot_messages': total},
+                    )
+
+        verb = 'would be reconciled' if options['dry_run'] else 'reconciled'
+        self.stdout.write(self.style.SUCCESS(f"{fixed} chatbot(s) {verb}."))
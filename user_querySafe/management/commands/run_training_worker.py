@@ -0,0 +1,57 @@
+"""
+Management command to run training jobs from the TrainingJob queue.
+
+Run it as its own process (Procfile `worker`, or a Cloud Run worker pool —
+see DEPLOY_QUERYSAFE.md) so training never shares CPU with chat traffic.
+Embedding in this process uses EMBEDDING_TRAINING_THREADS rather than the
+web workers' EMBEDDING_THREADS.
+
+Usage:
+  python manage.py run_training_worker                   # run forever
+  python manage.py run_training_worker --concurrency 2
+  python manage.py run_training_worker --once            # drain the queue and exit (cron / Cloud Run Job)
+"""
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from user_querySafe.chatbot.embedding_model import set_thread_budget
+from user_querySafe.chatbot.training_jobs import work
+
+
+class Command(BaseCommand):
+    help = 'Process queued chatbot training jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help='Jobs run in parallel by this process (default: TRAINING_WORKER_CONCURRENCY)')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds between queue polls when idle')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency'] or settings.TRAINING_WORKER_CONCURRENCY
+        set_thread_budget(settings.EMBEDDING_TRAINING_THREADS)
+        stop = threading.Event()
+
+        def _shutdown(signum, frame):
+            # Finish the jobs in hand; anything cut off is requeued via its stale heartbeat
+            self.stdout.write("Shutting down after current jobs …")
+            stop.set()
+
+        signal.signal(signal.SIGTERM, _shutdown)
+        signal.signal(signal.SIGINT, _shutdown)
+
+        self.stdout.write(f"Training worker started (concurrency {concurrency})")
+        threads = [
+            threading.Thread(target=work, args=(stop,), kwargs={'once': options['once'], 'poll_interval': options['poll_interval']})
+            for _ in range(concurrency)
+        ]
+        for t in threads:
+            t.start()
+        # Join with a timeout so signals are still delivered to the main thread
+        while any(t.is_alive() for t in threads):
+            for t in threads:
+                t.join(timeout=1.0)
+        self.stdout.write(self.style.SUCCESS("Training worker stopped"))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-17 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_usage(apps, schema_editor):
+    """Seed daily counters from existing bot messages so quotas carry over."""
+    Message = apps.get_model('user_querySafe', 'Message')
+    ChatbotUsage = apps.get_model('user_querySafe', 'ChatbotUsage')
+
+    rows = (
+        Message.objects.filter(is_bot=True)
+        .annotate(day=TruncDate('timestamp'))
+        .values('conversation__chatbot_id', 'day')
+        .annotate(total=Count('id'))
+    )
+    ChatbotUsage.objects.bulk_create(
+        [
+            ChatbotUsage(chatbot_id=row['conversation__chatbot_id'], date=row['day'], bot_messages=row['total'])
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_querySafe', '0012_add_user_last_login'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatbotUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bot_messages', models.PositiveIntegerField(default=0)),
+                ('chatbot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_days', to='user_querySafe.chatbot')),
+            ],
+            options={
+                'db_table': 'chatbot_usage',
+                'unique_together': {('chatbot', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_usage, migrations.RunPython.noop),
+    ]
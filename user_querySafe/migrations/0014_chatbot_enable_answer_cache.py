@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_querySafe', '0013_chatbotusage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatbot',
+            name='enable_answer_cache',
+            field=models.BooleanField(default=False, help_text='Reuse answers for repeated opening questions until the next retrain'),
+        ),
+    ]
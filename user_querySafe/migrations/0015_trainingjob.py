@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-17 12:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_querySafe', '0014_chatbot_enable_answer_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('full_rebuild', models.BooleanField(default=False, help_text='Reprocess every source instead of only changed ones')),
+                ('rerun_requested', models.BooleanField(default=False)),
+                ('generate_goal_plan', models.BooleanField(default=False)),
+                ('goal_text', models.TextField(blank=True, default='')),
+                ('enable_goal_emails', models.BooleanField(default=False)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, help_text='Not picked up before this time (retry backoff)')),
+                ('worker', models.CharField(blank=True, default='', max_length=100)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('chatbot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='training_jobs', to='user_querySafe.chatbot')),
+            ],
+            options={
+                'db_table': 'training_job',
+                'indexes': [models.Index(fields=['status', 'run_after'], name='training_job_queue_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('chatbot',), name='one_active_training_job_per_chatbot')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_querySafe', '0015_trainingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visionapiusage',
+            name='calls_saved',
+            field=models.PositiveIntegerField(default=0, help_text='Calls avoided by sending several pages per request'),
+        ),
+    ]
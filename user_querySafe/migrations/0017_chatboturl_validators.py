@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-17 13:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_querySafe', '0016_visionapiusage_calls_saved'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatboturl',
+            name='etag',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='chatboturl',
+            name='last_modified',
+            field=models.CharField(blank=True, default='', help_text='Last-Modified header of the last fetch', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='chatboturl',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 of the extracted text (pages) or of the page list (sitemaps)', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='chatboturl',
+            name='sitemap_entries',
+            field=models.JSONField(blank=True, default=list, help_text="Pages ({loc, lastmod}) the sitemap listed last time, reused when it hasn't changed"),
+        ),
+    ]
@@ -1,9 +1,11 @@
-from django.db import models, IntegrityError
+from django.db import models, IntegrityError, transaction
+from django.db.models import F, Sum
 import random
 import string
 import os
 from django.conf import settings
 from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
 from django.utils.text import get_valid_filename
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password, check_password as django_check_password
@@ -100,6 +102,7 @@ class Chatbot(models.Model):
     collect_email = models.BooleanField(default=False, help_text='Require visitor email before chatting')
     collect_email_message = models.TextField(blank=True, default='Please enter your email to get started.', help_text='Message shown when asking for email')
     enable_web_search = models.BooleanField(default=False, help_text='Enable Google Search grounding for live web data in chat responses')
+    enable_answer_cache = models.BooleanField(default=False, help_text='Reuse answers for repeated opening questions until the next retrain')
     template = models.ForeignKey('ChatbotTemplate', null=True, blank=True, on_delete=models.SET_NULL, related_name='chatbots', help_text='Template used to create this chatbot')
     last_trained_at = models.DateTimeField(null=True, blank=True, help_text='Last successful training timestamp')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -290,6 +293,7 @@ class VisionAPIUsage(models.Model):
     """Tracks Gemini Vision API calls per chatbot for cost monitoring."""
     chatbot = models.ForeignKey('Chatbot', on_delete=models.CASCADE, related_name='vision_usage')
     call_count = models.PositiveIntegerField(default=1)
+    calls_saved = models.PositiveIntegerField(default=0, help_text='Calls avoided by sending several pages per request')
     call_type = models.CharField(max_length=20, choices=[
         ('training', 'Training Pipeline'),
         ('chat', 'Chat Response'),
@@ -303,6 +307,107 @@ class VisionAPIUsage(models.Model):
         return f"{self.chatbot.chatbot_id} - {self.call_type} ({self.call_count})"
 
 
+class ChatbotUsage(models.Model):
+    """Denormalized daily count of bot answers per chatbot.
+
+    Incremented whenever a bot Message is stored, so plan-limit checks and
+    usage pages sum a handful of rows (one per active day, indexed by the
+    unique constraint) instead of counting the whole messages table.
+    Kept in its own table rather than on Chatbot so Chatbot.save() calls
+    elsewhere can't overwrite a concurrent increment.
+    Rebuild with `python manage.py reconcile_usage_counters`.
+    """
+    chatbot = models.ForeignKey('Chatbot', on_delete=models.CASCADE, related_name='usage_days')
+    date = models.DateField()
+    bot_messages = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'chatbot_usage'
+        unique_together = ('chatbot', 'date')
+
+    def __str__(self):
+        return f"{self.chatbot.chatbot_id} - {self.date} ({self.bot_messages})"
+
+    @classmethod
+    def record_bot_message(cls, chatbot):
+        """Atomically bump today's counter for one bot answer."""
+        from django.utils import timezone
+        today = timezone.localdate()
+        updated = cls.objects.filter(chatbot=chatbot, date=today).update(bot_messages=F('bot_messages') + 1)
+        if not updated:
+            try:
+                # Savepoint so a lost insert race doesn't poison the caller's transaction
+                with transaction.atomic():
+                    cls.objects.create(chatbot=chatbot, date=today, bot_messages=1)
+            except IntegrityError:
+                # Another worker created today's row first
+                cls.objects.filter(chatbot=chatbot, date=today).update(bot_messages=F('bot_messages') + 1)
+
+    @classmethod
+    def total_for(cls, chatbots, since=None):
+        """Bot answers for a chatbot (or queryset of chatbots), optionally from `since` (a date) onwards."""
+        if isinstance(chatbots, Chatbot):
+            qs = cls.objects.filter(chatbot=chatbots)
+        else:
+            qs = cls.objects.filter(chatbot__in=chatbots)
+        if since is not None:
+            qs = qs.filter(date__gte=since)
+        return qs.aggregate(total=Sum('bot_messages'))['total'] or 0
+
+
+class TrainingJob(models.Model):
+    """A queued training run, executed by `python manage.py run_training_worker`.
+
+    At most one job per chatbot is queued or running at a time (enforced by
+    a partial unique constraint, so it holds across processes).  Asking to
+    train a bot whose job is already running sets rerun_requested instead,
+    and the worker queues a fresh run when the current one finishes.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+    chatbot = models.ForeignKey('Chatbot', on_delete=models.CASCADE, related_name='training_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    full_rebuild = models.BooleanField(default=False, help_text='Reprocess every source instead of only changed ones')
+    rerun_requested = models.BooleanField(default=False)
+    # Goal Planner: generate the 30-day plan once training succeeds
+    generate_goal_plan = models.BooleanField(default=False)
+    goal_text = models.TextField(blank=True, default='')
+    enable_goal_emails = models.BooleanField(default=False)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now, help_text='Not picked up before this time (retry backoff)')
+    worker = models.CharField(max_length=100, blank=True, default='')
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'training_job'
+        indexes = [models.Index(fields=['status', 'run_after'], name='training_job_queue_idx')]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['chatbot'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='one_active_training_job_per_chatbot',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.chatbot.chatbot_id} - {self.status} (attempt {self.attempts})"
+
+
 class QSPlan(models.Model):
     plan_id = models.CharField(max_length=5, primary_key=True, unique=True)
     plan_name = models.CharField(max_length=255)
@@ -430,6 +535,11 @@ class ChatbotURL(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     page_count = models.PositiveIntegerField(default=0, help_text='Number of pages discovered (for sitemaps)')
     error_message = models.TextField(blank=True, default='')
+    # Conditional re-crawl: validators from the last successful fetch
+    etag = models.CharField(max_length=255, blank=True, default='')
+    last_modified = models.CharField(max_length=64, blank=True, default='', help_text='Last-Modified header of the last fetch')
+    content_hash = models.CharField(max_length=64, blank=True, default='', help_text='SHA-256 of the extracted text (pages) or of the page list (sitemaps)')
+    sitemap_entries = models.JSONField(default=list, blank=True, help_text="Pages ({loc, lastmod}) the sitemap listed last time, reused when it hasn't changed")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
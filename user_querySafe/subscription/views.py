@@ -3,7 +3,7 @@ from django.conf import settings
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from user_querySafe.decorators import login_required
-from user_querySafe.models import Activity, Chatbot, ChatbotDocument, Message, User, QSPlan, QSOrder, QSCheckout, QSBillingDetails, QSPlanAllot, QSAddon, QSAddonPurchase
+from user_querySafe.models import Activity, Chatbot, ChatbotDocument, ChatbotUsage, Message, User, QSPlan, QSOrder, QSCheckout, QSBillingDetails, QSPlanAllot, QSAddon, QSAddonPurchase
 import random, string
 from django.utils import timezone
 from types import SimpleNamespace
@@ -50,7 +50,7 @@ def usage_view(request):
     if active_plan:  # Only calculate stats if there's an active plan
         for chatbot in chatbots:
             # Get messages and documents count for this chatbot
-            messages_count = Message.objects.filter(conversation__chatbot=chatbot, is_bot=True).count()
+            messages_count = ChatbotUsage.total_for(chatbot)
             documents_count = ChatbotDocument.objects.filter(chatbot=chatbot).count()
             
             # Calculate percentages
@@ -783,11 +783,24 @@
                 const messageDiv = document.createElement('div');
                 messageDiv.className = `mv-chatbot-message ${isUser ? 'mv-chatbot-user-msg' : 'mv-chatbot-bot-msg'}`;
 
-                // Format message with markdown (sanitized)
                 if (isUser) {
                     // User messages: always use textContent (no HTML)
                     messageDiv.textContent = message;
-                } else if (window.marked) {
+                } else {
+                    this.renderBotMessage(messageDiv, message);
+                }
+
+                messagesDiv.appendChild(messageDiv);
+                messagesDiv.scrollTo({
+                    top: messagesDiv.scrollHeight,
+                    behavior: 'smooth'
+                });
+                return messageDiv;
+            },
+
+            renderBotMessage: function(messageDiv, message) {
+                // Format message with markdown (sanitized)
+                if (window.marked) {
                     try {
                         marked.setOptions({
                             breaks: true,
@@ -805,12 +818,6 @@
                 } else {
                     messageDiv.textContent = message;
                 }
-
-                messagesDiv.appendChild(messageDiv);
-                messagesDiv.scrollTo({
-                    top: messagesDiv.scrollHeight,
-                    behavior: 'smooth'
-                });
             },
 
             showTypingIndicator: function() {
@@ -841,6 +848,55 @@
                 sendBtn.disabled = !enabled;
             },
 
+            readAnswerStream: function(response) {
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                const messagesDiv = document.getElementById('mv-chatbot-messages');
+                let buffer = '';
+                let answer = '';
+                let botDiv = null;
+
+                const handleFrame = (frame) => {
+                    let event = 'message';
+                    let data = '';
+                    frame.split('\n').forEach(line => {
+                        if (line.indexOf('event:') === 0) event = line.slice(6).trim();
+                        else if (line.indexOf('data:') === 0) data += line.slice(5).trim();
+                    });
+                    if (!data) return;
+                    const payload = JSON.parse(data);
+                    if (payload.conversation_id) this.conversationId = payload.conversation_id;
+                    if (event === 'token') {
+                        answer += payload.text;
+                        if (!botDiv) {
+                            this.removeTypingIndicator();
+                            botDiv = this.displayMessage(answer, false);
+                        } else {
+                            this.renderBotMessage(botDiv, answer);
+                            messagesDiv.scrollTop = messagesDiv.scrollHeight;
+                        }
+                    } else if (event === 'error') {
+                        throw new Error(payload.error);
+                    }
+                };
+
+                const pump = () => reader.read().then(({ done, value }) => {
+                    if (value) buffer += decoder.decode(value, { stream: true });
+                    let sep;
+                    while ((sep = buffer.indexOf('\n\n')) !== -1) {
+                        handleFrame(buffer.slice(0, sep));
+                        buffer = buffer.slice(sep + 2);
+                    }
+                    if (done) {
+                        this.removeTypingIndicator();
+                        if (!answer) throw new Error('Empty response');
+                        return;
+                    }
+                    return pump();
+                });
+                return pump();
+            },
+
             sendMessage: function(message) {
                 if (this.waiting) return;
                 this.waiting = true;
@@ -853,13 +909,14 @@
                 this.displayMessage(message, true);
                 this.showTypingIndicator();
 
-                fetch(`${this.config.baseUrl}/chat/`, {
+                // Stream tokens over SSE so the answer renders as Gemini produces it
+                fetch(`${this.config.baseUrl}/chat/stream/`, {
                     method: 'POST',
                     mode: 'cors',
                     credentials: 'omit',
                     headers: {
                         'Content-Type': 'application/json',
-                        'Accept': 'application/json'
+                        'Accept': 'text/event-stream'
                     },
                     body: JSON.stringify({
                         query: message,
@@ -869,14 +926,17 @@
                     })
                 })
                 .then(response => {
-                    if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-                    return response.json();
-                })
-                .then(data => {
-                    this.removeTypingIndicator();
-                    if (data.error) throw new Error(data.error);
-                    if (data.conversation_id) this.conversationId = data.conversation_id;
-                    if (data.answer) this.displayMessage(data.answer, false);
+                    const contentType = response.headers.get('content-type') || '';
+                    if (contentType.indexOf('text/event-stream') === -1) {
+                        // Rejected before streaming started (limits, validation) — plain JSON
+                        return response.json().then(data => {
+                            this.removeTypingIndicator();
+                            if (data.error) throw new Error(data.error);
+                            if (data.conversation_id) this.conversationId = data.conversation_id;
+                            if (data.answer) this.displayMessage(data.answer, false);
+                        });
+                    }
+                    return this.readAnswerStream(response);
                 })
                 .catch(error => {
                     this.removeTypingIndicator();
@@ -0,0 +1,78 @@
+import datetime
+from unittest import mock
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from user_querySafe.chatbot import answer_cache
+from user_querySafe.models import Chatbot
+
+# Stand-in query embeddings: cos(refund, refunds) ≈ 0.97, cos(refund, shipping) = 0
+VECTORS = {
+    "what is your refund policy?": [1.0, 0.0, 0.0],
+    "what's the refund policy?": [0.97, 0.24, 0.0],
+    "how long does shipping take?": [0.0, 0.0, 1.0],
+}
+
+
+def _encode_query(text):
+    return np.array([VECTORS[" ".join(text.split()).lower()]], dtype="float32")
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'answer-cache-tests'}},
+    ANSWER_CACHE_SIMILARITY=0.95, ANSWER_CACHE_MAX_ENTRIES=200, ANSWER_CACHE_TTL=60,
+)
+class AnswerCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(answer_cache, 'encode_query', side_effect=_encode_query)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.chatbot = Chatbot(
+            chatbot_id="ABC123", bot_instructions="Be brief.", enable_answer_cache=True,
+            last_trained_at=datetime.datetime(2026, 10, 1, tzinfo=datetime.timezone.utc),
+        )
+        answer_cache.store(self.chatbot, "What is your refund policy?", "30 days.", [{'content': "Refunds"}])
+
+    def test_same_question_is_answered_from_the_cache(self):
+        entry = answer_cache.lookup(self.chatbot, "  what is YOUR refund policy? ")
+        self.assertEqual(entry['answer'], "30 days.")
+        self.assertEqual(entry['matches'], [{'content': "Refunds"}])
+
+    def test_similar_question_above_the_threshold_matches(self):
+        self.assertEqual(answer_cache.lookup(self.chatbot, "What's the refund policy?")['answer'], "30 days.")
+        with override_settings(ANSWER_CACHE_SIMILARITY=0.99):
+            self.assertIsNone(answer_cache.lookup(self.chatbot, "What's the refund policy?"))
+
+    def test_unrelated_question_misses(self):
+        self.assertIsNone(answer_cache.lookup(self.chatbot, "How long does shipping take?"))
+
+    def test_retrain_starts_a_fresh_cache(self):
+        self.chatbot.last_trained_at += datetime.timedelta(hours=1)
+        self.assertIsNone(answer_cache.lookup(self.chatbot, "What is your refund policy?"))
+
+    def test_instruction_change_starts_a_fresh_cache(self):
+        self.chatbot.bot_instructions = "Be brief. Answer in French."
+        self.assertIsNone(answer_cache.lookup(self.chatbot, "What is your refund policy?"))
+
+    def test_cache_keeps_the_most_recent_entries(self):
+        with override_settings(ANSWER_CACHE_MAX_ENTRIES=1):
+            answer_cache.store(self.chatbot, "How long does shipping take?", "3 days.", [])
+        self.assertIsNone(answer_cache.lookup(self.chatbot, "What is your refund policy?"))
+        self.assertEqual(answer_cache.lookup(self.chatbot, "How long does shipping take?")['answer'], "3 days.")
+
+
+class AnswerCacheEligibilityTests(SimpleTestCase):
+    def _eligible(self, has_history=False, **chatbot_fields):
+        from user_querySafe.views import _answer_cache_eligible
+
+        chatbot = Chatbot(**{'enable_answer_cache': True, **chatbot_fields})
+        return _answer_cache_eligible({'chatbot': chatbot, 'has_history': has_history})
+
+    def test_only_opening_questions_without_web_search_are_shared(self):
+        self.assertTrue(self._eligible())
+        self.assertFalse(self._eligible(enable_answer_cache=False))
+        self.assertFalse(self._eligible(enable_web_search=True))
+        self.assertFalse(self._eligible(has_history=True))
@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from user_querySafe.chatbot.chunk_store import (
+    ChunkStore, chunk_store_path, chunks_path, legacy_json_path, open_chunks, write_chunk_store,
+)
+
+RECORDS = [
+    {'content': "Refunds are accepted within 30 days.", 'source': "policy.pdf"},
+    {'content': "Livraison gratuite dès 50 € — ñ, 日本語", 'source': "https://example.com/fr"},
+    {'content': "", 'source': "empty.txt"},
+]
+
+
+class ChunkStoreTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(META_DIR=tmp.name, INDEX_DIR=tmp.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.path = chunk_store_path("bot")
+
+    def test_records_round_trip(self):
+        write_chunk_store(self.path, RECORDS)
+        store = ChunkStore(self.path)
+        self.assertEqual(len(store), 3)
+        self.assertEqual(list(store), RECORDS)
+        self.assertEqual(store[1], RECORDS[1])
+        self.assertEqual(store[-1], RECORDS[2])
+        self.assertEqual(store[1:], RECORDS[1:])
+        with self.assertRaises(IndexError):
+            store[3]
+
+    def test_legacy_string_chunks_are_normalized(self):
+        write_chunk_store(self.path, ["plain text chunk", {'content': "no source"}])
+        self.assertEqual(list(ChunkStore(self.path)), [
+            {'content': "plain text chunk", 'source': ''},
+            {'content': "no source", 'source': ''},
+        ])
+
+    def test_empty_store(self):
+        write_chunk_store(self.path, [])
+        self.assertEqual(len(ChunkStore(self.path)), 0)
+        self.assertEqual(list(ChunkStore(self.path)), [])
+
+    def test_other_files_are_rejected(self):
+        with open(self.path, "wb") as f:
+            f.write(b"\x00" * 64)
+        with self.assertRaises(ValueError):
+            ChunkStore(self.path)
+
+    def test_rewrite_leaves_an_open_store_readable(self):
+        write_chunk_store(self.path, RECORDS)
+        old = ChunkStore(self.path)
+        write_chunk_store(self.path, [{'content': "retrained", 'source': "new.pdf"}])
+        self.assertEqual(old[0], RECORDS[0])
+        self.assertEqual(ChunkStore(self.path)[0]['content'], "retrained")
+        self.assertFalse(os.path.exists(f"{self.path}.tmp"))
+
+    def test_open_chunks_prefers_the_binary_store(self):
+        self.assertIsNone(open_chunks("bot"))
+        with open(legacy_json_path("bot"), "w", encoding="utf-8") as f:
+            json.dump(["legacy chunk"], f)
+        self.assertEqual(open_chunks("bot"), ["legacy chunk"])
+
+        write_chunk_store(self.path, RECORDS)
+        self.assertEqual(chunks_path("bot"), self.path)
+        self.assertIsInstance(open_chunks("bot"), ChunkStore)
+
+    def test_migrate_command_converts_legacy_json(self):
+        with open(legacy_json_path("bot"), "w", encoding="utf-8") as f:
+            json.dump(RECORDS, f)
+        call_command('migrate_chunk_store', '--delete-json', stdout=StringIO())
+        self.assertFalse(os.path.exists(legacy_json_path("bot")))
+        self.assertEqual(list(open_chunks("bot")), RECORDS)
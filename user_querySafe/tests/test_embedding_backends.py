@@ -0,0 +1,38 @@
+import importlib.util
+import unittest
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from user_querySafe.chatbot.embedding_model import MIN_COSINE_VS_TORCH, load_embedding_model
+from user_querySafe.management.commands.embedding_benchmark import SAMPLE_TEXTS
+
+
+def _encode(backend):
+    try:
+        model = load_embedding_model(backend)
+    except OSError as exc:
+        # Model files are neither cached nor downloadable (e.g. offline CI)
+        raise unittest.SkipTest(f"{backend} model unavailable: {exc}")
+    return model.encode(SAMPLE_TEXTS, show_progress_bar=False).astype("float32")
+
+
+@unittest.skipUnless(importlib.util.find_spec("onnxruntime"), "onnxruntime is not installed")
+class BackendParityTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reference = _encode('torch')
+
+    def _assert_parity(self, backend):
+        vectors = _encode(backend)
+        cos = np.sum(vectors * self.reference, axis=1) / (
+            np.linalg.norm(vectors, axis=1) * np.linalg.norm(self.reference, axis=1)
+        )
+        self.assertGreaterEqual(cos.min(), MIN_COSINE_VS_TORCH[backend])
+
+    def test_onnx_matches_torch(self):
+        self._assert_parity('onnx')
+
+    def test_onnx_int8_matches_torch(self):
+        self._assert_parity('onnx-int8')
@@ -0,0 +1,67 @@
+import itertools
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from user_querySafe.chatbot import embedding_store
+
+
+class EmbeddingStoreTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(
+            EMBEDDING_STORE_PATH=os.path.join(tmp.name, "store.sqlite3"),
+            EMBEDDING_STORE_MAX_ENTRIES=100,
+            EMBEDDING_BACKEND='torch',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_key_depends_on_backend(self):
+        torch_key = embedding_store.chunk_key("Refunds within 30 days.")
+        with override_settings(EMBEDDING_BACKEND='onnx-int8'):
+            int8_key = embedding_store.chunk_key("Refunds within 30 days.")
+        self.assertNotEqual(torch_key, int8_key)
+
+    def test_vectors_are_not_shared_across_backends(self):
+        vector = np.arange(4, dtype="float32")
+        embedding_store.put_many([(embedding_store.chunk_key("Refunds within 30 days."), vector)])
+
+        key = embedding_store.chunk_key("Refunds within 30 days.")
+        np.testing.assert_array_equal(embedding_store.get_many([key])[key], vector)
+        with override_settings(EMBEDDING_BACKEND='onnx-int8'):
+            self.assertEqual(embedding_store.get_many([embedding_store.chunk_key("Refunds within 30 days.")]), {})
+
+    def test_store_is_off_without_a_path(self):
+        vector = np.arange(4, dtype="float32")
+        key = embedding_store.chunk_key("Refunds within 30 days.")
+        with override_settings(EMBEDDING_STORE_PATH=''):
+            embedding_store.put_many([(key, vector)])
+            self.assertEqual(embedding_store.get_many([key]), {})
+
+    def test_least_recently_used_rows_are_trimmed_periodically(self):
+        keys = [embedding_store.chunk_key(f"chunk {n}") for n in range(32)]
+        vector = np.zeros(4, dtype="float32")
+        clock = mock.Mock(time=mock.Mock(side_effect=itertools.count(1000)))
+
+        def stored():
+            # Read directly: get_many would mark the rows as used
+            return {row[0] for row in embedding_store._connection().execute("SELECT key FROM embeddings")}
+
+        with mock.patch.object(embedding_store, 'time', clock), \
+                mock.patch.object(embedding_store, '_TRIM_EVERY', 10), \
+                override_settings(EMBEDDING_STORE_MAX_ENTRIES=20):
+            # Sizes are checked on the 1st, 11th and 21st write
+            for key in keys[:20]:
+                embedding_store.put_many([(key, vector)])
+            embedding_store.get_many([keys[0]])  # used again, so no longer the oldest
+            for key in keys[20:30]:
+                embedding_store.put_many([(key, vector)])
+            self.assertEqual(stored(), set(keys[:30]) - {keys[1]})  # may run over until the next check
+
+            embedding_store.put_many([(key, vector) for key in keys[30:]])
+            self.assertEqual(stored(), {keys[0]} | set(keys[13:]))
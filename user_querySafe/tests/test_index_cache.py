@@ -0,0 +1,120 @@
+import os
+import tempfile
+from unittest import mock
+
+import faiss
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from user_querySafe.chatbot import index_cache
+from user_querySafe.chatbot.chunk_store import chunk_store_path, write_chunk_store
+from user_querySafe.chatbot.index_factory import HNSW, build_index, write_index_info
+
+DIM = 8
+
+
+def _train(chatbot_id, n, index_type=None, seed=0):
+    """Write an index and chunk store for `chatbot_id` as the pipeline would."""
+    vectors = np.random.default_rng(seed).random((n, DIM), dtype="float32")
+    index, info = build_index(vectors, index_type)
+    index_path, _ = index_cache.index_paths(chatbot_id)
+    faiss.write_index(index, index_path)
+    write_index_info(chatbot_id, info)
+    write_chunk_store(chunk_store_path(chatbot_id), [
+        {'content': f"chunk {i}", 'source': "faq.pdf"} for i in range(n)
+    ])
+    return vectors
+
+
+class IndexCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(
+            INDEX_DIR=tmp.name, META_DIR=tmp.name,
+            INDEX_CACHE_MAX_ENTRIES=32, INDEX_CACHE_MAX_BYTES=1024 * 1024,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for chatbot_id in ("bot-a", "bot-b"):
+            self.addCleanup(index_cache.invalidate, chatbot_id)
+
+    def test_untrained_bot_returns_nothing(self):
+        self.assertEqual(index_cache.get_index_and_chunks("bot-a"), (None, None))
+
+    def test_unchanged_files_are_served_from_memory(self):
+        _train("bot-a", 20)
+        index, chunks = index_cache.get_index_and_chunks("bot-a")
+        with mock.patch.object(index_cache.faiss, 'read_index') as read_index:
+            again, again_chunks = index_cache.get_index_and_chunks("bot-a")
+        read_index.assert_not_called()
+        self.assertIs(again, index)
+        self.assertIs(again_chunks, chunks)
+
+    def test_retrain_is_picked_up(self):
+        _train("bot-a", 20)
+        index, _ = index_cache.get_index_and_chunks("bot-a")
+        self.assertEqual(index.ntotal, 20)
+
+        index_path, meta_path = index_cache.index_paths("bot-a")
+        stamps = {path: os.stat(path).st_mtime_ns for path in (index_path, meta_path)}
+        _train("bot-a", 30, seed=1)
+        # Restore the old mtimes so only the sizes differ
+        for path, stamp in stamps.items():
+            os.utime(path, ns=(stamp, stamp))
+
+        index, chunks = index_cache.get_index_and_chunks("bot-a")
+        self.assertEqual(index.ntotal, 30)
+        self.assertEqual(len(chunks), 30)
+
+    def test_touched_files_are_reloaded(self):
+        _train("bot-a", 20)
+        index, _ = index_cache.get_index_and_chunks("bot-a")
+        index_path, _ = index_cache.index_paths("bot-a")
+        stamp = os.stat(index_path).st_mtime_ns + 10 ** 9
+        os.utime(index_path, ns=(stamp, stamp))
+        self.assertIsNot(index_cache.get_index_and_chunks("bot-a")[0], index)
+
+    def test_cache_stays_within_its_byte_budget(self):
+        _train("bot-a", 20)
+        _train("bot-b", 20)
+        index_path, _ = index_cache.index_paths("bot-a")
+        one_bot = os.path.getsize(index_path)
+
+        with override_settings(INDEX_CACHE_MAX_BYTES=one_bot + one_bot // 2):
+            index_cache.get_index_and_chunks("bot-a")
+            index_cache.get_index_and_chunks("bot-b")
+            stats = index_cache.cache_stats()
+        self.assertEqual(stats['entries'], 1)
+        self.assertLessEqual(stats['bytes'], stats['max_bytes'])
+
+        # bot-a was evicted, so it is read again
+        with mock.patch.object(index_cache.faiss, 'read_index', wraps=faiss.read_index) as read_index:
+            index_cache.get_index_and_chunks("bot-b")
+            read_index.assert_not_called()
+            index_cache.get_index_and_chunks("bot-a")
+            read_index.assert_called_once()
+
+    def test_index_larger_than_the_budget_is_served_but_not_cached(self):
+        _train("bot-a", 20)
+        with override_settings(INDEX_CACHE_MAX_BYTES=16):
+            index, chunks = index_cache.get_index_and_chunks("bot-a")
+            self.assertEqual(index.ntotal, 20)
+            self.assertEqual(index_cache.cache_stats()['entries'], 0)
+
+
+class RetrieveMatchesTests(SimpleTestCase):
+    def test_padded_results_are_skipped(self):
+        from user_querySafe import views
+
+        vectors = np.random.default_rng(0).random((3, DIM), dtype="float32") * 0.1
+        index, _ = build_index(vectors, HNSW)
+        chunks = [{'content': f"chunk {i}", 'source': "faq.pdf"} for i in range(3)]
+
+        with mock.patch.object(views, 'get_index_and_chunks', return_value=(index, chunks)), \
+                mock.patch.object(views, 'encode_query', return_value=vectors[:1]):
+            matches = views._retrieve_matches("bot-a", "refund policy", k=8)
+
+        # k exceeds ntotal, so faiss pads the result with -1 ids
+        self.assertEqual(len(matches), 3)
+        self.assertEqual(matches[0]['content'], "chunk 0")
@@ -0,0 +1,130 @@
+import os
+import tempfile
+from unittest import mock
+
+import faiss
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from user_querySafe.chatbot import index_factory
+from user_querySafe.chatbot.index_factory import (
+    FLAT, HNSW, IVFPQ, apply_search_params, build_index, choose_index_type, read_index_info, write_index_info,
+)
+
+
+def _clustered(n, dim, seed=0):
+    """Vectors around a few hundred centres, like chunks of related documents."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(256, dim)).astype("float32")
+    return centres[rng.integers(0, len(centres), n)] + 0.1 * rng.normal(size=(n, dim)).astype("float32")
+
+
+def _cluster_of(vectors, seed=0):
+    """Index of the centre each vector from _clustered() was drawn around."""
+    centres = np.random.default_rng(seed).normal(size=(256, vectors.shape[1])).astype("float32")
+    _, nearest = faiss.knn(np.ascontiguousarray(vectors), centres, 1)
+    return nearest[:, 0]
+
+
+@override_settings(
+    FAISS_FLAT_MAX_VECTORS=5000, FAISS_INDEX_MEMORY_MB=64, FAISS_HNSW_M=32,
+    FAISS_HNSW_EF_CONSTRUCTION=80, FAISS_HNSW_EF_SEARCH=64, FAISS_IVF_NPROBE=16,
+)
+class ChooseIndexTypeTests(SimpleTestCase):
+    def test_small_corpora_stay_exact(self):
+        self.assertEqual(choose_index_type(5000, 384), FLAT)
+
+    def test_hnsw_while_it_fits_the_memory_budget(self):
+        self.assertEqual(choose_index_type(20000, 384), HNSW)
+
+    def test_ivfpq_beyond_the_memory_budget(self):
+        self.assertEqual(choose_index_type(200000, 384), IVFPQ)
+        self.assertLess(index_factory.estimate_bytes(IVFPQ, 200000, 384), 64 * 1024 * 1024)
+
+    def test_too_few_vectors_to_train_ivfpq_fall_back_to_hnsw(self):
+        self.assertEqual(choose_index_type(9000, 384, memory_budget=1024), HNSW)
+
+
+@override_settings(
+    FAISS_FLAT_MAX_VECTORS=5000, FAISS_INDEX_MEMORY_MB=64, FAISS_HNSW_M=16,
+    FAISS_HNSW_EF_CONSTRUCTION=40, FAISS_HNSW_EF_SEARCH=64, FAISS_IVF_NPROBE=16,
+)
+class BuildIndexTests(SimpleTestCase):
+    def _recall(self, index, vectors, queries, k=5):
+        exact = faiss.IndexFlatL2(vectors.shape[1])
+        exact.add(vectors)
+        _, expected = exact.search(queries, k)
+        _, found = index.search(queries, k)
+        return np.mean([len(set(e) & set(f)) / k for e, f in zip(expected, found)])
+
+    def test_hnsw_finds_the_exact_neighbours(self):
+        vectors = _clustered(6000, 32)
+        index, info = build_index(vectors)
+        self.assertEqual(info['type'], HNSW)
+        self.assertEqual(index.ntotal, 6000)
+        self.assertEqual(faiss.downcast_index(index).hnsw.efSearch, 64)
+        self.assertGreaterEqual(self._recall(index, vectors, vectors[:200]), 0.9)
+
+    def test_ivfpq_is_trained_and_searchable(self):
+        vectors = _clustered(12000, 32)
+        index, info = build_index(vectors, IVFPQ)
+        self.assertTrue(index.is_trained)
+        self.assertEqual(index.ntotal, 12000)
+        self.assertEqual(faiss.extract_index_ivf(index).nprobe, 16)
+        self.assertEqual(info['nlist'], faiss.extract_index_ivf(index).nlist)
+        # Compressed codes blur neighbours within a cluster, but not across clusters
+        _, found = index.search(vectors[:200], 5)
+        clusters = _cluster_of(vectors)
+        self.assertGreaterEqual(np.mean(clusters[found] == clusters[:200, None]), 0.95)
+
+    def test_memory_mapped_vectors_are_added_in_slices(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "vectors.npy")
+            np.save(path, _clustered(100, 8))
+            vectors = np.load(path, mmap_mode="r")
+            added = []
+            real_add = faiss.IndexFlatL2.add
+
+            def add(index, rows):
+                added.append(len(rows))
+                real_add(index, rows)
+
+            with mock.patch.object(index_factory, '_ADD_BATCH', 32), \
+                    mock.patch.object(faiss.IndexFlatL2, 'add', add):
+                index, info = build_index(vectors)
+            self.assertEqual(info['type'], FLAT)
+            self.assertEqual(added, [32, 32, 32, 4])
+            np.testing.assert_array_equal(index.reconstruct_n(0, 100), vectors)
+
+
+@override_settings(FAISS_HNSW_EF_SEARCH=64, FAISS_IVF_NPROBE=16)
+class IndexInfoTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.index_dir = tmp.name
+        settings_override = override_settings(INDEX_DIR=tmp.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_search_params_survive_a_reload(self):
+        index, info = build_index(_clustered(12000, 32), IVFPQ)
+        faiss.extract_index_ivf(index).nprobe = 48
+        info['nprobe'] = 48
+        path = os.path.join(self.index_dir, "bot-index.index")
+        faiss.write_index(index, path)
+        write_index_info("bot", info)
+
+        reloaded = faiss.read_index(path)
+        apply_search_params(reloaded, read_index_info("bot"))
+        self.assertEqual(faiss.extract_index_ivf(reloaded).nprobe, 48)
+
+    def test_bots_trained_before_the_factory_are_flat(self):
+        self.assertEqual(read_index_info("legacy"), {'type': FLAT})
+
+    def test_unreadable_info_is_treated_as_flat(self):
+        with open(index_factory.index_info_path("broken"), "w") as f:
+            f.write("{not json")
+        with self.assertLogs(index_factory.logger, 'WARNING'):
+            self.assertEqual(read_index_info("broken"), {'type': FLAT})
+
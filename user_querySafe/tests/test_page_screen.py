@@ -0,0 +1,54 @@
+import os
+import tempfile
+
+import fitz
+from django.test import SimpleTestCase
+
+from user_querySafe.chatbot.page_screen import DuplicatePages, render_page, screen_page
+
+
+def _invoice_page(doc, number, total):
+    """A page from a shared invoice template; only the small print differs."""
+    page = doc.new_page(width=595, height=842)
+    page.draw_rect(fitz.Rect(40, 40, 555, 120), fill=(0.2, 0.2, 0.2))
+    for y in range(200, 700, 40):
+        page.draw_line(fitz.Point(40, y), fitz.Point(555, y))
+    page.insert_text(fitz.Point(60, 180), f"Invoice no. {number}", fontsize=9)
+    page.insert_text(fitz.Point(420, 730), f"Total due: {total}", fontsize=9)
+    return page
+
+
+class DuplicatePageTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.doc = fitz.open()
+        self.addCleanup(self.doc.close)
+
+    def _fingerprint(self, page, name):
+        _, coarse_hash = screen_page(page)
+        return coarse_hash, render_page(page, os.path.join(self.tmp.name, f"{name}.png"))
+
+    def test_templated_pages_with_different_text_are_not_duplicates(self):
+        first = self._fingerprint(_invoice_page(self.doc, 1001, "250.00"), "a")
+        second = self._fingerprint(_invoice_page(self.doc, 1002, "975.00"), "b")
+        self.assertEqual(first[0], second[0])  # the layout alone decides the coarse hash
+        self.assertNotEqual(first[1], second[1])
+
+        seen = DuplicatePages()
+        seen.add(first, "invoice_page1")
+        self.assertIsNone(seen.match(second))
+
+    def test_identical_pages_are_duplicates(self):
+        first = self._fingerprint(_invoice_page(self.doc, 1001, "250.00"), "a")
+        repeat = self._fingerprint(_invoice_page(self.doc, 1001, "250.00"), "b")
+
+        seen = DuplicatePages()
+        seen.add(first, "invoice_page1")
+        self.assertEqual(seen.match(repeat), "invoice_page1")
+
+    def test_matching_coarse_hash_alone_is_not_a_duplicate(self):
+        seen = DuplicatePages()
+        seen.add(("c084c774c0244000", "digest-a"), "invoice_page1")
+        self.assertIsNone(seen.match(("c084c774c0244000", "digest-b")))
+        self.assertEqual(seen.match(("c084c774c0244000", "digest-a")), "invoice_page1")
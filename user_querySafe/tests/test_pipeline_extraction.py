@@ -0,0 +1,98 @@
+import contextlib
+import io
+import os
+import tempfile
+from unittest import mock
+
+import fitz
+from django.test import TestCase, override_settings
+
+from user_querySafe.chatbot import embedding_model, pipeline_processor
+from user_querySafe.chatbot.chunk_store import open_chunks
+from user_querySafe.models import Chatbot, User
+from user_querySafe.tests.test_training_manifest import FakeModel
+
+PAGES = 60
+PAGES_PER_TASK = 5
+
+
+def _scanned_pdf(path, pages=PAGES):
+    """A PDF of image-only pages, each with a different shape so none are duplicates."""
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page(width=200, height=200)
+        page.draw_rect(fitz.Rect(10 + n * 2, 10, 60 + n * 2, 60 + n), fill=(0, 0, 0))
+        page.draw_circle(fitz.Point(150, 40 + n * 2), 15, fill=(0.3, 0.3, 0.3))
+    doc.save(path)
+    doc.close()
+
+
+@override_settings(
+    EXTRACTION_WORKERS=1, EXTRACTION_PDF_PAGES_PER_TASK=PAGES_PER_TASK, EXTRACTION_SPOOL_DIR='',
+    VISION_BLANK_INK_RATIO=0.002, VISION_DEDUPE_PAGES=True, EMBEDDING_STORE_PATH='', EMBEDDING_BACKEND='torch',
+)
+class ExtractionSpoolTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        dirs = {name: os.path.join(tmp.name, name) for name in ("uploads", "text", "chunks", "index", "meta")}
+        for path in dirs.values():
+            os.makedirs(path)
+        self.uploads = dirs["uploads"]
+        settings_override = override_settings(INDEX_DIR=dirs["index"], META_DIR=dirs["meta"])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for patcher in (
+            mock.patch.multiple(
+                pipeline_processor, PDF_DIR=dirs["uploads"], TEXT_DIR=dirs["text"],
+                CHUNK_DIR=dirs["chunks"], INDEX_DIR=dirs["index"],
+            ),
+            mock.patch.object(embedding_model, 'get_embedding_model', return_value=FakeModel()),
+            mock.patch.object(pipeline_processor, '_caption_images_concurrent', side_effect=self._caption),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        user = User.objects.create(name="Owner", email="owner@example.com")
+        self.chatbot_id = Chatbot.objects.create(user=user, name="Support").chatbot_id
+        self.peak_spooled = 0
+
+    def _caption(self, image_items, spool_dir=None, **kwargs):
+        """Vision stand-in: reads each page as it arrives, like the real dispatcher."""
+        captions = {}
+        for label, path, mime in image_items:
+            self.peak_spooled = max(self.peak_spooled, len(os.listdir(spool_dir)))
+            os.remove(path)
+            captions[label] = f"--- {label} ---\nScanned text of {label}"
+        return captions, set(), len(captions), 0
+
+    def _train(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            pipeline_processor.process_pipeline(self.chatbot_id)
+
+    def test_spool_stays_bounded_for_a_long_scanned_pdf(self):
+        _scanned_pdf(os.path.join(self.uploads, f"{self.chatbot_id}_archive.pdf"))
+        self._train()
+
+        self.assertLessEqual(self.peak_spooled, PAGES_PER_TASK)
+        contents = "\n".join(c['content'] for c in open_chunks(self.chatbot_id))
+        for n in range(1, PAGES + 1):
+            self.assertIn(f"archive_page{n} ---", contents)
+
+    def test_failed_range_leaves_the_whole_file_out(self):
+        _scanned_pdf(os.path.join(self.uploads, f"{self.chatbot_id}_archive.pdf"))
+        with open(os.path.join(self.uploads, f"{self.chatbot_id}_faq.txt"), "w", encoding="utf-8") as f:
+            f.write("Refunds are accepted within 30 days of purchase.")
+        real_extract = pipeline_processor._extract_file
+
+        def extract(file_path, page_range=None, spool_dir=None):
+            if page_range == (2 * PAGES_PER_TASK, 3 * PAGES_PER_TASK):
+                raise ValueError("damaged page tree")
+            return real_extract(file_path, page_range, spool_dir)
+
+        with mock.patch.object(pipeline_processor, '_extract_file', side_effect=extract), \
+                self.assertLogs(pipeline_processor.logger, 'ERROR'):
+            self._train()
+
+        self.assertEqual({c['source'] for c in open_chunks(self.chatbot_id)}, {"faq.txt"})
+        self.assertLessEqual(self.peak_spooled, PAGES_PER_TASK)
@@ -0,0 +1,136 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from user_querySafe.chatbot import training_jobs
+from user_querySafe.models import Chatbot, TrainingJob, User
+
+
+class StopAfter:
+    """Stand-in for the heartbeat's stop Event that lets `n` intervals pass."""
+
+    def __init__(self, n):
+        self.remaining = n
+
+    def wait(self, timeout):
+        self.remaining -= 1
+        return self.remaining < 0
+
+
+@override_settings(
+    TRAINING_EMBEDDED_WORKER=False, TRAINING_MAX_RUNNING=0, TRAINING_JOB_MAX_ATTEMPTS=3,
+    TRAINING_HEARTBEAT_SECONDS=30, TRAINING_JOB_STALE_SECONDS=600,
+)
+class TrainingJobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Owner", email="owner@example.com")
+        self.chatbot = Chatbot.objects.create(user=self.user, name="Support")
+
+    def _train(self, status='trained', error=None):
+        """Patch the pipeline to leave the chatbot in `status`, or raise `error`."""
+        def pipeline(chatbot_id, full=False):
+            if error is not None:
+                raise error
+            Chatbot.objects.filter(chatbot_id=chatbot_id).update(status=status)
+
+        return mock.patch('user_querySafe.chatbot.pipeline_processor.process_pipeline', side_effect=pipeline)
+
+    def test_only_one_active_job_per_chatbot(self):
+        TrainingJob.objects.create(chatbot=self.chatbot)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TrainingJob.objects.create(chatbot=self.chatbot, status=TrainingJob.STATUS_RUNNING)
+        TrainingJob.objects.create(chatbot=self.chatbot, status=TrainingJob.STATUS_SUCCEEDED)
+
+    def test_enqueue_reuses_the_queued_job(self):
+        job = training_jobs.enqueue_training(self.chatbot)
+        again = training_jobs.enqueue_training(self.chatbot, full_rebuild=True)
+        self.assertEqual(again.pk, job.pk)
+        self.assertTrue(TrainingJob.objects.get(pk=job.pk).full_rebuild)
+        self.assertEqual(TrainingJob.objects.count(), 1)
+
+    def test_claim_takes_the_oldest_runnable_job_once(self):
+        other = Chatbot.objects.create(user=self.user, name="Sales")
+        later = Chatbot.objects.create(user=self.user, name="Later")
+        first = training_jobs.enqueue_training(self.chatbot)
+        training_jobs.enqueue_training(other)
+        TrainingJob.objects.create(chatbot=later, run_after=timezone.now() + timedelta(minutes=5))
+
+        claimed = training_jobs.claim_next_job()
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertEqual((claimed.status, claimed.attempts), (TrainingJob.STATUS_RUNNING, 1))
+        self.assertEqual(training_jobs.claim_next_job().chatbot, other)
+        self.assertIsNone(training_jobs.claim_next_job())  # `later` is still backing off
+
+    def test_claim_respects_the_running_limit(self):
+        training_jobs.enqueue_training(self.chatbot)
+        training_jobs.enqueue_training(Chatbot.objects.create(user=self.user, name="Sales"))
+        with override_settings(TRAINING_MAX_RUNNING=1):
+            self.assertIsNotNone(training_jobs.claim_next_job())
+            self.assertIsNone(training_jobs.claim_next_job())
+
+    def test_heartbeat_keeps_a_running_job_fresh(self):
+        training_jobs.enqueue_training(self.chatbot)
+        job = training_jobs.claim_next_job()
+        TrainingJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        training_jobs._heartbeat(job.pk, StopAfter(1))
+        training_jobs.requeue_stale_jobs()
+        self.assertEqual(TrainingJob.objects.get(pk=job.pk).status, TrainingJob.STATUS_RUNNING)
+
+    def test_job_without_heartbeat_is_requeued(self):
+        training_jobs.enqueue_training(self.chatbot)
+        job = training_jobs.claim_next_job()
+        TrainingJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        with self.assertLogs(training_jobs.logger, 'WARNING'):
+            training_jobs.requeue_stale_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, TrainingJob.STATUS_QUEUED)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn("stopped responding", job.error)
+
+    def test_failed_run_is_retried_with_backoff_then_fails(self):
+        job = training_jobs.enqueue_training(self.chatbot)
+        with self._train(error=RuntimeError("bucket unavailable")), \
+                self.assertLogs(training_jobs.logger, 'ERROR'):
+            for attempt in range(1, 4):
+                TrainingJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+                training_jobs.run_job(training_jobs.claim_next_job())
+                job.refresh_from_db()
+                if attempt < 3:
+                    self.assertEqual(job.status, TrainingJob.STATUS_QUEUED)
+                    delay = (job.run_after - timezone.now()).total_seconds()
+                    self.assertAlmostEqual(delay, training_jobs.RETRY_BASE_SECONDS * 2 ** (attempt - 1), delta=5)
+
+        self.assertEqual((job.status, job.attempts), (TrainingJob.STATUS_FAILED, 3))
+        self.assertEqual(job.error, "bucket unavailable")
+        self.assertEqual(Chatbot.objects.get(pk=self.chatbot.pk).status, 'failed')
+
+    def test_successful_run(self):
+        job = training_jobs.enqueue_training(self.chatbot)
+        with self._train():
+            training_jobs.run_job(training_jobs.claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, TrainingJob.STATUS_SUCCEEDED)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_run_without_usable_sources_is_not_retried(self):
+        job = training_jobs.enqueue_training(self.chatbot)
+        with self._train(status='error'):
+            training_jobs.run_job(training_jobs.claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (TrainingJob.STATUS_FAILED, 1))
+
+    def test_enqueue_while_running_queues_a_rerun(self):
+        job = training_jobs.enqueue_training(self.chatbot)
+        claimed = training_jobs.claim_next_job()
+        self.assertEqual(training_jobs.enqueue_training(self.chatbot).pk, job.pk)
+
+        with self._train():
+            training_jobs.run_job(claimed)
+        self.assertEqual(TrainingJob.objects.get(pk=job.pk).status, TrainingJob.STATUS_SUCCEEDED)
+        rerun = TrainingJob.objects.get(chatbot=self.chatbot, status=TrainingJob.STATUS_QUEUED)
+        self.assertNotEqual(rerun.pk, job.pk)
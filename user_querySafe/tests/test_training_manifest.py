@@ -0,0 +1,118 @@
+import contextlib
+import hashlib
+import io
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase, override_settings
+
+from user_querySafe.chatbot import embedding_model, pipeline_processor, training_manifest
+from user_querySafe.chatbot.chunk_store import chunk_store_path, open_chunks, write_chunk_store
+from user_querySafe.models import Chatbot, User
+
+DIM = 8
+
+
+class FakeModel:
+    """Deterministic stand-in for the SentenceTransformer; records what it encodes."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def get_sentence_embedding_dimension(self):
+        return DIM
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return np.array([
+            np.frombuffer(hashlib.sha256(t.encode("utf-8")).digest()[:DIM * 4], dtype="uint32") / 2 ** 32
+            for t in texts
+        ], dtype="float32")
+
+
+class TrainingManifestTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dirs = {name: os.path.join(tmp.name, name) for name in ("uploads", "text", "chunks", "index", "meta")}
+        for path in self.dirs.values():
+            os.makedirs(path)
+        settings_override = override_settings(
+            INDEX_DIR=self.dirs["index"], META_DIR=self.dirs["meta"], EXTRACTION_WORKERS=1,
+            EXTRACTION_SPOOL_DIR='', EMBEDDING_STORE_PATH='', EMBEDDING_BACKEND='torch',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for patcher in (
+            mock.patch.multiple(
+                pipeline_processor, PDF_DIR=self.dirs["uploads"], TEXT_DIR=self.dirs["text"],
+                CHUNK_DIR=self.dirs["chunks"], INDEX_DIR=self.dirs["index"],
+            ),
+            mock.patch.object(embedding_model, 'get_embedding_model', return_value=FakeModel()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.model = embedding_model.get_embedding_model()
+
+        user = User.objects.create(name="Owner", email="owner@example.com")
+        self.chatbot_id = Chatbot.objects.create(user=user, name="Support").chatbot_id
+
+    def _upload(self, name, text):
+        with open(os.path.join(self.dirs["uploads"], f"{self.chatbot_id}_{name}"), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def _train(self, full=False):
+        self.model.encoded.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            pipeline_processor.process_pipeline(self.chatbot_id, full=full)
+        return list(self.model.encoded)
+
+    def _sources(self):
+        return [c['source'] for c in open_chunks(self.chatbot_id)]
+
+    def _vectors_by_source(self):
+        vectors = np.load(training_manifest.vectors_path(self.chatbot_id))
+        return dict(zip(self._sources(), vectors))
+
+    def test_unchanged_sources_are_reused(self):
+        self._upload("faq.txt", "Refunds are accepted within 30 days of purchase.")
+        self._upload("shipping.txt", "Orders ship within two business days.")
+        self.assertEqual(len(self._train()), 2)
+        faq_vector = self._vectors_by_source()["faq.txt"]
+
+        self._upload("shipping.txt", "Orders ship the same day when placed before noon.")
+        self.assertEqual(self._train(), ["Orders ship the same day when placed before noon."])
+
+        self.assertEqual(sorted(self._sources()), ["faq.txt", "shipping.txt"])
+        np.testing.assert_array_equal(self._vectors_by_source()["faq.txt"], faq_vector)
+        self.assertEqual(Chatbot.objects.get(chatbot_id=self.chatbot_id).status, "trained")
+
+    def test_removed_sources_drop_out(self):
+        self._upload("faq.txt", "Refunds are accepted within 30 days of purchase.")
+        self._upload("shipping.txt", "Orders ship within two business days.")
+        self._train()
+
+        os.remove(os.path.join(self.dirs["uploads"], f"{self.chatbot_id}_faq.txt"))
+        self.assertEqual(self._train(), [])
+        self.assertEqual(self._sources(), ["shipping.txt"])
+
+    def test_full_retrain_embeds_everything(self):
+        self._upload("faq.txt", "Refunds are accepted within 30 days of purchase.")
+        self._train()
+        self.assertEqual(len(self._train(full=True)), 1)
+
+    def test_manifest_for_another_backend_is_ignored(self):
+        self._upload("faq.txt", "Refunds are accepted within 30 days of purchase.")
+        self._train()
+        self.assertIn(f"file:{self.chatbot_id}_faq.txt", training_manifest.load_previous(self.chatbot_id))
+        with override_settings(EMBEDDING_BACKEND='onnx-int8'):
+            self.assertEqual(training_manifest.load_previous(self.chatbot_id), {})
+
+    def test_manifest_out_of_sync_with_the_chunks_is_ignored(self):
+        self._upload("faq.txt", "Refunds are accepted within 30 days of purchase.")
+        self._train()
+        write_chunk_store(chunk_store_path(self.chatbot_id), [])
+        with self.assertLogs(training_manifest.logger, 'WARNING'):
+            self.assertEqual(training_manifest.load_previous(self.chatbot_id), {})
@@ -0,0 +1,138 @@
+from unittest import mock
+
+import httpx
+from django.test import SimpleTestCase
+
+from user_querySafe.chatbot import url_scraper
+
+SITEMAP_INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://example.com/sitemap-a.xml</loc></sitemap>
+  <sitemap><loc>https://example.com/sitemap-b.xml</loc></sitemap>
+</sitemapindex>"""
+
+
+def _urlset(*locs):
+    urls = "".join(f"<url><loc>{loc}</loc></url>" for loc in locs)
+    return f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'.encode()
+
+
+def _serve(routes):
+    """Patch httpx.Client in url_scraper to answer from {url: handler(request) -> Response}."""
+    transport = httpx.MockTransport(lambda request: routes[str(request.url)](request))
+    real_client = httpx.Client
+    return mock.patch.object(
+        url_scraper.httpx, 'Client', lambda **kwargs: real_client(transport=transport, **kwargs),
+    )
+
+
+class FetchSitemapTests(SimpleTestCase):
+    def test_plain_sitemap_is_fetched_conditionally(self):
+        def sitemap(request):
+            if request.headers.get('if-none-match') == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, content=_urlset("https://example.com/a"), headers={'ETag': '"v1"'})
+
+        with _serve({"https://example.com/sitemap.xml": sitemap}):
+            entries, validators, error = url_scraper.fetch_sitemap("https://example.com/sitemap.xml")
+            self.assertIsNone(error)
+            self.assertEqual([e['loc'] for e in entries], ["https://example.com/a"])
+            self.assertEqual(validators['etag'], '"v1"')
+
+            entries, _, error = url_scraper.fetch_sitemap("https://example.com/sitemap.xml", etag='"v1"')
+            self.assertIsNone(error)
+            self.assertIsNone(entries)
+
+    def test_sitemap_index_children_are_always_read(self):
+        child_b = [_urlset("https://example.com/b1")]
+        routes = {
+            "https://example.com/sitemap.xml": lambda request: httpx.Response(
+                304 if request.headers.get('if-none-match') else 200,
+                content=SITEMAP_INDEX, headers={'ETag': '"index"'},
+            ),
+            "https://example.com/sitemap-a.xml": lambda request: httpx.Response(200, content=_urlset("https://example.com/a1")),
+            "https://example.com/sitemap-b.xml": lambda request: httpx.Response(200, content=child_b[0]),
+        }
+        with _serve(routes):
+            entries, validators, _ = url_scraper.fetch_sitemap("https://example.com/sitemap.xml")
+            self.assertEqual(sorted(e['loc'] for e in entries), ["https://example.com/a1", "https://example.com/b1"])
+            # The index stays the same while a child sitemap gains a page
+            self.assertEqual(validators, {})
+            child_b[0] = _urlset("https://example.com/b1", "https://example.com/b2")
+
+            entries, _, _ = url_scraper.fetch_sitemap("https://example.com/sitemap.xml", **validators)
+            self.assertIn("https://example.com/b2", [e['loc'] for e in entries])
+
+
+class IterSitemapTests(SimpleTestCase):
+    def _entries(self, xml):
+        return [(kind, entry['loc']) for kind, entry in url_scraper._iter_sitemap([xml])]
+
+    def test_image_and_video_locs_are_not_pages(self):
+        xml = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1"
+        xmlns:video="http://www.google.com/schemas/sitemap-video/1.1">
+  <url>
+    <loc>https://example.com/gallery</loc>
+    <image:image><image:loc>https://example.com/photo1.jpg</image:loc></image:image>
+    <image:image><image:loc>https://example.com/photo2.jpg</image:loc></image:image>
+  </url>
+  <url>
+    <loc>https://example.com/tour</loc>
+    <video:video>
+      <video:thumbnail_loc>https://example.com/thumb.jpg</video:thumbnail_loc>
+      <video:content_loc>https://example.com/tour.mp4</video:content_loc>
+      <video:player_loc>https://example.com/player</video:player_loc>
+    </video:video>
+  </url>
+</urlset>"""
+        self.assertEqual(self._entries(xml), [
+            ('url', "https://example.com/gallery"),
+            ('url', "https://example.com/tour"),
+        ])
+
+    def test_bare_locs_under_the_root_are_pages(self):
+        xml = b"<urlset><loc>https://example.com/a</loc><loc>https://example.com/b</loc></urlset>"
+        self.assertEqual(self._entries(xml), [('url', "https://example.com/a"), ('url', "https://example.com/b")])
+
+
+class ExtractTextTests(SimpleTestCase):
+    ARTICLE = "Café crème and naïve résumés: our menu changes with the seasons — ask staff about allergens."
+
+    def _text(self, content, content_type='text/html'):
+        response = httpx.Response(200, content=content, headers={'Content-Type': content_type})
+        text, error = url_scraper._extract_text(response)
+        self.assertIsNone(error)
+        return text
+
+    def test_utf8_page_without_a_charset(self):
+        page = f"<html><body><p>{self.ARTICLE}</p></body></html>".encode("utf-8")
+        self.assertEqual(self._text(page), self.ARTICLE)
+
+    def test_charset_declared_in_the_page(self):
+        page = (
+            '<html><head><meta http-equiv="Content-Type" content="text/html; charset=windows-1252"></head>'
+            f"<body><p>{self.ARTICLE}</p></body></html>"
+        ).encode("windows-1252")
+        self.assertEqual(self._text(page), self.ARTICLE)
+
+    def test_charset_declared_in_the_header(self):
+        page = f"<html><body><p>{self.ARTICLE}</p></body></html>".encode("iso-8859-15", errors="replace")
+        self.assertIn("Café crème", self._text(page, 'text/html; charset=iso-8859-15'))
+
+    def test_preformatted_text_keeps_its_lines(self):
+        page = b"""<html><body>
+<p>Install   the   widget:</p>
+<pre>
+pip install querysafe
+querysafe init \\
+    --site example.com
+</pre>
+</body></html>"""
+        self.assertEqual(url_scraper.html_to_text(page), (
+            "Install the widget:\n"
+            "pip install querysafe\n"
+            "querysafe init \\\n"
+            "    --site example.com"
+        ))
@@ -0,0 +1,64 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from user_querySafe.models import Chatbot, ChatbotUsage, Conversation, Message, User
+
+
+class ChatbotUsageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Owner", email="owner@example.com")
+        self.chatbot = Chatbot.objects.create(user=self.user, name="Support")
+        self.today = timezone.localdate()
+
+    def test_answers_accumulate_in_one_row_per_day(self):
+        for _ in range(3):
+            ChatbotUsage.record_bot_message(self.chatbot)
+        self.assertEqual(
+            list(ChatbotUsage.objects.values_list('date', 'bot_messages')),
+            [(self.today, 3)],
+        )
+
+    def test_lost_insert_race_still_counts(self):
+        # Another worker inserts today's row between our update and insert
+        ChatbotUsage.objects.create(chatbot=self.chatbot, date=self.today, bot_messages=1)
+        real_filter = ChatbotUsage.objects.filter
+        calls = []
+
+        def filter_before_insert(*args, **kwargs):
+            calls.append(kwargs)
+            return ChatbotUsage.objects.none() if len(calls) == 1 else real_filter(*args, **kwargs)
+
+        with mock.patch.object(ChatbotUsage.objects, 'filter', side_effect=filter_before_insert):
+            ChatbotUsage.record_bot_message(self.chatbot)
+        self.assertEqual(ChatbotUsage.objects.get(chatbot=self.chatbot, date=self.today).bot_messages, 2)
+
+    def test_total_for_sums_days_and_chatbots(self):
+        other = Chatbot.objects.create(user=self.user, name="Sales")
+        yesterday = self.today - datetime.timedelta(days=1)
+        ChatbotUsage.objects.create(chatbot=self.chatbot, date=yesterday, bot_messages=5)
+        ChatbotUsage.objects.create(chatbot=self.chatbot, date=self.today, bot_messages=2)
+        ChatbotUsage.objects.create(chatbot=other, date=self.today, bot_messages=4)
+
+        self.assertEqual(ChatbotUsage.total_for(self.chatbot), 7)
+        self.assertEqual(ChatbotUsage.total_for(self.chatbot, since=self.today), 2)
+        self.assertEqual(ChatbotUsage.total_for(Chatbot.objects.filter(user=self.user)), 11)
+        self.assertEqual(ChatbotUsage.total_for(Chatbot.objects.none()), 0)
+
+    def test_reconcile_rebuilds_counters_from_messages(self):
+        conversation = Conversation.objects.create(chatbot=self.chatbot, user_id="visitor")
+        for is_bot in (False, True, False, True):
+            Message.objects.create(conversation=conversation, is_bot=is_bot, content="...")
+        ChatbotUsage.objects.create(chatbot=self.chatbot, date=self.today, bot_messages=9)
+        ChatbotUsage.objects.create(
+            chatbot=self.chatbot, date=self.today - datetime.timedelta(days=3), bot_messages=1,
+        )
+
+        call_command('reconcile_usage_counters', stdout=StringIO())
+
+        self.assertEqual(ChatbotUsage.total_for(self.chatbot), 2)
+        self.assertEqual(ChatbotUsage.objects.filter(chatbot=self.chatbot).count(), 1)
@@ -0,0 +1,73 @@
+import httpx
+from django.test import SimpleTestCase, override_settings
+
+from user_querySafe.chatbot.vision_dispatcher import VisionDispatcher, is_retryable
+
+
+class _ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class IsRetryableTests(SimpleTestCase):
+    def test_httpx_transport_errors_are_retryable(self):
+        request = httpx.Request("POST", "https://example.invalid/")
+        for exc in (
+            httpx.ConnectError("connection refused", request=request),
+            httpx.ReadTimeout("read timed out", request=request),
+            httpx.RemoteProtocolError("peer closed connection", request=request),
+        ):
+            with self.subTest(exc=type(exc).__name__):
+                self.assertTrue(is_retryable(exc))
+
+    def test_throttling_and_server_errors_are_retryable(self):
+        self.assertTrue(is_retryable(_ApiError(429)))
+        self.assertTrue(is_retryable(_ApiError(503)))
+        self.assertTrue(is_retryable(ConnectionResetError()))
+
+    def test_client_errors_are_not_retryable(self):
+        self.assertFalse(is_retryable(_ApiError(400)))
+        self.assertFalse(is_retryable(ValueError("bad prompt")))
+
+
+@override_settings(VISION_MAX_RETRIES=3, VISION_BACKOFF_BASE_SECONDS=0, VISION_BACKOFF_MAX_SECONDS=0)
+class VisionDispatcherTests(SimpleTestCase):
+    def _dispatcher(self):
+        return VisionDispatcher(requests_per_minute=6000, initial_concurrency=2, max_concurrency=4)
+
+    def test_retries_httpx_connect_error(self):
+        request = httpx.Request("POST", "https://example.invalid/")
+        attempts = []
+
+        def call():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise httpx.ConnectError("connection refused", request=request)
+            return "caption"
+
+        self.assertEqual(self._dispatcher().call(call), "caption")
+        self.assertEqual(len(attempts), 3)
+
+    def test_gives_up_after_max_retries(self):
+        request = httpx.Request("POST", "https://example.invalid/")
+        attempts = []
+
+        def call():
+            attempts.append(1)
+            raise httpx.ReadTimeout("read timed out", request=request)
+
+        with self.assertRaises(httpx.ReadTimeout):
+            self._dispatcher().call(call)
+        self.assertEqual(len(attempts), 4)
+
+    def test_does_not_retry_client_errors(self):
+        attempts = []
+
+        def call():
+            attempts.append(1)
+            raise _ApiError(400)
+
+        with self.assertRaises(_ApiError):
+            self._dispatcher().call(call)
+        self.assertEqual(len(attempts), 1)
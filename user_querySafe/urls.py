@@ -28,6 +28,7 @@ urlpatterns = [
     path('chatbot/', include('user_querySafe.chatbot.urls')),
     path('chatbot_view/<str:chatbot_id>/', views.chatbot_view, name='chatbot_view'),
     path('chat/', views.chat_message, name='chat_message'),
+    path('chat/stream/', views.chat_message_stream, name='chat_message_stream'),
     path('chat/feedback/', views.chat_feedback, name='chat_feedback'),
     path('widget/<str:chatbot_id>/querySafe.js', views.serve_widget_js, name='widget_js'),
 
@@ -58,4 +59,8 @@ urlpatterns = [
     path('cron/send-chatbot-reports/', views.cron_send_chatbot_reports, name='cron_send_chatbot_reports'),
     path('cron/send-goal-plan-emails/', views.cron_send_goal_plan_emails, name='cron_send_goal_plan_emails'),
 
+    # Health checks (liveness / startup probe)
+    path('healthz/', views.healthz, name='healthz'),
+    path('healthz/ready/', views.healthz_ready, name='healthz_ready'),
+
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
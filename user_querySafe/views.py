@@ -1,16 +1,18 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from .forms import RegisterForm, OTPVerificationForm  # Remove LoginForm
-from .models import Activity, User, Chatbot, ChatbotDocument, Conversation, Message, ChatbotFeedback, EmailOTP, QSPlanAllot, HelpSupportRequest, BugReport, ScheduledEmail
-from django.http import JsonResponse, HttpResponse  # Import HttpResponse
+from .models import Activity, User, Chatbot, ChatbotDocument, ChatbotUsage, Conversation, Message, ChatbotFeedback, EmailOTP, QSPlanAllot, HelpSupportRequest, BugReport, ScheduledEmail
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 import json
 from django.views.decorators.csrf import csrf_exempt
 import os
 import string
-import faiss
 from google import genai
 from google.genai.types import GenerateContentConfig, GoogleSearch, Tool
-from user_querySafe.chatbot.embedding_model import get_embedding_model
+from user_querySafe.chatbot.embedding_model import encode_query
+from user_querySafe.chatbot import answer_cache
+from user_querySafe.chatbot.index_cache import get_index_and_chunks
+from user_querySafe.chatbot.warmup import is_ready as warmup_ready, start_warmup, warmup_report
 from django.conf import settings
 from django.views.decorators.clickjacking import xframe_options_exempt
 from django.views.decorators.http import require_POST
@@ -27,8 +29,10 @@ from .decorators import redirect_authenticated_user, login_required
 from django.views.decorators.http import require_http_methods
 from django.core.cache import cache
 from django.urls import reverse
-from django.db import models
+from django.db import models, transaction
 import time  # Import the time module
+import asyncio
+from asgiref.sync import sync_to_async
 import logging
 import requests as http_requests  # renamed to avoid conflict with django request
 
@@ -641,274 +645,375 @@ def chatbot_view(request, chatbot_id):
 
     return render(request, 'user_querySafe/chatbot-view.html', context)
 
-@csrf_exempt
-def chat_message(request):
-    # Handle preflight OPTIONS request
-    if request.method == 'OPTIONS':
-        response = HttpResponse()
-        response['Access-Control-Allow-Origin'] = '*'
-        response['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
-        response['Access-Control-Allow-Headers'] = 'Content-Type'
-        response['Access-Control-Max-Age'] = '86400'  # 24 hours
-        return response
+def _chat_preflight_response():
+    """CORS preflight response shared by the chat endpoints."""
+    response = HttpResponse()
+    response['Access-Control-Allow-Origin'] = '*'
+    response['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
+    response['Access-Control-Allow-Headers'] = 'Content-Type'
+    response['Access-Control-Max-Age'] = '86400'  # 24 hours
+    return response
 
-    if request.method != 'POST':
-        return JsonResponse({'error': 'Only POST method allowed'}, status=405)
 
-    try:
-        data = json.loads(request.body)
-        user_message = data.get('query', '').strip()
-        chatbot_id = data.get('chatbot_id')
-        conversation_id = data.get('conversation_id')
+def _build_system_instruction(chatbot, web_search_enabled):
+    """Build the Gemini system instruction (behavioral rules separated from content)."""
+    system_parts = [
+        "You are a helpful AI assistant for a product/service. You answer questions ONLY using the provided knowledge context.",
+        "Rules:",
+        "- Answer ONLY from the provided knowledge context. Do NOT use any outside knowledge about the product or service.",
+        "- If the knowledge context does not contain the answer, say: 'I don't have that information in my knowledge base. Please contact our team for details.'",
+        "- NEVER guess, assume, or invent features, capabilities, or details not explicitly stated in the knowledge context.",
+        "- If asked about a feature and the context doesn't mention it, say you don't have information about that specific feature.",
+        "- Maintain conversation continuity and reference previous messages when relevant.",
+        "- Be natural and conversational. Never say 'based on the context' or 'according to the documents'.",
+        "- For general greetings or small talk, respond naturally without making claims about the product.",
+        "- Respond in the same language the user writes in.",
+        "",
+        "Response formatting:",
+        "- For simple questions (yes/no, single fact, greeting), reply in 1-2 short sentences.",
+        "- For 'what is' or 'explain' questions, use a brief paragraph (3-5 sentences).",
+        "- For 'how to', steps, or process questions, use a numbered list.",
+        "- For listing features, benefits, or multiple items, use bullet points.",
+        "- For comparison questions, use a markdown table with headers when comparing 2+ items.",
+        "- When data has clear columns (prices, features, specs), always format it as a markdown table.",
+        "- When the user asks to elaborate or says 'tell me more', expand with a detailed paragraph and examples from the knowledge context.",
+        "- Never use more than 150 words unless the user explicitly asks for detail.",
+        "- Use markdown formatting (bold, bullets, numbered lists, tables) for readability.",
+    ]
+    # Inject custom bot instructions if set
+    if hasattr(chatbot, 'bot_instructions') and chatbot.bot_instructions.strip():
+        system_parts.append(f"\nCustom instructions from the chatbot owner:\n{chatbot.bot_instructions.strip()}")
+
+    # If web search is enabled, add instructions for using web data
+    if web_search_enabled:
+        system_parts.append("")
+        system_parts.append("Web Search Grounding (ENABLED):")
+        system_parts.append("- You have access to live Google Search results alongside the knowledge base.")
+        system_parts.append("- ALWAYS prioritize the knowledge context over web results for product-specific questions.")
+        system_parts.append("- Use web search results for comparisons, market data, competitor information, or questions outside the knowledge base.")
+        system_parts.append("- Be transparent when using web data: e.g., 'According to recent web results...'")
+        system_parts.append("- Never fabricate web search results. If web results are not available, say so.")
+        system_parts.append("- Combine knowledge base and web data naturally when both are relevant.")
+
+    return "\n".join(system_parts)
+
+
+def _retrieve_matches(chatbot_id, user_message, k=8):
+    """Vector-search the chatbot's index. Returns a list of matches, or None if untrained."""
+    # Index + metadata cached per worker
+    index, chunk_data = get_index_and_chunks(chatbot_id)
+    if index is None:
+        return None
+
+    query_vector = encode_query(user_message)  # memoised for repeated questions
+    distances, indices = index.search(query_vector, k)
+
+    # Backward-compatible: handle both old ["str"] and new [{"content","source"}]
+    matches = []
+    for i, idx in enumerate(indices[0]):
+        if 0 <= idx < len(chunk_data):  # IVF / HNSW pad missing results with -1
+            dist = float(distances[0][i])
+            if dist > 1.5:
+                continue  # skip irrelevant chunks
+            entry = chunk_data[idx]
+            if isinstance(entry, dict):
+                matches.append({'content': entry['content'], 'source': entry.get('source', ''), 'distance': dist})
+            else:
+                matches.append({'content': entry, 'source': '', 'distance': dist})
+    return matches
 
-        # Input validation
-        if not user_message or not chatbot_id:
-            return JsonResponse({'error': 'Missing required fields: query and chatbot_id'}, status=400)
-        if len(user_message) > 5000:
-            return JsonResponse({'error': 'Message is too long. Maximum 5000 characters.'}, status=400)
 
-        # Ensure we have a session
-        if not request.session.session_key:
-            request.session.create()
-        session_id = request.session.session_key
+def _open_chat_turn(request, data):
+    """Validate a chat request, enforce limits and record the user's message.
 
-        # Get chatbot
-        chatbot = get_object_or_404(Chatbot, chatbot_id=chatbot_id)
+    Database-only half of a chat turn (no embedding / Gemini work), so the
+    async views can run it off the event loop in one hop.  Returns
+    (turn, None) on success or (None, error_response) when rejected.
+    """
+    user_message = data.get('query', '').strip()
+    chatbot_id = data.get('chatbot_id')
+    conversation_id = data.get('conversation_id')
+
+    # Input validation
+    if not user_message or not chatbot_id:
+        return None, JsonResponse({'error': 'Missing required fields: query and chatbot_id'}, status=400)
+    if len(user_message) > 5000:
+        return None, JsonResponse({'error': 'Message is too long. Maximum 5000 characters.'}, status=400)
+
+    # Ensure we have a session
+    if not request.session.session_key:
+        request.session.create()
+    session_id = request.session.session_key
+
+    # Get chatbot
+    chatbot = get_object_or_404(Chatbot, chatbot_id=chatbot_id)
 
-        # Check if chatbot is trained
-        if chatbot.status != 'trained':
-            return JsonResponse({
-                'error': 'This chatbot is still in training or not ready. Please try again later.',
-                'status': chatbot.status
-            }, status=400)
-
-        # Get user's active plan
-        user = chatbot.user
-        active_plan = QSPlanAllot.objects.filter(
-            user=user,
-            expire_date__gte=timezone.now().date()
-        ).order_by('-created_at').first()
+    # Check if chatbot is trained
+    if chatbot.status != 'trained':
+        return None, JsonResponse({
+            'error': 'This chatbot is still in training or not ready. Please try again later.',
+            'status': chatbot.status
+        }, status=400)
 
-        if not active_plan:
-            return JsonResponse({
-                'error': 'No active plan found. Please subscribe to a plan to continue using the chatbot.'
-            })
+    # Get user's active plan
+    user = chatbot.user
+    active_plan = QSPlanAllot.objects.filter(
+        user=user,
+        expire_date__gte=timezone.now().date()
+    ).order_by('-created_at').first()
 
-        # Check query limit BEFORE processing (base plan + add-on stacking)
-        # Count total bot responses for this chatbot (across ALL visitors/conversations)
-        total_bot_responses = Message.objects.filter(
-            conversation__chatbot=chatbot,
-            is_bot=True
-        ).count()
+    if not active_plan:
+        return None, JsonResponse({
+            'error': 'No active plan found. Please subscribe to a plan to continue using the chatbot.'
+        })
 
-        # Calculate effective limit: base plan + active extra_messages add-ons
-        try:
-            from user_querySafe.addon_utils import get_effective_limits
-            effective = get_effective_limits(chatbot.user, active_plan)
-            effective_query_limit = effective['no_of_query']
-        except Exception:
-            effective_query_limit = active_plan.no_of_query
+    # Check query limit BEFORE processing (base plan + add-on stacking)
+    # Total bot responses for this chatbot (across ALL visitors/conversations),
+    # read from the denormalized daily counters rather than counting messages
+    total_bot_responses = ChatbotUsage.total_for(chatbot)
 
-        if total_bot_responses >= effective_query_limit:
-            return JsonResponse({
-                'error': 'This chatbot has reached its query limit. Please contact the chatbot owner to upgrade their plan.',
-                'limit_reached': True
-            }, status=429)
+    # Calculate effective limit: base plan + active extra_messages add-ons
+    try:
+        from user_querySafe.addon_utils import get_effective_limits
+        effective = get_effective_limits(chatbot.user, active_plan)
+        effective_query_limit = effective['no_of_query']
+    except Exception:
+        effective_query_limit = active_plan.no_of_query
 
-        # Get or create conversation
-        try:
-            if conversation_id:
-                conversation = Conversation.objects.get(conversation_id=conversation_id)
-            else:
-                conversation = Conversation.objects.create(
-                    chatbot=chatbot,
-                    user_id=session_id
-                )
-            print(f"Created new conversation: {conversation.conversation_id}")
-        except Conversation.DoesNotExist:
+    if total_bot_responses >= effective_query_limit:
+        return None, JsonResponse({
+            'error': 'This chatbot has reached its query limit. Please contact the chatbot owner to upgrade their plan.',
+            'limit_reached': True
+        }, status=429)
+
+    # Get or create conversation
+    try:
+        if conversation_id:
+            conversation = Conversation.objects.get(conversation_id=conversation_id)
+        else:
             conversation = Conversation.objects.create(
                 chatbot=chatbot,
                 user_id=session_id
             )
-            print(f"Created new conversation: {conversation.conversation_id}")
-
-        # Save visitor email if provided (lead capture)
-        visitor_email = data.get('visitor_email', '').strip()
-        if visitor_email and not conversation.visitor_email:
-            conversation.visitor_email = visitor_email
-            conversation.save()
-
-        # Rate limiting: reject excessive requests instead of blocking the worker
-        cache_key = f'chat_message_count_{conversation.user_id}'
-        message_count = cache.get(cache_key, 0)
-
-        if message_count >= 10:
-            response = JsonResponse({
-                'error': 'Too many messages. Please wait a moment before sending another.',
-                'retry_after': 60
-            }, status=429)
-            response['Access-Control-Allow-Origin'] = '*'
-            response['Retry-After'] = '60'
-            return response
-
-        cache.set(cache_key, message_count + 1, 60)  # Reset count every 60 seconds
-
-        # Store user message
-        Message.objects.create(
-            conversation=conversation,
-            content=user_message,
-            is_bot=False
+        print(f"Created new conversation: {conversation.conversation_id}")
+    except Conversation.DoesNotExist:
+        conversation = Conversation.objects.create(
+            chatbot=chatbot,
+            user_id=session_id
         )
-        print(f"Stored user message in conversation: {conversation.conversation_id}")
+        print(f"Created new conversation: {conversation.conversation_id}")
 
-        # Get chat history (last 5 messages)
-        chat_history = Message.objects.filter(conversation=conversation).order_by('-timestamp')[:5]
-        chat_context = "\n".join([
-            f"{'Bot' if msg.is_bot else 'User'}: {msg.content}"
-            for msg in reversed(chat_history)
-        ])
-        
-        # Get vector search results
-        index_path = os.path.join(settings.INDEX_DIR, f"{chatbot_id}-index.index")
-        meta_path = os.path.join(settings.META_DIR, f"{chatbot_id}-chunks.json")
-
-        if not os.path.exists(index_path) or not os.path.exists(meta_path):
-            return JsonResponse({'error': 'Chatbot data not found'}, status=404)
-
-        index = faiss.read_index(index_path)
-        with open(meta_path, 'r', encoding='utf-8') as f:
-            chunk_data = json.load(f)
-
-        query_vector = get_embedding_model().encode([user_message]).astype('float32')
-        k = 8
-        distances, indices = index.search(query_vector, k)
-
-        # Backward-compatible: handle both old ["str"] and new [{"content","source"}]
-        matches = []
-        for i, idx in enumerate(indices[0]):
-            if idx < len(chunk_data):
-                dist = float(distances[0][i])
-                if dist > 1.5:
-                    continue  # skip irrelevant chunks
-                entry = chunk_data[idx]
-                if isinstance(entry, dict):
-                    matches.append({'content': entry['content'], 'source': entry.get('source', ''), 'distance': dist})
-                else:
-                    matches.append({'content': entry, 'source': '', 'distance': dist})
-
-        knowledge_context = "\n\n".join([m['content'] for m in matches])
-
-        # Build system instruction (behavioral rules separated from content)
-        system_parts = [
-            "You are a helpful AI assistant for a product/service. You answer questions ONLY using the provided knowledge context.",
-            "Rules:",
-            "- Answer ONLY from the provided knowledge context. Do NOT use any outside knowledge about the product or service.",
-            "- If the knowledge context does not contain the answer, say: 'I don't have that information in my knowledge base. Please contact our team for details.'",
-            "- NEVER guess, assume, or invent features, capabilities, or details not explicitly stated in the knowledge context.",
-            "- If asked about a feature and the context doesn't mention it, say you don't have information about that specific feature.",
-            "- Maintain conversation continuity and reference previous messages when relevant.",
-            "- Be natural and conversational. Never say 'based on the context' or 'according to the documents'.",
-            "- For general greetings or small talk, respond naturally without making claims about the product.",
-            "- Respond in the same language the user writes in.",
-            "",
-            "Response formatting:",
-            "- For simple questions (yes/no, single fact, greeting), reply in 1-2 short sentences.",
-            "- For 'what is' or 'explain' questions, use a brief paragraph (3-5 sentences).",
-            "- For 'how to', steps, or process questions, use a numbered list.",
-            "- For listing features, benefits, or multiple items, use bullet points.",
-            "- For comparison questions, use a markdown table with headers when comparing 2+ items.",
-            "- When data has clear columns (prices, features, specs), always format it as a markdown table.",
-            "- When the user asks to elaborate or says 'tell me more', expand with a detailed paragraph and examples from the knowledge context.",
-            "- Never use more than 150 words unless the user explicitly asks for detail.",
-            "- Use markdown formatting (bold, bullets, numbered lists, tables) for readability.",
-        ]
-        # Inject custom bot instructions if set
-        if hasattr(chatbot, 'bot_instructions') and chatbot.bot_instructions.strip():
-            system_parts.append(f"\nCustom instructions from the chatbot owner:\n{chatbot.bot_instructions.strip()}")
-
-        # If web search is enabled, add instructions for using web data
-        web_search_enabled = getattr(chatbot, 'enable_web_search', False)
-        if web_search_enabled:
-            system_parts.append("")
-            system_parts.append("Web Search Grounding (ENABLED):")
-            system_parts.append("- You have access to live Google Search results alongside the knowledge base.")
-            system_parts.append("- ALWAYS prioritize the knowledge context over web results for product-specific questions.")
-            system_parts.append("- Use web search results for comparisons, market data, competitor information, or questions outside the knowledge base.")
-            system_parts.append("- Be transparent when using web data: e.g., 'According to recent web results...'")
-            system_parts.append("- Never fabricate web search results. If web results are not available, say so.")
-            system_parts.append("- Combine knowledge base and web data naturally when both are relevant.")
-
-        system_instruction = "\n".join(system_parts)
-
-        # User prompt
-        prompt = (
-            f"Previous conversation:\n{chat_context}\n\n"
-            f"Knowledge context:\n{knowledge_context}\n\n"
-            f"User question: {user_message}"
-        )
+    # Save visitor email if provided (lead capture)
+    visitor_email = data.get('visitor_email', '').strip()
+    if visitor_email and not conversation.visitor_email:
+        conversation.visitor_email = visitor_email
+        conversation.save()
 
-        # Build Gemini config - conditionally add Google Search tool
-        config_kwargs = {
-            "system_instruction": system_instruction,
-            "temperature": 0.3,
-        }
-        if web_search_enabled:
-            config_kwargs["tools"] = [Tool(google_search=GoogleSearch())]
+    # Rate limiting: reject excessive requests instead of blocking the worker
+    cache_key = f'chat_message_count_{conversation.user_id}'
+    message_count = cache.get(cache_key, 0)
+
+    if message_count >= 10:
+        response = JsonResponse({
+            'error': 'Too many messages. Please wait a moment before sending another.',
+            'retry_after': 60
+        }, status=429)
+        response['Retry-After'] = '60'
+        return None, response
+
+    cache.set(cache_key, message_count + 1, 60)  # Reset count every 60 seconds
+
+    # Store user message
+    Message.objects.create(
+        conversation=conversation,
+        content=user_message,
+        is_bot=False
+    )
+    print(f"Stored user message in conversation: {conversation.conversation_id}")
 
-        gemini_config = GenerateContentConfig(**config_kwargs)
+    # Get chat history (last 5 messages)
+    chat_history = Message.objects.filter(conversation=conversation).order_by('-timestamp')[:5]
+    chat_context = "\n".join([
+        f"{'Bot' if msg.is_bot else 'User'}: {msg.content}"
+        for msg in reversed(chat_history)
+    ])
 
-        # Get response from Gemini
-        gemini_response = client.models.generate_content(
-            model=settings.GEMINI_CHAT_MODEL,
-            contents=[{"role": "user", "parts": [{"text": prompt}]}],
-            config=gemini_config,
-        )
+    turn = {
+        'chatbot': chatbot,
+        'conversation': conversation,
+        'user_message': user_message,
+        'chat_context': chat_context,
+        'has_history': len(chat_history) > 1,  # anything besides the message just stored
+    }
+    return turn, None
 
-        bot_response = gemini_response.text
 
-        # Extract grounding metadata if web search was used
-        web_sources = []
-        if web_search_enabled:
-            try:
-                for candidate in (gemini_response.candidates or []):
-                    grounding_meta = getattr(candidate, 'grounding_metadata', None)
-                    if grounding_meta:
-                        # Count search queries generated
-                        search_queries = getattr(grounding_meta, 'web_search_queries', []) or []
-                        if search_queries:
-                            from user_querySafe.models import WebSearchUsage
-                            WebSearchUsage.objects.create(
-                                chatbot=chatbot,
-                                query_count=len(search_queries),
-                            )
-
-                        # Extract source URLs from grounding chunks
-                        grounding_chunks = getattr(grounding_meta, 'grounding_chunks', []) or []
-                        for chunk in grounding_chunks:
-                            web_ref = getattr(chunk, 'web', None)
-                            if web_ref:
-                                web_sources.append({
-                                    'uri': getattr(web_ref, 'uri', ''),
-                                    'title': getattr(web_ref, 'title', ''),
-                                })
-            except Exception as gs_err:
-                print(f"Grounding metadata extraction error: {gs_err}")
+def _complete_chat_turn(turn, matches):
+    """Attach retrieval results and the Gemini prompt/config to an opened turn."""
+    chatbot = turn['chatbot']
+    knowledge_context = "\n\n".join([m['content'] for m in matches])
 
-        # Store bot response
+    web_search_enabled = getattr(chatbot, 'enable_web_search', False)
+    system_instruction = _build_system_instruction(chatbot, web_search_enabled)
+
+    # User prompt
+    prompt = (
+        f"Previous conversation:\n{turn['chat_context']}\n\n"
+        f"Knowledge context:\n{knowledge_context}\n\n"
+        f"User question: {turn['user_message']}"
+    )
+
+    # Build Gemini config - conditionally add Google Search tool
+    config_kwargs = {
+        "system_instruction": system_instruction,
+        "temperature": 0.3,
+    }
+    if web_search_enabled:
+        config_kwargs["tools"] = [Tool(google_search=GoogleSearch())]
+
+    turn.update({
+        'matches': matches,
+        'web_search_enabled': web_search_enabled,
+        'contents': [{"role": "user", "parts": [{"text": prompt}]}],
+        'config': GenerateContentConfig(**config_kwargs),
+    })
+    return turn
+
+
+def _answer_cache_eligible(turn):
+    """Answers are only shared for a bot's opening question without web search.
+
+    Follow-ups depend on chat history and web-grounded answers on live
+    results, so both always go to Gemini.
+    """
+    chatbot = turn['chatbot']
+    return (
+        chatbot.enable_answer_cache
+        and not chatbot.enable_web_search
+        and not turn['has_history']
+    )
+
+
+async def _aprepare_chat_turn(request, data):
+    """Validate a chat request and assemble everything needed to call Gemini.
+
+    Shared by chat_message and chat_message_stream.  Returns (turn, None) on
+    success or (None, error_response) when the request must be rejected.
+    ORM work runs in one sync_to_async hop (per-request thread under ASGI);
+    the embedding + FAISS search runs in a worker thread so the event loop
+    stays free while other conversations wait on Gemini.
+    """
+    turn, error_response = await sync_to_async(_open_chat_turn)(request, data)
+    if error_response is not None:
+        return None, error_response
+
+    # Repeated question on an opted-in bot: reuse the previous answer, skip retrieval + Gemini
+    if _answer_cache_eligible(turn):
+        cached = await asyncio.to_thread(answer_cache.lookup, turn['chatbot'], turn['user_message'])
+        if cached is not None:
+            turn.update({'cached_answer': cached['answer'], 'matches': cached['matches']})
+            return turn, None
+
+    matches = await asyncio.to_thread(_retrieve_matches, turn['chatbot'].chatbot_id, turn['user_message'])
+    if matches is None:
+        return None, JsonResponse({'error': 'Chatbot data not found'}, status=404)
+
+    return _complete_chat_turn(turn, matches), None
+
+
+def _extract_web_sources(chatbot, gemini_response):
+    """Record web search usage and return source links from grounding metadata."""
+    web_sources = []
+    try:
+        for candidate in (gemini_response.candidates or []):
+            grounding_meta = getattr(candidate, 'grounding_metadata', None)
+            if grounding_meta:
+                # Count search queries generated
+                search_queries = getattr(grounding_meta, 'web_search_queries', []) or []
+                if search_queries:
+                    from user_querySafe.models import WebSearchUsage
+                    WebSearchUsage.objects.create(
+                        chatbot=chatbot,
+                        query_count=len(search_queries),
+                    )
+
+                # Extract source URLs from grounding chunks
+                grounding_chunks = getattr(grounding_meta, 'grounding_chunks', []) or []
+                for chunk in grounding_chunks:
+                    web_ref = getattr(chunk, 'web', None)
+                    if web_ref:
+                        web_sources.append({
+                            'uri': getattr(web_ref, 'uri', ''),
+                            'title': getattr(web_ref, 'title', ''),
+                        })
+    except Exception as gs_err:
+        print(f"Grounding metadata extraction error: {gs_err}")
+    return web_sources
+
+
+def _store_bot_reply(chatbot, conversation, bot_response):
+    """Persist the bot's answer, bump usage counters and the conversation's last_updated."""
+    with transaction.atomic():
         Message.objects.create(
             conversation=conversation,
             content=bot_response,
             is_bot=True
         )
-        print(f"Stored bot response in conversation: {conversation.conversation_id}")
+        ChatbotUsage.record_bot_message(chatbot)
+    print(f"Stored bot response in conversation: {conversation.conversation_id}")
 
-        # Update conversation last_updated
-        conversation.save()
+    # Update conversation last_updated
+    conversation.save()
+
+
+@csrf_exempt
+async def chat_message(request):
+    # Async view: under ASGI (uvicorn workers) the Gemini wait doesn't pin a
+    # worker, so one instance can hold many in-flight conversations.
+    # Handle preflight OPTIONS request
+    if request.method == 'OPTIONS':
+        return _chat_preflight_response()
+
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Only POST method allowed'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        turn, error_response = await _aprepare_chat_turn(request, data)
+        if error_response is not None:
+            error_response['Access-Control-Allow-Origin'] = '*'
+            return error_response
+
+        chatbot = turn['chatbot']
+        conversation = turn['conversation']
+        web_sources = []
+
+        if 'cached_answer' in turn:
+            bot_response = turn['cached_answer']
+        else:
+            # Get response from Gemini
+            gemini_response = await client.aio.models.generate_content(
+                model=settings.GEMINI_CHAT_MODEL,
+                contents=turn['contents'],
+                config=turn['config'],
+            )
+
+            bot_response = gemini_response.text
+
+            # Extract grounding metadata if web search was used
+            if turn['web_search_enabled']:
+                web_sources = await sync_to_async(_extract_web_sources)(chatbot, gemini_response)
+
+            if bot_response and _answer_cache_eligible(turn):
+                await asyncio.to_thread(answer_cache.store, chatbot, turn['user_message'], bot_response, turn['matches'])
+
+        # Store bot response
+        await sync_to_async(_store_bot_reply)(chatbot, conversation, bot_response)
 
         response_data = {
             'answer': bot_response,
             'conversation_id': conversation.conversation_id,
-            'matches': matches,
+            'matches': turn['matches'],
         }
         if web_sources:
             response_data['web_sources'] = web_sources
@@ -934,6 +1039,101 @@ def chat_message(request):
         return response
 
 
+def _sse_event(event, payload):
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@csrf_exempt
+async def chat_message_stream(request):
+    """Streaming variant of chat_message using Server-Sent Events.
+
+    Validation errors are returned as regular JSON (same shape as /chat/).
+    Once accepted, the response is ``text/event-stream`` with frames:
+      meta  → {"conversation_id", "matches"}
+      token → {"text"}                  (one per Gemini stream chunk)
+      done  → {"conversation_id", "web_sources"}
+      error → {"error"}
+    The bot Message row is stored once the stream finishes.
+    """
+    if request.method == 'OPTIONS':
+        return _chat_preflight_response()
+
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Only POST method allowed'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        turn, error_response = await _aprepare_chat_turn(request, data)
+    except json.JSONDecodeError:
+        response = JsonResponse({'error': 'Invalid request body'}, status=400)
+        response['Access-Control-Allow-Origin'] = '*'
+        return response
+    except Exception:
+        logger.exception('chat_message_stream error')
+        response = JsonResponse({'error': 'An internal error occurred. Please try again.'}, status=500)
+        response['Access-Control-Allow-Origin'] = '*'
+        return response
+
+    if error_response is not None:
+        error_response['Access-Control-Allow-Origin'] = '*'
+        return error_response
+
+    chatbot = turn['chatbot']
+    conversation = turn['conversation']
+
+    async def event_stream():
+        answer_parts = []
+        web_sources = []
+        try:
+            yield _sse_event('meta', {
+                'conversation_id': conversation.conversation_id,
+                'matches': turn['matches'],
+            })
+            if 'cached_answer' in turn:
+                answer_parts.append(turn['cached_answer'])
+                yield _sse_event('token', {'text': turn['cached_answer']})
+                yield _sse_event('done', {'conversation_id': conversation.conversation_id, 'web_sources': []})
+                return
+            stream = await client.aio.models.generate_content_stream(
+                model=settings.GEMINI_CHAT_MODEL,
+                contents=turn['contents'],
+                config=turn['config'],
+            )
+            async for chunk in stream:
+                # Grounding metadata arrives on the trailing chunk(s)
+                if turn['web_search_enabled']:
+                    web_sources.extend(await sync_to_async(_extract_web_sources)(chatbot, chunk))
+                text = chunk.text
+                if text:
+                    answer_parts.append(text)
+                    yield _sse_event('token', {'text': text})
+            if answer_parts and _answer_cache_eligible(turn):
+                await asyncio.to_thread(answer_cache.store, chatbot, turn['user_message'], "".join(answer_parts), turn['matches'])
+            yield _sse_event('done', {
+                'conversation_id': conversation.conversation_id,
+                'web_sources': web_sources,
+            })
+        except Exception:
+            logger.exception('chat_message_stream error')
+            yield _sse_event('error', {'error': 'An internal error occurred. Please try again.'})
+        finally:
+            # Persist whatever was generated, even if the client disconnected mid-stream
+            if answer_parts:
+                try:
+                    await sync_to_async(_store_bot_reply)(chatbot, conversation, "".join(answer_parts))
+                except Exception:
+                    logger.exception('Could not store streamed bot reply for %s', conversation.conversation_id)
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # disable proxy buffering so tokens flush immediately
+    response['Access-Control-Allow-Origin'] = '*'
+    response['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
+    response['Access-Control-Allow-Headers'] = 'Content-Type'
+    return response
+
+
 @csrf_exempt
 def chat_feedback(request):
     # Handle preflight OPTIONS request
@@ -1628,6 +1828,27 @@ def cron_send_goal_plan_emails(request):
     return JsonResponse({'success': True, 'output': output.getvalue()})
 
 
+# =====================================================================
+# HEALTH CHECKS
+# =====================================================================
+
+def healthz(request):
+    """Liveness: the worker is up and serving requests."""
+    return JsonResponse({'status': 'ok'})
+
+
+def healthz_ready(request):
+    """Readiness: 503 until the embedding model and hot indexes are loaded.
+
+    Use as the Cloud Run startup probe so traffic only reaches warm workers.
+    Also kicks off warmup when the server didn't (e.g. runserver).
+    """
+    start_warmup()
+    if not warmup_ready():
+        return JsonResponse({'status': 'warming'}, status=503)
+    return JsonResponse({'status': 'ready', 'warmup': warmup_report()})
+
+
 # -----------------------------------------
 # Tour Complete API
 # -----------------------------------------